@@ -0,0 +1,521 @@
+"""
+Rate limiting and admission control for model calls.
+
+Every call to a model backend first takes a token from a token bucket and
+then a slot from an ``AdmissionController``. Requests that cannot run soon
+are shed: the bucket is empty, the wait queue is full, or no slot frees up
+within ``AI_QUEUE_TIMEOUT``. Shedding raises ``Overloaded``, and
+``AIProcessor`` answers those requests from its keyword fallbacks. Under
+overload, callers get a quick fallback instead of a timeout, and the
+backends keep working at their sustainable rate.
+
+The bucket is per process by default, and each of the ``WEB_CONCURRENCY``
+workers gets that share of ``AI_RATE_LIMIT`` and ``AI_RATE_BURST``. With
+``AI_RATE_LIMIT_SHARED`` all workers draw from one ``AIThrottleBucket`` row,
+read and written under a row lock (``SELECT ... FOR UPDATE``), so the budget
+is exact across workers and nothing a cache may evict holds its state. A
+call shed after taking its token (full queue, queue timeout, deadline) gives
+the token back. Slots and the queue are per process.
+
+Calls run in one of two lanes. Interactive calls (the default) may use
+every slot. Batch calls, made inside ``ai_lane('batch')``, may use at most
+``AI_BATCH_MAX_CONCURRENCY`` slots and wait behind any queued interactive
+call, so a bulk job never makes a user request wait for more than a slot.
+Batch calls wait for bucket tokens instead of being shed, and they are dropped
+once their deadline (``AI_BATCH_DEADLINE``) passes while they still wait.
+Results nobody waits for anymore are never computed.
+
+Decisions are counted per lane and process. Every ``METRICS_FLUSH_SECONDS``
+the new counts are added to totals in the ``AI_METRICS_CACHE`` cache, best
+effort. ``GET /api/ai/metrics/`` reports both. Cache and database access
+from async code goes through ``sync_to_async``.
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+KEY_PREFIX = 'ai-admission'
+# Seconds between additions of the process counts to the shared totals
+METRICS_FLUSH_SECONDS = 10
+# Highest priority first
+LANES = ('interactive', 'batch')
+# Decisions, as counted in the metrics; a queued request is later also
+# counted as admitted, shed_timeout or shed_deadline
+DECISIONS = ('admitted', 'queued', 'shed_rate_limited', 'shed_queue_full', 'shed_timeout', 'shed_deadline')
+
+# (lane, monotonic deadline or None) of the calls made in this context
+_current_lane = contextvars.ContextVar('ai_lane', default=('interactive', None))
+
+
+class Overloaded(Exception):
+    """The model call was shed; the caller should use its fallback"""
+
+    def __init__(self, reason):
+        super().__init__(f'AI request shed: {reason}')
+        self.reason = reason
+
+
+def _metrics_cache():
+    return caches[getattr(settings, 'AI_METRICS_CACHE', 'default')]
+
+
+def _incr(cache, key, delta=1):
+    """``cache.incr`` that (re)creates keys the cache has evicted"""
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        cache.set(key, delta, timeout=None)
+        return delta
+
+
+class TokenBucket:
+    """``rate`` tokens per second up to ``burst``, for this process"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(int(burst), 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, tokens, elapsed):
+        return min(float(self.burst), tokens + max(0.0, elapsed) * self.rate)
+
+    def take(self):
+        """Take one token; False when the bucket is empty"""
+        if not self.rate:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = self._refill(self._tokens, now - self._updated)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    async def atake(self):
+        return self.take()
+
+    def refund(self):
+        """Give back a token taken for a call that was shed before it ran"""
+        if not self.rate:
+            return
+        with self._lock:
+            self._tokens = min(float(self.burst), self._tokens + 1)
+
+    async def arefund(self):
+        self.refund()
+
+    def available(self):
+        if not self.rate:
+            return None
+        with self._lock:
+            return int(self._refill(self._tokens, time.monotonic() - self._updated))
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    The bucket as an ``AIThrottleBucket`` row, shared by all workers
+
+    Each take is one short transaction that locks the row. Calls made inside
+    an outer transaction hold that lock until it ends.
+    """
+
+    def __init__(self, name, rate, burst):
+        super().__init__(rate, burst)
+        self.name = name
+
+    def _locked_row(self):
+        from .models import AIThrottleBucket
+
+        AIThrottleBucket.objects.bulk_create(
+            [AIThrottleBucket(name=self.name, tokens=self.burst, updated_at=time.time())], ignore_conflicts=True
+        )
+        return AIThrottleBucket.objects.select_for_update().get(name=self.name)
+
+    def take(self):
+        if not self.rate:
+            return True
+        with transaction.atomic():
+            bucket = self._locked_row()
+            # Wall clock: the row is shared between processes and hosts
+            now = time.time()
+            tokens = self._refill(bucket.tokens, now - bucket.updated_at)
+            taken = tokens >= 1
+            bucket.tokens = tokens - 1 if taken else tokens
+            bucket.updated_at = now
+            bucket.save(update_fields=['tokens', 'updated_at'])
+        return taken
+
+    async def atake(self):
+        return await sync_to_async(self.take)()
+
+    def refund(self):
+        if not self.rate:
+            return
+        with transaction.atomic():
+            bucket = self._locked_row()
+            bucket.tokens = min(float(self.burst), bucket.tokens + 1)
+            bucket.save(update_fields=['tokens'])
+
+    async def arefund(self):
+        await sync_to_async(self.refund)()
+
+    def available(self):
+        from .models import AIThrottleBucket
+
+        if not self.rate:
+            return None
+        bucket = AIThrottleBucket.objects.filter(name=self.name).first()
+        if bucket is None:
+            return self.burst
+        return int(self._refill(bucket.tokens, time.time() - bucket.updated_at))
+
+
+class Lane:
+    """A priority class of model calls with its own slot limit, queue bound and wait time"""
+
+    def __init__(self, name, max_concurrency, max_queue, queue_timeout, wait_for_tokens=False):
+        self.name = name
+        self.max_concurrency = max(int(max_concurrency), 1)
+        self.max_queue = max(int(max_queue), 0)
+        self.queue_timeout = queue_timeout
+        # Wait for the bucket to refill instead of being shed right away
+        self.wait_for_tokens = wait_for_tokens
+        self.active = 0
+        self.waiters = deque()
+        self.wait_seconds = 0.0
+
+
+@contextmanager
+def ai_lane(lane, deadline=None):
+    """
+    Run the model calls made in this block in ``lane``
+
+    ``deadline`` (seconds from now; ``AI_BATCH_DEADLINE`` for the batch lane
+    by default) drops calls that are still waiting for a token or a slot when
+    it passes; they get their fallback result. Tasks and threads started
+    inside the block, such as ``asyncio.gather`` or ``sync_to_async``,
+    inherit the lane.
+    """
+    if lane not in LANES:
+        raise ValueError(f"Unknown AI lane {lane!r}, expected one of: {', '.join(LANES)}")
+    if deadline is None and lane == 'batch':
+        deadline = getattr(settings, 'AI_BATCH_DEADLINE', 300)
+    token = _current_lane.set((lane, time.monotonic() + deadline if deadline else None))
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+
+class _Waiter:
+    """A queued call; ``wake`` grants it a slot or drops it, from any thread"""
+    __slots__ = ('lane', 'deadline', 'event', 'loop', 'future', 'state')
+
+    def __init__(self, lane, deadline, loop=None):
+        self.lane = lane
+        self.deadline = deadline
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = None if loop else threading.Event()
+        self.state = None
+
+    def wake(self, state):
+        self.state = state
+        if self.future is not None:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+        else:
+            self.event.set()
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AdmissionController:
+    """
+    At most ``max_concurrency`` model calls at a time, split into priority lanes
+
+    Each lane caps its own running calls and queue, so batch work can never
+    take every slot. A freed slot goes to the oldest waiter of the highest
+    priority lane that is below its cap. Works for threads and event loops
+    alike.
+    """
+
+    def __init__(self, max_concurrency, lanes, bucket=None):
+        self.max_concurrency = max(int(max_concurrency), 1)
+        self.lanes = {lane.name: lane for lane in sorted(lanes, key=lambda lane: LANES.index(lane.name))}
+        self.bucket = bucket
+        self.active = 0
+        self.counts = Counter()
+        # Counted since the last flush to the shared totals
+        self._unflushed = Counter()
+        self._next_flush = 0.0
+        # Backend name -> monotonic time until which calls skip it
+        self._backoff_until = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls):
+        max_concurrency = getattr(settings, 'AI_MAX_CONCURRENCY', 4)
+        rate, burst = getattr(settings, 'AI_RATE_LIMIT', 0), getattr(settings, 'AI_RATE_BURST', 20)
+        if getattr(settings, 'AI_RATE_LIMIT_SHARED', False):
+            bucket = SharedTokenBucket('requests', rate, burst)
+        else:
+            # Each worker process gets its share of the configured limit
+            workers = max(getattr(settings, 'WEB_CONCURRENCY', 1), 1)
+            bucket = TokenBucket(rate / workers, max(burst // workers, 1))
+        return cls(
+            max_concurrency,
+            lanes=[
+                Lane(
+                    'interactive', max_concurrency,
+                    getattr(settings, 'AI_MAX_QUEUE', 32), getattr(settings, 'AI_QUEUE_TIMEOUT', 10.0),
+                ),
+                Lane(
+                    'batch', getattr(settings, 'AI_BATCH_MAX_CONCURRENCY', 2),
+                    getattr(settings, 'AI_BATCH_MAX_QUEUE', 256), getattr(settings, 'AI_BATCH_QUEUE_TIMEOUT', 120.0),
+                    wait_for_tokens=True,
+                ),
+            ],
+            bucket=bucket,
+        )
+
+    def _record(self, lane, decision):
+        with self._lock:
+            self.counts[lane.name, decision] += 1
+            self._unflushed[lane.name, decision] += 1
+
+    def _due_counts(self, force=False):
+        """Counts to add to the shared totals, at most every ``METRICS_FLUSH_SECONDS``"""
+        now = time.monotonic()
+        with self._lock:
+            if not self._unflushed or (now < self._next_flush and not force):
+                return None
+            self._next_flush = now + METRICS_FLUSH_SECONDS
+            counts, self._unflushed = self._unflushed, Counter()
+        return counts
+
+    @staticmethod
+    def _flush_counts(counts):
+        try:
+            cache = _metrics_cache()
+            for (lane, decision), count in counts.items():
+                _incr(cache, f'{KEY_PREFIX}:count:{lane}:{decision}', count)
+        except Exception:
+            pass  # metrics must never fail a request
+
+    def back_off(self, backend, seconds=None):
+        """Skip ``backend`` for ``seconds`` (``AI_BACKEND_BACKOFF``) after it answered with a rate limit"""
+        if seconds is None:
+            seconds = getattr(settings, 'AI_BACKEND_BACKOFF', 60.0)
+        with self._lock:
+            until = time.monotonic() + seconds
+            self._backoff_until[backend] = max(until, self._backoff_until.get(backend, 0.0))
+
+    def backing_off(self, backend):
+        with self._lock:
+            return self._backoff_until.get(backend, 0.0) > time.monotonic()
+
+    def _take(self):
+        return self.bucket is None or self.bucket.take()
+
+    async def _atake(self):
+        return self.bucket is None or await self.bucket.atake()
+
+    def _refund(self):
+        if self.bucket is not None:
+            self.bucket.refund()
+
+    async def _arefund(self):
+        if self.bucket is not None:
+            await self.bucket.arefund()
+
+    def _shed(self, lane, decision, reason):
+        self._record(lane, decision)
+        return Overloaded(reason)
+
+    def _current(self):
+        """``(lane, deadline, give_up_at)`` for a call made now"""
+        name, deadline = _current_lane.get()
+        lane = self.lanes[name]
+        give_up_at = time.monotonic() + lane.queue_timeout
+        if deadline is not None:
+            if deadline <= time.monotonic():
+                raise self._shed(lane, 'shed_deadline', 'deadline passed')
+            give_up_at = min(give_up_at, deadline)
+        return lane, deadline, give_up_at
+
+    def _token_delay(self, taken, lane, deadline, give_up_at):
+        """None once a token is ``taken``, else seconds to sleep before trying again"""
+        if taken:
+            return None
+        delay = 1 / self.bucket.rate
+        if not lane.wait_for_tokens or time.monotonic() + delay > give_up_at:
+            if deadline is not None and time.monotonic() + delay > deadline:
+                raise self._shed(lane, 'shed_deadline', 'deadline passed')
+            raise self._shed(lane, 'shed_rate_limited', 'rate limit')
+        return delay
+
+    def _can_start(self, lane):
+        return self.active < self.max_concurrency and lane.active < lane.max_concurrency
+
+    def _start(self, lane):
+        self.active += 1
+        lane.active += 1
+
+    def _enter(self, lane, deadline, loop=None):
+        """A slot right away (None), a waiter to wait on, or ``Overloaded``"""
+        with self._lock:
+            # Callers of this and higher priority lanes that are already waiting go first
+            ahead = any(other.waiters for other in self.lanes.values() if LANES.index(other.name) <= LANES.index(lane.name))
+            if not ahead and self._can_start(lane):
+                self._start(lane)
+                waiter = None
+            elif len(lane.waiters) >= lane.max_queue:
+                waiter = False
+            else:
+                waiter = _Waiter(lane, deadline, loop)
+                lane.waiters.append(waiter)
+        if waiter is False:
+            raise self._shed(lane, 'shed_queue_full', 'queue full')
+        self._record(lane, 'queued' if waiter else 'admitted')
+        return waiter
+
+    def _dispatch(self):
+        """Hand free slots to waiters, highest priority lane first (lock held)"""
+        now = time.monotonic()
+        for lane in self.lanes.values():
+            while lane.waiters and self._can_start(lane):
+                waiter = lane.waiters.popleft()
+                if waiter.deadline is not None and waiter.deadline <= now:
+                    waiter.wake('dropped')
+                    continue
+                self._start(lane)
+                waiter.wake('granted')
+
+    def _release(self, lane):
+        with self._lock:
+            self.active -= 1
+            lane.active -= 1
+            self._dispatch()
+
+    def _finish_wait(self, waiter, started):
+        """Keep the granted slot, or stop waiting and raise ``Overloaded``"""
+        with self._lock:
+            waiter.lane.wait_seconds += time.monotonic() - started
+            if waiter.state == 'granted':
+                granted = True
+            else:
+                granted = False
+                if waiter.state is None:
+                    waiter.lane.waiters.remove(waiter)
+        if granted:
+            self._record(waiter.lane, 'admitted')
+            return
+        if waiter.state == 'dropped' or (waiter.deadline is not None and waiter.deadline <= time.monotonic()):
+            raise self._shed(waiter.lane, 'shed_deadline', 'deadline passed')
+        raise self._shed(waiter.lane, 'shed_timeout', 'queue timeout')
+
+    def _cancel_wait(self, waiter):
+        with self._lock:
+            if waiter.state is None:
+                waiter.lane.waiters.remove(waiter)
+                return
+        if waiter.state == 'granted':
+            self._release(waiter.lane)
+
+    @contextmanager
+    def admit(self):
+        if counts := self._due_counts():
+            self._flush_counts(counts)
+        lane, deadline, give_up_at = self._current()
+        while (delay := self._token_delay(self._take(), lane, deadline, give_up_at)) is not None:
+            time.sleep(delay)
+        try:
+            waiter = self._enter(lane, deadline)
+            if waiter is not None:
+                started = time.monotonic()
+                waiter.event.wait(max(0.0, give_up_at - started))
+                self._finish_wait(waiter, started)
+        except Overloaded:
+            # The call never ran, so its token goes back to admitted traffic
+            self._refund()
+            raise
+        try:
+            yield
+        finally:
+            self._release(lane)
+
+    @asynccontextmanager
+    async def aadmit(self):
+        if counts := self._due_counts():
+            await sync_to_async(self._flush_counts)(counts)
+        lane, deadline, give_up_at = self._current()
+        while (delay := self._token_delay(await self._atake(), lane, deadline, give_up_at)) is not None:
+            await asyncio.sleep(delay)
+        try:
+            waiter = self._enter(lane, deadline, asyncio.get_running_loop())
+            if waiter is not None:
+                started = time.monotonic()
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter.future), max(0.0, give_up_at - started))
+                except asyncio.TimeoutError:
+                    pass
+                except asyncio.CancelledError:
+                    self._cancel_wait(waiter)
+                    raise
+                self._finish_wait(waiter, started)
+        except Overloaded:
+            await self._arefund()
+            raise
+        try:
+            yield
+        finally:
+            self._release(lane)
+
+    def metrics(self):
+        """Counters and load; touches the cache and maybe the database, so call it from sync code"""
+        if counts := self._due_counts(force=True):
+            self._flush_counts(counts)
+        cache = _metrics_cache()
+        shared = cache.get_many([
+            f'{KEY_PREFIX}:count:{lane}:{decision}' for lane in self.lanes for decision in DECISIONS
+        ])
+        with self._lock:
+            lanes = {
+                name: {
+                    'max_concurrency': lane.max_concurrency,
+                    'max_queue': lane.max_queue,
+                    'queue_timeout': lane.queue_timeout,
+                    'active': lane.active,
+                    'waiting': len(lane.waiters),
+                    'wait_seconds': round(lane.wait_seconds, 3),
+                    'process': {decision: self.counts[name, decision] for decision in DECISIONS},
+                    'all_workers': {
+                        decision: shared.get(f'{KEY_PREFIX}:count:{name}:{decision}', 0) for decision in DECISIONS
+                    },
+                }
+                for name, lane in self.lanes.items()
+            }
+            active = self.active
+        return {
+            'rate_per_second': self.bucket.rate if self.bucket else None,
+            'burst': self.bucket.burst if self.bucket else None,
+            'tokens_available': self.bucket.available() if self.bucket else None,
+            'max_concurrency': self.max_concurrency,
+            'active': active,
+            'lanes': lanes,
+        }
@@ -1,11 +1,104 @@
 import os
+import re
 import json
-import requests
-import backoff
+import asyncio
+import contextvars
+import functools
+import threading
+import weakref
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from django.conf import settings
-from typing import Dict, List, Optional, Any
-from openai import OpenAI
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Any, Tuple
+
+from smart_todo.profiling import timed
+
+from .admission import AdmissionController
+from .llm_pool import LLMPool
+
+# openai, httpx, requests and backoff are imported on first use: most
+# processes (migrations, management commands, workers that never serve AI
+# traffic) would otherwise pay several hundred milliseconds at startup.
+if TYPE_CHECKING:
+    import httpx
+
+
+def _retry(**options):
+    """``backoff.on_exception(backoff.expo, Exception, **options)``, importing backoff on first call"""
+
+    def decorator(func):
+        retrying = None
+
+        def get_retrying():
+            nonlocal retrying
+            if retrying is None:
+                import backoff
+                retrying = backoff.on_exception(backoff.expo, Exception, **options)(func)
+            return retrying
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await get_retrying()(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return get_retrying()(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+# (messages, parse, fallback): messages is None when no AI call is needed,
+# parse turns the model's reply into a result (raising falls back) and
+# fallback computes the keyword-based result.
+AIRequest = Tuple[Optional[List[Dict]], Callable[[str], Any], Callable[[], Any]]
+
+_current_outcome = contextvars.ContextVar('ai_outcome', default=None)
+
+
+class AIOutcome:
+    """How the model calls made inside ``track_outcome`` ended"""
+
+    def __init__(self):
+        self.answered = 0
+        self.fallbacks = 0
+        self._lock = threading.Lock()
+
+    def record(self, answered):
+        with self._lock:
+            if answered:
+                self.answered += 1
+            else:
+                self.fallbacks += 1
+
+    @property
+    def status(self) -> str:
+        """``fallback`` when any call was answered from the keyword fallbacks"""
+        return 'fallback' if self.fallbacks else 'success'
+
+
+@contextmanager
+def track_outcome():
+    """
+    Count the answered and fallback calls of one request
+
+    Tasks and threads started inside the block, such as ``asyncio.gather``
+    or ``sync_to_async``, record into the same ``AIOutcome``.
+    """
+    outcome = AIOutcome()
+    token = _current_outcome.set(outcome)
+    try:
+        yield outcome
+    finally:
+        _current_outcome.reset(token)
+
+
+def _record_outcome(answered):
+    outcome = _current_outcome.get()
+    if outcome is not None:
+        outcome.record(answered)
 
 
 class AIProcessor:
@@ -13,22 +106,98 @@ class AIProcessor:
     
     def __init__(self):
         self.openai_api_key = getattr(settings, 'OPENAI_API_KEY', '')
-        self.local_llm_url = getattr(settings, 'LOCAL_LLM_URL', '')
+        # Local backends, balanced by load and latency; see ``llm_pool``
+        self.local_llm_pool = LLMPool.from_settings()
         self.model = 'gpt-4o-mini'
-        self.rate_limited = True  # Temporarily disable OpenAI due to rate limits
+        self.openai_enabled = False  # Temporarily disable OpenAI due to rate limits
         
-        # Initialize OpenAI client with the new format
-        self.openai_client = None
-        if self.openai_api_key:
-            try:
-                self.openai_client = OpenAI(api_key=self.openai_api_key)
-            except Exception as e:
-                print(f"Failed to initialize OpenAI client: {e}")
-                self.openai_client = None
+        # The OpenAI client is built on first use, see ``openai_client``
+        self._openai_client = None
+        self._openai_client_ready = False
+        self._client_lock = threading.Lock()
+
+        # Async clients per event loop: their connection pools are bound to
+        # the loop that opened them. See ``_close_at_loop_shutdown``.
+        self._loop_clients = weakref.WeakKeyDictionary()
+
+        # Rate limit and bounded queue in front of every model call
+        self.admission = AdmissionController.from_settings()
+
+    @property
+    def openai_client(self):
+        """OpenAI client, created once on first access; None without an API key"""
+        if not self._openai_client_ready:
+            with self._client_lock:
+                if not self._openai_client_ready:
+                    if self.openai_api_key:
+                        try:
+                            from openai import OpenAI
+                            self._openai_client = OpenAI(api_key=self.openai_api_key)
+                        except Exception as e:
+                            print(f"Failed to initialize OpenAI client: {e}")
+                            self._openai_client = None
+                    self._openai_client_ready = True
+        return self._openai_client
+
+    @property
+    def rate_limited(self) -> bool:
+        """Whether OpenAI is skipped: disabled, or backing off after a rate limit answer"""
+        return not self.openai_enabled or self.admission.backing_off('openai')
+
+    @property
+    def local_llm_url(self) -> str:
+        """First configured local backend, empty when there is none"""
+        return self.local_llm_pool.endpoints[0].url if self.local_llm_pool else ''
+
+    def _async_clients(self) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        entry = self._loop_clients.get(loop)
+        if entry is None:
+            clients = {}
+            closer = self._close_at_loop_shutdown(loop, clients)
+            # Starting it registers it with the loop; the entry keeps it alive
+            asyncio.ensure_future(closer.asend(None))
+            entry = self._loop_clients[loop] = (clients, closer)
+        return entry[0]
+
+    async def _close_at_loop_shutdown(self, loop, clients):
+        """
+        Hold the async ``clients`` of ``loop`` open until it shuts down
+
+        ``asyncio.run`` closes the async generators still open before it
+        closes its loop, which runs this ``finally``. That covers the
+        long-lived loop of an ASGI server and the loop Django starts for each
+        async view request under WSGI, which would otherwise leak a
+        connection pool per request.
+        """
+        try:
+            yield
+        finally:
+            # The generator refers to the loop, so the weak key never clears
+            self._loop_clients.pop(loop, None)
+            http = clients.pop('http', None)
+            if http is not None:
+                await http.aclose()
+            openai = clients.pop('openai', None)
+            if openai is not None:
+                await openai.close()
+
+    def async_http_client(self) -> 'httpx.AsyncClient':
+        """Shared httpx client for the running event loop"""
+        clients = self._async_clients()
+        if 'http' not in clients:
+            import httpx
+            clients['http'] = httpx.AsyncClient(timeout=30)
+        return clients['http']
+
+    def _async_openai_client(self):
+        clients = self._async_clients()
+        if 'openai' not in clients:
+            from openai import AsyncOpenAI
+            clients['openai'] = AsyncOpenAI(api_key=self.openai_api_key) if self.openai_client else None
+        return clients['openai']
     
-    @backoff.on_exception(
-        backoff.expo, 
-        Exception, 
+    @_retry(
         max_tries=2, 
         max_time=30,
         giveup=lambda e: "429" in str(e) or "rate limit" in str(e).lower()
@@ -56,55 +225,200 @@ class AIProcessor:
             else:
                 raise Exception(f"OpenAI API call failed: {str(e)}")
     
-    @backoff.on_exception(backoff.expo, Exception, max_tries=3, max_time=60)
+    @_retry(max_tries=3, max_time=60)
     def _call_local_llm(self, messages: List[Dict]) -> str:
-        """Call local LLM (LM Studio) with retry logic"""
-        if not self.local_llm_url:
-            raise ValueError("Local LLM URL not configured")
-        
+        """Call the least loaded local LLM (LM Studio) with retry logic; each try picks again"""
         data = {
             'messages': messages,
             'temperature': 0.7,
             'max_tokens': 1000
         }
         
-        response = requests.post(
-            self.local_llm_url,
-            json=data,
-            timeout=30
-        )
-        response.raise_for_status()
-        
-        result = response.json()
-        return result['choices'][0]['message']['content']
+        import requests
+        with self.local_llm_pool.request() as url:
+            response = requests.post(
+                url,
+                json=data,
+                timeout=30
+            )
+            response.raise_for_status()
+            result = response.json()
+            return result['choices'][0]['message']['content']
     
-    def _make_ai_request(self, messages: List[Dict]) -> str:
-        """Make AI request with fallback from OpenAI to local LLM"""
+    @_retry(
+        max_tries=2, 
+        max_time=30,
+        giveup=lambda e: "429" in str(e) or "rate limit" in str(e).lower()
+    )
+    async def _acall_openai(self, messages: List[Dict]) -> str:
+        """Awaitable ``_call_openai`` using the async OpenAI client"""
+        client = self._async_openai_client()
+        if not client:
+            raise ValueError("OpenAI client not initialized. Check API key configuration.")
+
         try:
-            # Skip OpenAI if we know we're rate limited
-            if self.openai_client and not self.rate_limited:
-                return self._call_openai(messages)
-            elif self.local_llm_url:
-                return self._call_local_llm(messages)
-            else:
-                raise ValueError("No AI backend configured. Please set OPENAI_API_KEY or LOCAL_LLM_URL")
+            response = await client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=1000,
+                timeout=15
+            )
+            return response.choices[0].message.content
         except Exception as e:
             error_msg = str(e).lower()
-            # Mark as rate limited and fail fast to trigger fallback
-            if "rate limit" in error_msg or "429" in str(e):
-                self.rate_limited = True
+            if "429" in str(e) or "rate limit" in error_msg:
                 raise Exception("Rate limit exceeded. Please try again later.")
-            
-            # Try fallback if primary method fails for other reasons
-            if self.openai_client and self.local_llm_url:
-                try:
+            elif "timeout" in error_msg:
+                raise Exception("Request timeout. Please try again.")
+            else:
+                raise Exception(f"OpenAI API call failed: {str(e)}")
+
+    @_retry(max_tries=3, max_time=60)
+    async def _acall_local_llm(self, messages: List[Dict]) -> str:
+        """Awaitable ``_call_local_llm`` using httpx"""
+        data = {
+            'messages': messages,
+            'temperature': 0.7,
+            'max_tokens': 1000
+        }
+
+        with self.local_llm_pool.request() as url:
+            response = await self.async_http_client().post(url, json=data, timeout=30)
+            response.raise_for_status()
+            result = response.json()
+            return result['choices'][0]['message']['content']
+
+    def _make_ai_request(self, messages: List[Dict]) -> str:
+        """Make AI request with fallback from OpenAI to local LLM; raises ``Overloaded`` when shed"""
+        with self.admission.admit():
+            try:
+                # Skip OpenAI if we know we're rate limited
+                if not self.rate_limited and self.openai_client:
+                    return self._call_openai(messages)
+                elif self.local_llm_url:
                     return self._call_local_llm(messages)
-                except:
-                    pass
-            raise e
+                else:
+                    raise ValueError("No AI backend configured. Please set OPENAI_API_KEY or LOCAL_LLM_URL")
+            except Exception as e:
+                error_msg = str(e).lower()
+                # Mark as rate limited and fail fast to trigger fallback
+                if "rate limit" in error_msg or "429" in str(e):
+                    self.admission.back_off('openai')
+                    raise Exception("Rate limit exceeded. Please try again later.")
+            
+                # Try fallback if primary method fails for other reasons
+                if self.local_llm_url and self.openai_client:
+                    try:
+                        return self._call_local_llm(messages)
+                    except:
+                        pass
+                raise e
     
+    async def _amake_ai_request(self, messages: List[Dict]) -> str:
+        """Awaitable ``_make_ai_request``, same backend order and fallback"""
+        async with self.admission.aadmit():
+            try:
+                if not self.rate_limited and self.openai_client:
+                    return await self._acall_openai(messages)
+                elif self.local_llm_url:
+                    return await self._acall_local_llm(messages)
+                else:
+                    raise ValueError("No AI backend configured. Please set OPENAI_API_KEY or LOCAL_LLM_URL")
+            except Exception as e:
+                error_msg = str(e).lower()
+                if "rate limit" in error_msg or "429" in str(e):
+                    self.admission.back_off('openai')
+                    raise Exception("Rate limit exceeded. Please try again later.")
+
+                if self.local_llm_url and self.openai_client:
+                    try:
+                        return await self._acall_local_llm(messages)
+                    except:
+                        pass
+                raise e
+
+    def _complete(self, request: AIRequest, use_fallback: bool = True) -> Any:
+        """The parsed model answer; the fallback on any error, or the error without ``use_fallback``"""
+        messages, parse, fallback = request
+        if messages is None:
+            return fallback()
+        with timed('ai'):
+            try:
+                result = parse(self._make_ai_request(messages))
+            except Exception:
+                _record_outcome(False)
+                if not use_fallback:
+                    raise
+                return fallback()
+            _record_outcome(True)
+            return result
+
+    async def _acomplete(self, request: AIRequest, use_fallback: bool = True) -> Any:
+        messages, parse, fallback = request
+        if messages is None:
+            return fallback()
+        with timed('ai'):
+            try:
+                result = parse(await self._amake_ai_request(messages))
+            except Exception:
+                _record_outcome(False)
+                if not use_fallback:
+                    raise
+                return fallback()
+            _record_outcome(True)
+            return result
+
     def analyze_context(self, context_entries: List[Dict]) -> Dict[str, Any]:
         """Analyze daily context entries to extract insights"""
+        return self._complete(self._context_request(context_entries))
+
+    async def aanalyze_context(self, context_entries: List[Dict]) -> Dict[str, Any]:
+        return await self._acomplete(self._context_request(context_entries))
+
+    def suggest_task_priority(self, task_data: Dict, context_analysis: Dict) -> int:
+        """Suggest task priority based on task details and context"""
+        return self._complete(self._priority_request(task_data, context_analysis))
+
+    async def asuggest_task_priority(self, task_data: Dict, context_analysis: Dict) -> int:
+        return await self._acomplete(self._priority_request(task_data, context_analysis))
+
+    def suggest_deadline(self, task_data: Dict, context_analysis: Dict) -> Optional[str]:
+        """Suggest realistic deadline for a task"""
+        return self._complete(self._deadline_request(task_data, context_analysis))
+
+    async def asuggest_deadline(self, task_data: Dict, context_analysis: Dict) -> Optional[str]:
+        return await self._acomplete(self._deadline_request(task_data, context_analysis))
+
+    def suggest_categories_and_tags(self, task_data: Dict, existing_categories: List[str]) -> Dict[str, List[str]]:
+        """Suggest categories and tags for a task"""
+        return self._complete(self._categories_request(task_data, existing_categories))
+
+    async def asuggest_categories_and_tags(self, task_data: Dict, existing_categories: List[str]) -> Dict[str, List[str]]:
+        return await self._acomplete(self._categories_request(task_data, existing_categories))
+
+    def enhance_task_description(self, task_data: Dict, context_analysis: Dict) -> str:
+        """Enhance task description with context-aware details"""
+        return self._complete(self._description_request(task_data, context_analysis))
+
+    async def aenhance_task_description(self, task_data: Dict, context_analysis: Dict) -> str:
+        return await self._acomplete(self._description_request(task_data, context_analysis))
+
+    def rank_tasks(self, tasks: List[Dict], context_analysis: Optional[Dict] = None,
+                   use_fallback: bool = True) -> List[int]:
+        """
+        Order task summaries (see ai_module.ranking) most urgent first; returns their ids
+
+        Without ``use_fallback``, a failed or shed call raises instead of
+        returning the heuristic order.
+        """
+        return self._complete(self._ranking_request(tasks, context_analysis), use_fallback)
+
+    async def arank_tasks(self, tasks: List[Dict], context_analysis: Optional[Dict] = None,
+                          use_fallback: bool = True) -> List[int]:
+        return await self._acomplete(self._ranking_request(tasks, context_analysis), use_fallback)
+
+    def _context_request(self, context_entries: List[Dict]) -> AIRequest:
         # Fallback analysis for when AI is unavailable
         def fallback_analysis():
             if not context_entries:
@@ -147,7 +461,7 @@ class AIProcessor:
             }
         
         if not context_entries:
-            return fallback_analysis()
+            return None, None, fallback_analysis
         
         context_text = "\n".join([
             f"[{entry.get('source', 'unknown')}] {entry.get('content', '')}"
@@ -171,8 +485,7 @@ class AIProcessor:
             }
         ]
         
-        try:
-            response = self._make_ai_request(messages)
+        def parse(response):
             # Try to parse as JSON, fallback to structured text
             try:
                 return json.loads(response)
@@ -184,11 +497,10 @@ class AIProcessor:
                     'time_constraints': [],
                     'mood_tone': 'neutral'
                 }
-        except Exception as e:
-            return fallback_analysis()
+        
+        return messages, parse, fallback_analysis
     
-    def suggest_task_priority(self, task_data: Dict, context_analysis: Dict) -> int:
-        """Suggest task priority based on task details and context"""
+    def _priority_request(self, task_data: Dict, context_analysis: Dict) -> AIRequest:
         # Fallback logic for when AI is unavailable
         def fallback_priority():
             title = task_data.get('title', '').lower()
@@ -234,20 +546,17 @@ class AIProcessor:
             }
         ]
         
-        try:
-            response = self._make_ai_request(messages)
+        def parse(response):
             # Extract numeric value from response
-            import re
             numbers = re.findall(r'\d+', response)
             if numbers:
                 priority = int(numbers[0])
                 return max(0, min(100, priority))  # Clamp between 0-100
             return fallback_priority()
-        except Exception:
-            return fallback_priority()
+        
+        return messages, parse, fallback_priority
     
-    def suggest_deadline(self, task_data: Dict, context_analysis: Dict) -> Optional[str]:
-        """Suggest realistic deadline for a task"""
+    def _deadline_request(self, task_data: Dict, context_analysis: Dict) -> AIRequest:
         messages = [
             {
                 'role': 'system',
@@ -268,13 +577,11 @@ class AIProcessor:
             }
         ]
         
-        try:
-            response = self._make_ai_request(messages)
+        def parse(response):
             if 'flexible' in response.lower() or 'no deadline' in response.lower():
                 return None
             
             # Try to extract ISO date from response
-            import re
             iso_pattern = r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}'
             matches = re.findall(iso_pattern, response)
             if matches:
@@ -287,11 +594,10 @@ class AIProcessor:
                 return f"{matches[0]}T17:00:00"  # Default to 5 PM
             
             return None
-        except Exception:
-            return None
+        
+        return messages, parse, lambda: None
     
-    def suggest_categories_and_tags(self, task_data: Dict, existing_categories: List[str]) -> Dict[str, List[str]]:
-        """Suggest categories and tags for a task"""
+    def _categories_request(self, task_data: Dict, existing_categories: List[str]) -> AIRequest:
         # Fallback logic for when AI is unavailable
         def fallback_categorization():
             title = task_data.get('title', '').lower()
@@ -362,8 +668,7 @@ class AIProcessor:
             }
         ]
         
-        try:
-            response = self._make_ai_request(messages)
+        def parse(response):
             try:
                 result = json.loads(response)
                 return {
@@ -383,11 +688,10 @@ class AIProcessor:
                         tags.extend([tag.strip() for tag in line.split(':')[-1].split(',')])
                 
                 return {'category': category, 'tags': tags[:5]}
-        except Exception:
-            return fallback_categorization()
+        
+        return messages, parse, fallback_categorization
     
-    def enhance_task_description(self, task_data: Dict, context_analysis: Dict) -> str:
-        """Enhance task description with context-aware details"""
+    def _description_request(self, task_data: Dict, context_analysis: Dict) -> AIRequest:
         # Fallback logic for when AI is unavailable
         def fallback_description():
             title = task_data.get('title', '')
@@ -433,12 +737,77 @@ class AIProcessor:
             }
         ]
         
-        try:
-            response = self._make_ai_request(messages)
-            return response.strip()
-        except Exception:
-            return fallback_description()
+        return messages, lambda response: response.strip(), fallback_description
+
+    def _ranking_request(self, tasks: List[Dict], context_analysis: Optional[Dict]) -> AIRequest:
+        fallback_order = heuristic_task_order(tasks)
+
+        def parse_ranking(response):
+            match = re.search(r'\[.*?\]', response, re.DOTALL)
+            if not match:
+                raise ValueError('No JSON array in ranking response')
+            known = set(fallback_order)
+            ranked = []
+            for value in json.loads(match.group()):
+                task_id = int(value)
+                if task_id in known and task_id not in ranked:
+                    ranked.append(task_id)
+            if not ranked:
+                raise ValueError('Ranking response names none of the tasks')
+            # Ids the model dropped keep their heuristic order, after the rest
+            return ranked + [task_id for task_id in fallback_order if task_id not in ranked]
+
+        if len(tasks) < 2:
+            return None, parse_ranking, lambda: fallback_order
+
+        lines = [
+            f"{task['id']} | due {task.get('deadline') or 'none'} | priority {task.get('priority', 0)} | "
+            f"{task.get('category') or 'no category'} | {task.get('title', '')}"
+            + (f" - {task['description']}" if task.get('description') else '')
+            for task in tasks
+        ]
+        context = ''
+        if context_analysis:
+            context = f"""
+                Current context: themes {context_analysis.get('key_themes', [])}, urgency indicators {context_analysis.get('urgency_indicators', [])}"""
+        messages = [
+            {
+                'role': 'system',
+                'content': '''You are an AI assistant that prioritizes a task backlog.
+                Rank the given tasks relative to each other by how urgently they should be done,
+                considering deadlines, urgency words, importance and the user's current context.
+                
+                Return only a JSON array of the task ids, most urgent first, with every id exactly once.'''
+            },
+            {
+                'role': 'user',
+                'content': f"""Today is {datetime.now().strftime('%Y-%m-%d')}.{context}
+                
+                Tasks (id | deadline | current priority | category | title - description):
+                {chr(10).join(lines)}
+                
+                Rank these {len(tasks)} tasks."""
+            }
+        ]
+
+        return messages, parse_ranking, lambda: fallback_order
+
+
+def heuristic_task_order(tasks: List[Dict]) -> List[int]:
+    """Task ids ordered without the model: urgent keywords, then nearest deadline, then priority"""
+    urgent_keywords = ['urgent', 'asap', 'critical', 'important', 'deadline', 'overdue']
+
+    def urgency(task):
+        text = f"{task.get('title', '')} {task.get('description', '')}".lower()
+        return (
+            not any(keyword in text for keyword in urgent_keywords),
+            task.get('deadline') is None,
+            task.get('deadline') or '',
+            -task.get('priority', 0),
+        )
+
+    return [task['id'] for task in sorted(tasks, key=urgency)]
 
 
-# Global instance
+# Global instance; cheap to create, backends are built on first use
 ai_processor = AIProcessor()
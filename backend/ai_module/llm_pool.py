@@ -0,0 +1,229 @@
+"""
+Load balancing over several OpenAI-compatible local LLM endpoints.
+
+``LOCAL_LLM_URLS`` lists the chat-completions URLs of the local backends
+(LM Studio, llama.cpp server, vLLM, ...). Each call goes to the endpoint
+with the lowest ``(outstanding requests + 1) * EWMA latency``. A busy or
+slow backend therefore gets less traffic, and adding a URL adds capacity.
+
+An endpoint that fails ``LOCAL_LLM_EJECT_AFTER`` times in a row is ejected.
+Only connection errors, timeouts and 5xx answers count as failures; a 4xx
+answer or an unusable reply is the request's fault, not the endpoint's.
+The ejection lasts ``LOCAL_LLM_EJECT_SECONDS`` at first and doubles with
+each further ejection, up to 16 times. A background thread probes ejected
+endpoints (``GET /v1/models``) every ``LOCAL_LLM_HEALTH_INTERVAL`` seconds
+and brings them back as soon as one answers. An endpoint whose ejection
+expires also gets a trial request. Only a successful request resets the
+backoff: an endpoint that answers probes but fails completions is ejected
+again, for twice as long, on its next failure. When every endpoint is ejected, the one
+due back first still serves, so traffic never stops entirely.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Weight of the newest sample in the latency average
+EWMA_ALPHA = 0.3
+# Assumed latency of endpoints without samples, when no endpoint has one
+DEFAULT_LATENCY = 1.0
+MAX_EJECT_DOUBLINGS = 4
+PROBE_TIMEOUT = 3
+
+
+def models_url(url):
+    """The ``/v1/models`` URL next to a chat-completions URL, used as health check"""
+    return url.replace('/v1/chat/completions', '/v1/models')
+
+
+def is_endpoint_failure(error):
+    """Whether ``error`` counts against the endpoint: a transport error or a 5xx answer"""
+    import httpx
+    import requests
+
+    if isinstance(error, (httpx.TransportError, requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, (httpx.HTTPStatusError, requests.HTTPError)):
+        response = getattr(error, 'response', None)
+        return response is not None and response.status_code >= 500
+    return False
+
+
+def is_healthy_status(status_code):
+    """Whether a health-check answer shows a working endpoint; only a 5xx does not"""
+    return status_code < 500
+
+
+class LLMEndpoint:
+    def __init__(self, url):
+        self.url = url
+        self.outstanding = 0
+        self.latency = None
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.last_error = None
+
+    def is_ejected(self, now):
+        return self.ejected_until > now
+
+    def status(self, now):
+        return {
+            'url': self.url,
+            'healthy': not self.is_ejected(now),
+            'outstanding': self.outstanding,
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+            'requests': self.requests,
+            'failures': self.failures,
+            'ejected_for_seconds': round(max(0.0, self.ejected_until - now), 1),
+            'last_error': self.last_error,
+        }
+
+
+class LLMPool:
+    """Least-loaded endpoint selection with passive ejection and active health checks"""
+
+    def __init__(self, urls, eject_after=3, eject_seconds=10.0, health_interval=10.0):
+        self.endpoints = [LLMEndpoint(url) for url in dict.fromkeys(url for url in urls if url)]
+        self.eject_after = max(int(eject_after), 1)
+        self.eject_seconds = eject_seconds
+        self.health_interval = health_interval
+        self._lock = threading.Lock()
+        self._health_thread = None
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            getattr(settings, 'LOCAL_LLM_URLS', None) or [getattr(settings, 'LOCAL_LLM_URL', '')],
+            eject_after=getattr(settings, 'LOCAL_LLM_EJECT_AFTER', 3),
+            eject_seconds=getattr(settings, 'LOCAL_LLM_EJECT_SECONDS', 10.0),
+            health_interval=getattr(settings, 'LOCAL_LLM_HEALTH_INTERVAL', 10.0),
+        )
+
+    def __bool__(self):
+        return bool(self.endpoints)
+
+    def _score(self, endpoint, fallback_latency):
+        latency = endpoint.latency if endpoint.latency is not None else fallback_latency
+        return (endpoint.outstanding + 1) * latency, endpoint.requests
+
+    def _pick(self, now):
+        candidates = [endpoint for endpoint in self.endpoints if not endpoint.is_ejected(now)]
+        if not candidates:
+            # Panic mode: all ejected, use the one that is due back first
+            return min(self.endpoints, key=lambda endpoint: endpoint.ejected_until)
+        known = [endpoint.latency for endpoint in candidates if endpoint.latency is not None]
+        # Endpoints without samples look as fast as the fastest, so they get tried
+        fallback_latency = min(known) if known else DEFAULT_LATENCY
+        return min(candidates, key=lambda endpoint: self._score(endpoint, fallback_latency))
+
+    @contextmanager
+    def request(self):
+        """Choose an endpoint and yield its URL; the outcome and latency are recorded"""
+        if not self.endpoints:
+            raise ValueError("Local LLM URL not configured")
+        self._ensure_health_thread()
+        with self._lock:
+            endpoint = self._pick(time.monotonic())
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+        started = time.monotonic()
+        succeeded = False
+        try:
+            yield endpoint.url
+            succeeded = True
+        except Exception as e:
+            if is_endpoint_failure(e):
+                with self._lock:
+                    self._record_failure(endpoint, e)
+            raise
+        finally:
+            # Cancellation (CancelledError, GeneratorExit) and client-side
+            # errors are neither outcome
+            with self._lock:
+                endpoint.outstanding -= 1
+                if succeeded:
+                    self._record_success(endpoint, time.monotonic() - started)
+
+    def _record_success(self, endpoint, seconds):
+        if endpoint.latency is None:
+            endpoint.latency = seconds
+        else:
+            endpoint.latency += EWMA_ALPHA * (seconds - endpoint.latency)
+        endpoint.consecutive_failures = 0
+        endpoint.ejections = 0
+        endpoint.ejected_until = 0.0
+
+    def _record_failure(self, endpoint, error):
+        endpoint.failures += 1
+        endpoint.consecutive_failures += 1
+        endpoint.last_error = str(error)[:200]
+        if endpoint.consecutive_failures >= self.eject_after:
+            self._eject(endpoint)
+
+    def _eject(self, endpoint):
+        duration = self.eject_seconds * 2 ** min(endpoint.ejections, MAX_EJECT_DOUBLINGS)
+        endpoint.ejections += 1
+        # One more failure after the ejection expires ejects it again
+        endpoint.consecutive_failures = self.eject_after - 1
+        endpoint.ejected_until = time.monotonic() + duration
+
+    def record_probe(self, url, ok, error=None):
+        """
+        Apply a health-check result
+
+        A passing probe ends the current ejection, but keeps the backoff and
+        leaves the endpoint one failure away from the next, longer ejection.
+        """
+        with self._lock:
+            for endpoint in self.endpoints:
+                if endpoint.url != url:
+                    continue
+                if ok:
+                    endpoint.ejected_until = 0.0
+                else:
+                    endpoint.last_error = str(error)[:200] if error else 'health check failed'
+                    if not endpoint.is_ejected(time.monotonic()):
+                        self._eject(endpoint)
+
+    def probe(self, urls=None):
+        """Health-check ``urls`` (default: the ejected endpoints) synchronously"""
+        import requests
+
+        now = time.monotonic()
+        if urls is None:
+            urls = [endpoint.url for endpoint in self.endpoints if endpoint.is_ejected(now)]
+        for url in urls:
+            try:
+                response = requests.get(models_url(url), timeout=PROBE_TIMEOUT)
+            except requests.RequestException as e:
+                self.record_probe(url, False, e)
+                continue
+            # A 4xx (no auth, no /v1/models route) still shows a live server
+            self.record_probe(url, is_healthy_status(response.status_code), f'status {response.status_code}')
+
+    def _ensure_health_thread(self):
+        if self._health_thread is not None or not self.health_interval:
+            return
+        with self._lock:
+            if self._health_thread is None:
+                self._health_thread = threading.Thread(
+                    target=self._health_loop, name='llm-pool-health', daemon=True
+                )
+                self._health_thread.start()
+
+    def _health_loop(self):
+        while True:
+            time.sleep(self.health_interval)
+            try:
+                self.probe()
+            except Exception:
+                pass  # keep checking; a broken probe must not stop the thread
+
+    def status(self):
+        now = time.monotonic()
+        with self._lock:
+            return [endpoint.status(now) for endpoint in self.endpoints]
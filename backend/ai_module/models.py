@@ -0,0 +1,12 @@
+from django.db import models
+
+
+class AIThrottleBucket(models.Model):
+    """Token bucket state shared by all workers, see ai_module.admission"""
+    name = models.CharField(max_length=100, primary_key=True)
+    tokens = models.FloatField()
+    # Unix time of the last refill
+    updated_at = models.FloatField()
+
+    def __str__(self):
+        return f"{self.name}: {self.tokens:.1f}"
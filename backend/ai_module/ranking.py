@@ -0,0 +1,241 @@
+"""
+Whole-backlog re-prioritization.
+
+Open tasks go to the model as one-line summaries, ``chunk_size`` at a time,
+and each chunk comes back as a relative order. Chunks are dealt round-robin
+from the heuristic order, so each one spans the whole urgency range. Every
+chunk also contains the same few anchor tasks, which makes positions from
+different chunks comparable. An anchor's global percentile is its average
+relative position over all chunks. Every other task is placed by linear
+interpolation between the anchors ranked just above and below it.
+
+The ranked tasks then trade their current priorities: the highest value goes
+to the most urgent task, the next highest to the next one, and so on, so
+priorities users chose are reordered rather than re-banded. When the tasks
+use fewer distinct values than ``Task.PRIORITY_CHOICES`` has (say, all still
+at the default 0), there is nothing to reorder, and the merged order is cut
+into equal bands of the choices instead. Changed priorities are written back
+with one ``bulk_update``, skipping tasks edited while the model was ranking.
+Ranking N tasks takes about N / (chunk_size - anchors) calls.
+The calls run in the batch admission lane, behind interactive suggestions.
+A chunk whose call fails or is shed is reported in ``failed_chunks``. Its
+tasks are left out of the merge, so only tasks the model actually ranked
+get new priorities.
+"""
+import asyncio
+import bisect
+import math
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.utils import timezone
+
+from tasks.models import Task
+from tasks.signals import send_bulk_change
+from tasks.timeline import OPEN_STATUSES
+
+from .admission import ai_lane
+from .ai_processor import ai_processor, heuristic_task_order
+
+DEFAULT_CHUNK_SIZE = 25
+ANCHOR_COUNT = 6
+# Concurrent model calls of the async pass
+RANKING_CONCURRENCY = 4
+DESCRIPTION_CHARS = 160
+# Highest band first, used when the current priorities cannot be reordered
+PRIORITY_BANDS = sorted((value for value, _ in Task.PRIORITY_CHOICES), reverse=True)
+# Rows locked and re-read per query before writing
+WRITE_BATCH_SIZE = 500
+
+
+def open_task_summaries(queryset=None, limit=None):
+    """Compact dicts for the open tasks of ``queryset``, as sent to the model"""
+    queryset = (queryset if queryset is not None else Task.objects.all()).filter(status__in=OPEN_STATUSES)
+    rows = queryset.order_by('pk').values(
+        'id', 'title', 'description', 'priority', 'deadline', 'category__name', 'status', 'updated_at'
+    )
+    if limit:
+        rows = rows[:limit]
+    return [
+        {
+            'id': row['id'],
+            'title': row['title'],
+            'description': row['description'][:DESCRIPTION_CHARS],
+            'priority': row['priority'],
+            'deadline': row['deadline'].isoformat() if row['deadline'] else None,
+            'category': row['category__name'],
+            # Compared before writing, see apply_priorities
+            'status': row['status'],
+            'updated_at': row['updated_at'],
+        }
+        for row in rows
+    ]
+
+
+def plan_chunks(order, chunk_size=DEFAULT_CHUNK_SIZE, anchor_count=ANCHOR_COUNT):
+    """Split ids (in heuristic order) into ``(chunks, anchors)``; one chunk needs no anchors"""
+    if len(order) <= chunk_size:
+        return [list(order)], []
+    anchor_count = max(1, min(anchor_count, chunk_size // 2))
+    anchors = list(dict.fromkeys(
+        order[round(i * (len(order) - 1) / max(anchor_count - 1, 1))] for i in range(anchor_count)
+    ))
+    anchor_set = set(anchors)
+    rest = [task_id for task_id in order if task_id not in anchor_set]
+    count = math.ceil(len(rest) / (chunk_size - len(anchors)))
+    return [anchors + rest[index::count] for index in range(count)], anchors
+
+
+def merge_rankings(rankings, anchors, order):
+    """One global order (most urgent first) from per-chunk rankings"""
+    # Percentiles run from 0 (most urgent) to 1
+    anchor_percentiles = {
+        anchor: sum((ranking.index(anchor) + 0.5) / len(ranking) for ranking in rankings) / len(rankings)
+        for anchor in anchors
+    }
+    scores = {}
+    for ranking in rankings:
+        # (position, percentile) of the anchors, plus virtual ends of the scale
+        points = [(-1, 0.0)] + sorted(
+            (ranking.index(anchor), percentile) for anchor, percentile in anchor_percentiles.items()
+        ) + [(len(ranking), 1.0)]
+        positions = [position for position, _ in points]
+        for position, task_id in enumerate(ranking):
+            if task_id in anchor_percentiles:
+                continue
+            index = bisect.bisect_right(positions, position)
+            (above, low), (below, high) = points[index - 1], points[index]
+            percentile = low + (high - low) * (position - above) / (below - above)
+            scores.setdefault(task_id, []).append(percentile)
+    for anchor, percentile in anchor_percentiles.items():
+        scores[anchor] = [percentile]
+    heuristic_rank = {task_id: index for index, task_id in enumerate(order)}
+    return sorted(
+        scores,
+        key=lambda task_id: (sum(scores[task_id]) / len(scores[task_id]), heuristic_rank[task_id]),
+    )
+
+
+def assign_priorities(ranked_ids, current):
+    """
+    ``{id: priority}`` for ``ranked_ids``, most urgent first
+
+    The ``current`` priorities of the tasks, highest first in ranked order;
+    equal bands of ``PRIORITY_BANDS`` when they use fewer distinct values.
+    """
+    values = sorted((current[task_id] for task_id in ranked_ids), reverse=True)
+    if len(set(values)) < len(PRIORITY_BANDS):
+        bands = len(PRIORITY_BANDS)
+        values = [
+            PRIORITY_BANDS[min(bands - 1, index * bands // len(ranked_ids))] for index in range(len(ranked_ids))
+        ]
+    return dict(zip(ranked_ids, values))
+
+
+def apply_priorities(tasks, priorities, dry_run=False):
+    """
+    Write changed priorities with one ``bulk_update``; returns ``(changes, skipped)``
+
+    ``tasks`` was read before the model calls, which can take minutes. The
+    rows are locked and re-read first, and a task whose priority, status or
+    ``updated_at`` changed since then is skipped rather than overwritten.
+    """
+    changes = [
+        {'id': task['id'], 'title': task['title'], 'old': task['priority'], 'new': priorities[task['id']]}
+        for task in tasks if task['id'] in priorities and priorities[task['id']] != task['priority']
+    ]
+    if not changes or dry_run:
+        return changes, []
+    snapshot = {task['id']: (task['priority'], task['status'], task['updated_at']) for task in tasks}
+    with transaction.atomic():
+        unchanged = set()
+        for start in range(0, len(changes), WRITE_BATCH_SIZE):
+            rows = Task.objects.select_for_update().filter(
+                pk__in=[change['id'] for change in changes[start:start + WRITE_BATCH_SIZE]]
+            ).values_list('pk', 'priority', 'status', 'updated_at')
+            unchanged.update(pk for pk, *values in rows if tuple(values) == snapshot[pk])
+        skipped = [change for change in changes if change['id'] not in unchanged]
+        changes = [change for change in changes if change['id'] in unchanged]
+        if changes:
+            now = timezone.now()
+            objects = [Task(pk=change['id'], priority=change['new'], updated_at=now) for change in changes]
+            Task.objects.bulk_update(objects, ['priority', 'updated_at'], batch_size=WRITE_BATCH_SIZE)
+            send_bulk_change(Task, [change['id'] for change in changes])
+    return changes, skipped
+
+
+def _merged_priorities(tasks, rankings, anchors, order):
+    rankings = [ranking for ranking in rankings if ranking is not None]
+    if not rankings:
+        return {}
+    current = {task['id']: task['priority'] for task in tasks}
+    return assign_priorities(merge_rankings(rankings, anchors, order), current)
+
+
+def _result(tasks, chunks, rankings, written, dry_run):
+    changes, skipped = written
+    ranked = {task_id for ranking in rankings if ranking is not None for task_id in ranking}
+    return {
+        'ranked': len(ranked),
+        'calls': len(chunks) if len(tasks) > 1 else 0,
+        'failed_chunks': sum(ranking is None for ranking in rankings),
+        'updated': 0 if dry_run else len(changes),
+        'dry_run': dry_run,
+        'changes': changes,
+        # Edited by someone else during the run, left as they were
+        'skipped': skipped,
+    }
+
+
+def rerank_tasks(queryset=None, chunk_size=DEFAULT_CHUNK_SIZE, limit=None, context_analysis=None, dry_run=False,
+                 deadline=None):
+    """
+    Re-prioritize the open tasks of ``queryset`` (default: all) in ranked chunks
+
+    Chunks still waiting for the model ``deadline`` seconds from now
+    (``AI_BATCH_DEADLINE`` by default) are dropped and count as failed.
+    """
+    tasks = open_task_summaries(queryset, limit)
+    if not tasks:
+        return _result(tasks, [], [], ([], []), dry_run)
+    by_id = {task['id']: task for task in tasks}
+    order = heuristic_task_order(tasks)
+    chunks, anchors = plan_chunks(order, chunk_size)
+
+    def rank(chunk):
+        try:
+            return ai_processor.rank_tasks([by_id[task_id] for task_id in chunk], context_analysis, use_fallback=False)
+        except Exception:
+            return None
+
+    with ai_lane('batch', deadline):
+        rankings = [rank(chunk) for chunk in chunks]
+    priorities = _merged_priorities(tasks, rankings, anchors, order)
+    return _result(tasks, chunks, rankings, apply_priorities(tasks, priorities, dry_run), dry_run)
+
+
+async def arerank_tasks(queryset=None, chunk_size=DEFAULT_CHUNK_SIZE, limit=None, context_analysis=None,
+                        dry_run=False, concurrency=RANKING_CONCURRENCY, deadline=None):
+    """``rerank_tasks`` with up to ``concurrency`` chunks waiting on the model at once"""
+    tasks = await sync_to_async(open_task_summaries)(queryset, limit)
+    if not tasks:
+        return _result(tasks, [], [], ([], []), dry_run)
+    by_id = {task['id']: task for task in tasks}
+    order = heuristic_task_order(tasks)
+    chunks, anchors = plan_chunks(order, chunk_size)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def rank(chunk):
+        async with semaphore:
+            try:
+                return await ai_processor.arank_tasks(
+                    [by_id[task_id] for task_id in chunk], context_analysis, use_fallback=False
+                )
+            except Exception:
+                return None
+
+    with ai_lane('batch', deadline):
+        rankings = await asyncio.gather(*(rank(chunk) for chunk in chunks))
+    priorities = _merged_priorities(tasks, rankings, anchors, order)
+    written = await sync_to_async(apply_priorities)(tasks, priorities, dry_run)
+    return _result(tasks, chunks, rankings, written, dry_run)
@@ -0,0 +1,300 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from tasks.management.commands.startup_benchmark import DEFERRED_MODULES, IMPORT_TIME_LINE, STARTUP_SCRIPT
+from tasks.models import Task
+
+from .admission import AdmissionController, Lane, Overloaded, TokenBucket, ai_lane
+from .ai_processor import ai_processor, heuristic_task_order
+from .ranking import (
+    PRIORITY_BANDS, apply_priorities, assign_priorities, merge_rankings, open_task_summaries, plan_chunks,
+    rerank_tasks,
+)
+
+
+def imported_modules(script):
+    """Modules a fresh ``python -X importtime`` interpreter imports to run ``script``"""
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'smart_todo.settings')}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', script],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode:
+        raise AssertionError(f"Import failed:\n{result.stderr[-2000:]}")
+    return {match[4] for match in map(IMPORT_TIME_LINE.match, result.stderr.splitlines()) if match}
+
+
+class LazyImportTests(SimpleTestCase):
+    """The OpenAI, httpx and backoff libraries load on the first AI call, not at import"""
+
+    def assertNotImported(self, script):
+        modules = imported_modules(script)
+        for module in DEFERRED_MODULES:
+            with self.subTest(module=module):
+                self.assertNotIn(module, modules)
+
+    def test_ai_processor_import(self):
+        self.assertNotImported('import django; django.setup(); import ai_module.ai_processor')
+
+    def test_worker_startup(self):
+        self.assertNotImported(STARTUP_SCRIPT)
+
+
+class AdmissionTests(SimpleTestCase):
+    """Calls that cannot run soon are shed, and give back the token they took"""
+
+    def controller(self, max_concurrency=1, max_queue=0, queue_timeout=0.05, rate=0.001, burst=5):
+        return AdmissionController(max_concurrency, lanes=[
+            Lane('interactive', max_concurrency, max_queue, queue_timeout),
+            Lane('batch', 1, max_queue, queue_timeout, wait_for_tokens=True),
+        ], bucket=TokenBucket(rate, burst))
+
+    def assertShed(self, controller, reason):
+        with self.assertRaises(Overloaded) as caught:
+            with controller.admit():
+                self.fail('shed call ran')
+        self.assertEqual(caught.exception.reason, reason)
+
+    def test_admits_within_limits(self):
+        controller = self.controller()
+        with controller.admit():
+            self.assertEqual(controller.active, 1)
+        self.assertEqual(controller.active, 0)
+        self.assertEqual(controller.bucket.available(), 4)
+        self.assertEqual(controller.counts['interactive', 'admitted'], 1)
+
+    def test_empty_bucket_sheds(self):
+        controller = self.controller(burst=1)
+        with controller.admit():
+            pass
+        self.assertShed(controller, 'rate limit')
+        self.assertEqual(controller.counts['interactive', 'shed_rate_limited'], 1)
+
+    def test_full_queue_sheds_and_refunds(self):
+        controller = self.controller(max_queue=0)
+        with controller.admit():
+            self.assertShed(controller, 'queue full')
+            # The shed call's token went back; only the running call spent one
+            self.assertEqual(controller.bucket.available(), 4)
+        self.assertEqual(controller.counts['interactive', 'shed_queue_full'], 1)
+
+    def test_queue_timeout_sheds_and_refunds(self):
+        controller = self.controller(max_queue=1, queue_timeout=0.05)
+        with controller.admit():
+            started = time.monotonic()
+            self.assertShed(controller, 'queue timeout')
+            self.assertGreaterEqual(time.monotonic() - started, 0.05)
+            self.assertEqual(controller.bucket.available(), 4)
+        self.assertFalse(controller.lanes['interactive'].waiters)
+        self.assertEqual(controller.counts['interactive', 'shed_timeout'], 1)
+
+    def test_passed_deadline_sheds(self):
+        controller = self.controller()
+        with ai_lane('batch', deadline=0.01):
+            time.sleep(0.02)
+            self.assertShed(controller, 'deadline passed')
+        self.assertEqual(controller.counts['batch', 'shed_deadline'], 1)
+        self.assertEqual(controller.bucket.available(), 5)
+
+    def test_batch_lane_waits_for_tokens_until_deadline(self):
+        controller = self.controller(burst=1)
+        with controller.admit():
+            pass
+        with ai_lane('batch', deadline=0.05):
+            self.assertShed(controller, 'deadline passed')
+
+    def test_batch_lane_cannot_take_every_slot(self):
+        controller = self.controller(max_concurrency=2)
+        with ai_lane('batch'):
+            with controller.admit():
+                self.assertShed(controller, 'queue full')
+                # An interactive call still gets the second slot
+                with ai_lane('interactive'), controller.admit():
+                    self.assertEqual(controller.active, 2)
+
+    def test_freed_slot_goes_to_waiter(self):
+        controller = self.controller(max_queue=1, queue_timeout=1.0)
+
+        async def scenario():
+            async def first():
+                async with controller.aadmit():
+                    await asyncio.sleep(0.05)
+
+            async def second():
+                await asyncio.sleep(0.01)
+                async with controller.aadmit():
+                    return controller.active
+
+            return await asyncio.gather(first(), second())
+
+        self.assertEqual(asyncio.run(scenario())[1], 1)
+        self.assertEqual(controller.counts['interactive', 'queued'], 1)
+        self.assertEqual(controller.counts['interactive', 'admitted'], 2)
+
+    def test_async_full_queue_sheds_and_refunds(self):
+        controller = self.controller(max_queue=0)
+
+        async def scenario():
+            async with controller.aadmit():
+                with self.assertRaises(Overloaded) as caught:
+                    async with controller.aadmit():
+                        self.fail('shed call ran')
+                self.assertEqual(caught.exception.reason, 'queue full')
+                return controller.bucket.available()
+
+        self.assertEqual(asyncio.run(scenario()), 4)
+
+    @override_settings(AI_RATE_LIMIT=10, AI_RATE_BURST=20, AI_RATE_LIMIT_SHARED=False, WEB_CONCURRENCY=4)
+    def test_workers_split_the_rate_limit(self):
+        bucket = AdmissionController.from_settings().bucket
+        self.assertEqual((bucket.rate, bucket.burst), (2.5, 5))
+
+    def test_back_off(self):
+        controller = self.controller()
+        self.assertFalse(controller.backing_off('openai'))
+        controller.back_off('openai', seconds=0.05)
+        self.assertTrue(controller.backing_off('openai'))
+        time.sleep(0.06)
+        self.assertFalse(controller.backing_off('openai'))
+
+
+class RankingMergeTests(SimpleTestCase):
+    """Chunk rankings merge into one order through the shared anchors"""
+
+    order = list(range(1, 31))
+
+    def rankings(self, chunks, wanted):
+        position = {task_id: index for index, task_id in enumerate(wanted)}
+        return [sorted(chunk, key=position.get) for chunk in chunks]
+
+    def test_chunks_share_anchors_and_cover_every_task_once(self):
+        chunks, anchors = plan_chunks(self.order, chunk_size=10, anchor_count=4)
+        self.assertEqual(len(anchors), 4)
+        rest = []
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk), 10)
+            self.assertEqual(chunk[:4], anchors)
+            rest.extend(chunk[4:])
+        self.assertCountEqual(rest + anchors, self.order)
+
+    def test_small_backlog_is_one_chunk(self):
+        self.assertEqual(plan_chunks([3, 1, 2], chunk_size=10), ([[3, 1, 2]], []))
+        self.assertEqual(merge_rankings([[2, 3, 1]], [], [3, 1, 2]), [2, 3, 1])
+
+    def test_agreeing_chunks_merge_to_the_same_order(self):
+        chunks, anchors = plan_chunks(self.order, chunk_size=10, anchor_count=4)
+        self.assertEqual(merge_rankings(self.rankings(chunks, self.order), anchors, self.order), self.order)
+
+    def test_anchors_bound_every_task(self):
+        wanted = self.order[::-1]
+        chunks, anchors = plan_chunks(self.order, chunk_size=10, anchor_count=4)
+        merged = merge_rankings(self.rankings(chunks, wanted), anchors, self.order)
+        position, expected = {task_id: index for index, task_id in enumerate(merged)}, wanted.index
+        for anchor in anchors:
+            for task_id in self.order:
+                if task_id != anchor:
+                    self.assertEqual(position[task_id] < position[anchor], expected(task_id) < expected(anchor))
+
+    def test_priorities_are_reordered(self):
+        current = {1: 0, 2: 100, 3: 50, 4: 25, 5: 75}
+        self.assertEqual(assign_priorities([4, 1, 3, 2, 5], current), {4: 100, 1: 75, 3: 50, 2: 25, 5: 0})
+
+    def test_uniform_priorities_are_banded(self):
+        ranked = list(range(10))
+        priorities = assign_priorities(ranked, dict.fromkeys(ranked, 0))
+        self.assertEqual([priorities[task_id] for task_id in ranked], [band for band in PRIORITY_BANDS for _ in range(2)])
+
+
+class RerankTests(TestCase):
+    """Only tasks the model ranked, and nobody edited meanwhile, get new priorities"""
+
+    def setUp(self):
+        values = [value for value, _ in Task.PRIORITY_CHOICES]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tasks = [
+                Task.objects.create(title=f'task {index}', priority=values[index % len(values)]) for index in range(12)
+            ]
+
+    def priorities(self):
+        return dict(Task.objects.values_list('pk', 'priority'))
+
+    def rerank(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return rerank_tasks(**kwargs)
+
+    def model(self, failing=()):
+        """Ranks newest first; fails chunks containing any of ``failing``"""
+        def rank_tasks(tasks, context_analysis=None, use_fallback=True):
+            ids = [task['id'] for task in tasks]
+            if set(ids) & set(failing):
+                raise Overloaded('queue full')
+            return sorted(ids, reverse=True)
+        return mock.patch.object(ai_processor, 'rank_tasks', side_effect=rank_tasks)
+
+    def test_single_chunk(self):
+        before = self.priorities()
+        with self.model():
+            result = self.rerank(chunk_size=25)
+        self.assertEqual((result['ranked'], result['calls'], result['failed_chunks']), (12, 1, 0))
+        after = self.priorities()
+        self.assertCountEqual(after.values(), before.values())
+        newest_first = sorted(after, reverse=True)
+        self.assertEqual([after[pk] for pk in newest_first], sorted(before.values(), reverse=True))
+
+    def test_failed_chunk_is_left_alone(self):
+        summaries = open_task_summaries()
+        chunks, anchors = plan_chunks(heuristic_task_order(summaries), chunk_size=6)
+        failed = [task_id for task_id in chunks[1] if task_id not in anchors]
+        before = self.priorities()
+        with self.model(failing=failed[:1]):
+            result = self.rerank(chunk_size=6)
+        self.assertEqual(result['failed_chunks'], 1)
+        self.assertEqual(result['calls'], len(chunks))
+        self.assertEqual(result['ranked'], 12 - len(failed))
+        after = self.priorities()
+        for task_id in failed:
+            self.assertEqual(after[task_id], before[task_id])
+        self.assertTrue(all(change['id'] not in failed for change in result['changes']))
+        # The ranked tasks traded their own priorities among themselves
+        ranked = set(before) - set(failed)
+        self.assertCountEqual([after[pk] for pk in ranked], [before[pk] for pk in ranked])
+
+    def test_every_chunk_failed(self):
+        before = self.priorities()
+        with self.model(failing=list(before)):
+            result = self.rerank(chunk_size=6)
+        self.assertEqual(result['failed_chunks'], result['calls'])
+        self.assertEqual((result['ranked'], result['updated']), (0, 0))
+        self.assertEqual(self.priorities(), before)
+
+    def test_dry_run_writes_nothing(self):
+        before = self.priorities()
+        with self.model():
+            result = self.rerank(dry_run=True)
+        self.assertTrue(result['changes'])
+        self.assertEqual(result['updated'], 0)
+        self.assertEqual(self.priorities(), before)
+
+    def test_tasks_edited_during_the_run_are_skipped(self):
+        summaries = open_task_summaries()
+        edited = self.tasks[-1]
+        ranked = sorted((task['id'] for task in summaries), reverse=True)
+        priorities = assign_priorities(ranked, {task['id']: task['priority'] for task in summaries})
+        self.assertNotEqual(priorities[edited.pk], edited.priority)
+
+        # Someone edits the task while the model is ranking
+        with self.captureOnCommitCallbacks(execute=True):
+            edited.title = 'edited meanwhile'
+            edited.save()
+            changes, skipped = apply_priorities(summaries, priorities)
+        self.assertEqual([change['id'] for change in skipped], [edited.pk])
+        self.assertNotIn(edited.pk, [change['id'] for change in changes])
+        edited.refresh_from_db()
+        self.assertEqual((edited.title, edited.priority), ('edited meanwhile', 25))
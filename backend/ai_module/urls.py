@@ -5,5 +5,7 @@ urlpatterns = [
     path('suggestions/', views.get_ai_suggestions, name='ai_suggestions'),
     path('analyze-context/', views.analyze_context_batch, name='analyze_context'),
     path('enhance-task/<int:task_id>/', views.enhance_existing_task, name='enhance_task'),
+    path('rerank/', views.rerank_backlog, name='ai_rerank'),
     path('health/', views.ai_health_check, name='ai_health'),
+    path('metrics/', views.ai_metrics, name='ai_metrics'),
 ]
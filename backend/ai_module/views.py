@@ -1,14 +1,91 @@
-from rest_framework.decorators import api_view
+import asyncio
+import functools
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework import exceptions, status
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework.views import APIView
 from tasks.models import Task, Category, ContextEntry
-from tasks.serializers import AITaskSuggestionSerializer
-from .ai_processor import ai_processor
-import json
+from tasks.serializers import AIRerankSerializer, AITaskSuggestionSerializer
+from .admission import ai_lane
+from .ai_processor import ai_processor, track_outcome
+from .llm_pool import is_endpoint_failure, is_healthy_status, models_url
+from .ranking import arerank_tasks
 
+DEFAULT_LOCAL_LLM_URL = 'http://127.0.0.1:1234/v1/chat/completions'
 
-@api_view(['POST'])
-def get_ai_suggestions(request):
+
+class _PolicyView(APIView):
+    """Applies DRF's request policies for ``async_api_view``; never routed"""
+    allowed = ()
+
+    def _allowed_methods(self):
+        return list(self.allowed)
+
+
+def async_api_view(methods):
+    """
+    Async counterpart of DRF's ``@api_view`` for the AI endpoints
+
+    DRF views are synchronous, so these are plain Django async views: under
+    the ASGI application a request waiting on the LLM holds no worker thread.
+    The view still gets a DRF ``Request`` and goes through the same steps as
+    ``APIView.dispatch``: content negotiation, authentication, permissions
+    and throttling from ``REST_FRAMEWORK``, and DRF's exception handler.
+    Views return DRF ``Response`` objects, rendered by the configured
+    renderers like the rest of the API. The steps that may touch the
+    database or cache run in a thread. As with DRF,
+    Django's CSRF middleware skips the view and ``SessionAuthentication``
+    enforces CSRF for session-authenticated requests instead.
+    """
+    allowed = [method.upper() for method in methods]
+
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            policy = _PolicyView(allowed=allowed, args=args, kwargs=kwargs)
+            request = policy.initialize_request(request, *args, **kwargs)
+            policy.request = request
+            policy.headers = policy.default_response_headers
+
+            try:
+                await sync_to_async(policy.initial)(request, *args, **kwargs)
+                if request.method not in allowed:
+                    raise exceptions.MethodNotAllowed(request.method)
+                # Parse the body now, so parse errors get DRF's response
+                if not isinstance(await sync_to_async(lambda: request.data)(), dict):
+                    raise exceptions.ParseError('Expected a JSON object')
+                response = await view(request, *args, **kwargs)
+            except Exception as exc:
+                response = policy.handle_exception(exc)
+
+            return policy.finalize_response(request, response, *args, **kwargs)
+
+        # Django 4.2's csrf_exempt would wrap the coroutine function in a sync one
+        wrapper.csrf_exempt = True
+        return wrapper
+
+    return decorator
+
+
+async def _recent_context_entries(limit):
+    return [
+        {
+            'content': entry.content,
+            'source': entry.source,
+            'created_at': entry.created_at.isoformat()
+        }
+        async for entry in ContextEntry.objects.all()[:limit]
+    ]
+
+
+async def _category_names():
+    return [name async for name in Category.objects.values_list('name', flat=True)]
+
+
+@async_api_view(['POST'])
+async def get_ai_suggestions(request):
     """
     Get AI-powered task suggestions including priority, deadline, categories, and enhanced description
     
@@ -35,49 +112,40 @@ def get_ai_suggestions(request):
     include_categories = data.get('include_categories', True)
     
     try:
-        # Get recent context entries
-        recent_contexts = ContextEntry.objects.all()[:context_limit]
-        context_entries = [
-            {
-                'content': entry.content,
-                'source': entry.source,
-                'created_at': entry.created_at.isoformat()
-            }
-            for entry in recent_contexts
-        ]
-        
-        # Analyze context (this should always work with fallback)
-        context_analysis = ai_processor.analyze_context(context_entries)
-        
-        # Get existing categories if requested
-        existing_categories = []
-        if include_categories:
-            existing_categories = list(Category.objects.values_list('name', flat=True))
-        
-        # Generate AI suggestions
-        suggestions = {}
-        
-        if task_data:
-            # Priority suggestion
-            suggested_priority = ai_processor.suggest_task_priority(task_data, context_analysis)
-            suggestions['priority'] = suggested_priority
-            
-            # Deadline suggestion
-            suggested_deadline = ai_processor.suggest_deadline(task_data, context_analysis)
-            suggestions['deadline'] = suggested_deadline
-            
-            # Category and tags suggestion
-            category_tags = ai_processor.suggest_categories_and_tags(task_data, existing_categories)
-            suggestions['category'] = category_tags['category']
-            suggestions['tags'] = category_tags['tags']
-            
-            # Enhanced description
-            enhanced_description = ai_processor.enhance_task_description(task_data, context_analysis)
-            suggestions['enhanced_description'] = enhanced_description
+        # Outcomes of this request's model calls only
+        with track_outcome() as outcome:
+            # Get recent context entries
+            context_entries = await _recent_context_entries(context_limit)
+
+            # Analyze context (this should always work with fallback)
+            context_analysis = await ai_processor.aanalyze_context(context_entries)
+
+            # Get existing categories if requested
+            existing_categories = []
+            if include_categories:
+                existing_categories = await _category_names()
+
+            # Generate AI suggestions
+            suggestions = {}
+
+            if task_data:
+                # The four suggestions are independent, so they wait on the
+                # model concurrently instead of one after another
+                suggested_priority, suggested_deadline, category_tags, enhanced_description = await asyncio.gather(
+                    ai_processor.asuggest_task_priority(task_data, context_analysis),
+                    ai_processor.asuggest_deadline(task_data, context_analysis),
+                    ai_processor.asuggest_categories_and_tags(task_data, existing_categories),
+                    ai_processor.aenhance_task_description(task_data, context_analysis),
+                )
+                suggestions['priority'] = suggested_priority
+                suggestions['deadline'] = suggested_deadline
+                suggestions['category'] = category_tags['category']
+                suggestions['tags'] = category_tags['tags']
+                suggestions['enhanced_description'] = enhanced_description
         
         # Determine if we used AI or fallback
-        ai_status = 'fallback' if ai_processor.rate_limited else 'success'
-        message = 'Smart fallback suggestions generated' if ai_processor.rate_limited else 'AI suggestions generated successfully'
+        ai_status = outcome.status
+        message = 'Smart fallback suggestions generated' if ai_status == 'fallback' else 'AI suggestions generated successfully'
         
         return Response({
             'context_analysis': context_analysis,
@@ -106,7 +174,7 @@ def get_ai_suggestions(request):
         if 'context_analysis' not in locals():
             context_analysis = {'summary': 'No context available', 'key_themes': [], 'urgency_indicators': [], 'time_constraints': [], 'mood_tone': 'neutral'}
         if 'existing_categories' not in locals():
-            existing_categories = list(Category.objects.values_list('name', flat=True)) if include_categories else []
+            existing_categories = await _category_names() if include_categories else []
         if 'context_entries' not in locals():
             context_entries = []
         
@@ -114,11 +182,11 @@ def get_ai_suggestions(request):
         fallback_suggestions = {}
         if task_data:
             # Use the AI processor's fallback methods
-            fallback_suggestions['priority'] = ai_processor.suggest_task_priority(task_data, context_analysis)
-            category_tags = ai_processor.suggest_categories_and_tags(task_data, existing_categories)
+            fallback_suggestions['priority'] = await ai_processor.asuggest_task_priority(task_data, context_analysis)
+            category_tags = await ai_processor.asuggest_categories_and_tags(task_data, existing_categories)
             fallback_suggestions['category'] = category_tags['category']
             fallback_suggestions['tags'] = category_tags['tags']
-            fallback_suggestions['enhanced_description'] = ai_processor.enhance_task_description(task_data, context_analysis)
+            fallback_suggestions['enhanced_description'] = await ai_processor.aenhance_task_description(task_data, context_analysis)
             fallback_suggestions['deadline'] = None  # No smart deadline fallback
         
         return Response({
@@ -131,8 +199,50 @@ def get_ai_suggestions(request):
         }, status=status_code)
 
 
-@api_view(['POST'])
-def analyze_context_batch(request):
+@async_api_view(['POST'])
+async def rerank_backlog(request):
+    """
+    Re-prioritize the open tasks relative to each other, in ranked chunks
+
+    Expected payload (all optional):
+    {
+        "chunk_size": 25,
+        "limit": 200,
+        "context_limit": 10,
+        "dry_run": false
+    }
+    """
+    serializer = AIRerankSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+    # One deadline for the whole request; calls still waiting then are dropped
+    deadline = time.monotonic() + settings.AI_RERANK_TIMEOUT
+
+    with track_outcome() as outcome:
+        context_analysis = None
+        if data['context_limit']:
+            context_entries = await _recent_context_entries(data['context_limit'])
+            with ai_lane('batch', settings.AI_RERANK_TIMEOUT):
+                context_analysis = await ai_processor.aanalyze_context(context_entries)
+
+        result = await arerank_tasks(
+            chunk_size=data['chunk_size'],
+            limit=data['limit'],
+            context_analysis=context_analysis,
+            dry_run=data['dry_run'],
+            deadline=max(deadline - time.monotonic(), 0.001),
+        )
+    if result['failed_chunks']:
+        # Failed chunks keep their priorities; see ai_module.ranking
+        result['ai_status'] = 'partial' if result['failed_chunks'] < result['calls'] else 'failed'
+    else:
+        result['ai_status'] = outcome.status
+    return Response(result, status=status.HTTP_200_OK)
+
+
+@async_api_view(['POST'])
+async def analyze_context_batch(request):
     """
     Analyze multiple context entries and return insights
     
@@ -152,7 +262,8 @@ def analyze_context_batch(request):
         }, status=status.HTTP_400_BAD_REQUEST)
     
     try:
-        analysis = ai_processor.analyze_context(context_entries)
+        with ai_lane('batch'):
+            analysis = await ai_processor.aanalyze_context(context_entries)
         
         return Response({
             'analysis': analysis,
@@ -165,13 +276,13 @@ def analyze_context_batch(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-@api_view(['POST'])
-def enhance_existing_task(request, task_id):
+@async_api_view(['POST'])
+async def enhance_existing_task(request, task_id):
     """
     Enhance an existing task with AI suggestions
     """
     try:
-        task = Task.objects.get(id=task_id)
+        task = await Task.objects.aget(id=task_id)
     except Task.DoesNotExist:
         return Response({
             'error': 'Task not found'
@@ -179,17 +290,9 @@ def enhance_existing_task(request, task_id):
     
     try:
         # Get recent context
-        recent_contexts = ContextEntry.objects.all()[:10]
-        context_entries = [
-            {
-                'content': entry.content,
-                'source': entry.source,
-                'created_at': entry.created_at.isoformat()
-            }
-            for entry in recent_contexts
-        ]
+        context_entries = await _recent_context_entries(10)
         
-        context_analysis = ai_processor.analyze_context(context_entries)
+        context_analysis = await ai_processor.aanalyze_context(context_entries)
         
         task_data = {
             'title': task.title,
@@ -199,8 +302,10 @@ def enhance_existing_task(request, task_id):
         }
         
         # Generate suggestions
-        suggested_priority = ai_processor.suggest_task_priority(task_data, context_analysis)
-        enhanced_description = ai_processor.enhance_task_description(task_data, context_analysis)
+        suggested_priority, enhanced_description = await asyncio.gather(
+            ai_processor.asuggest_task_priority(task_data, context_analysis),
+            ai_processor.aenhance_task_description(task_data, context_analysis),
+        )
         
         # Update task if requested
         if request.data.get('apply_suggestions', False):
@@ -210,7 +315,7 @@ def enhance_existing_task(request, task_id):
             task.priority = suggested_priority
             task.description = enhanced_description
             task.ai_enhanced = True
-            task.save()
+            await task.asave()
         
         return Response({
             'task_id': task_id,
@@ -228,11 +333,11 @@ def enhance_existing_task(request, task_id):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-@api_view(['GET'])
-def ai_health_check(request):
+@async_api_view(['GET'])
+async def ai_health_check(request):
     """Check AI service health and configuration by actually testing connectivity"""
-    import requests
-    
+    import httpx  # deferred with the AI clients, see ai_processor
+
     health_status = {
         'openai_api_key_present': bool(ai_processor.openai_api_key),
         'status': 'healthy'
@@ -246,7 +351,7 @@ def ai_health_check(request):
             test_messages = [
                 {'role': 'user', 'content': 'Hello, this is a test. Please respond with "OK".'}
             ]
-            response = ai_processor._call_openai(test_messages)
+            response = await ai_processor._acall_openai(test_messages)
             openai_working = True
             health_status['openai_test_response'] = response[:100]  # First 100 chars
         else:
@@ -261,26 +366,40 @@ def ai_health_check(request):
     if openai_error:
         health_status['openai_error'] = openai_error
     
-    # Test Local LLM connection (only if URL is configured and not default)
+    # Test every local LLM endpoint (unless only the default placeholder is configured)
     local_llm_working = False
     local_llm_error = None
-    if (ai_processor.local_llm_url and 
-        ai_processor.local_llm_url.strip() and 
-        ai_processor.local_llm_url != 'http://127.0.0.1:1234/v1/chat/completions'):  # Skip default placeholder
-        try:
-            # Test if the local LLM endpoint is reachable
-            test_url = ai_processor.local_llm_url.replace('/v1/chat/completions', '/v1/models')
-            response = requests.get(test_url, timeout=3)
-            if response.status_code == 200:
-                local_llm_working = True
-            else:
-                local_llm_error = f"Local LLM returned status {response.status_code}"
-        except requests.exceptions.ConnectionError:
-            local_llm_error = "Local LLM endpoint not reachable"
-        except requests.exceptions.Timeout:
-            local_llm_error = "Local LLM endpoint timeout"
-        except Exception as e:
-            local_llm_error = f"Local LLM test failed: {str(e)}"
+    pool = ai_processor.local_llm_pool
+    urls = [endpoint.url for endpoint in pool.endpoints]
+    if urls and urls != [DEFAULT_LOCAL_LLM_URL]:
+        async def probe(url):
+            # Results also update the pool: failing endpoints are ejected, passing ones reinstated
+            try:
+                response = await ai_processor.async_http_client().get(models_url(url), timeout=3)
+                if response.status_code == 200:
+                    pool.record_probe(url, True)
+                    return None
+                error = f"Local LLM returned status {response.status_code}"
+                if is_healthy_status(response.status_code):
+                    # Reachable; a 4xx is not the endpoint failing
+                    pool.record_probe(url, True)
+                    return error
+            except httpx.ConnectError:
+                error = "Local LLM endpoint not reachable"
+            except httpx.TimeoutException:
+                error = "Local LLM endpoint timeout"
+            except Exception as e:
+                error = f"Local LLM test failed: {str(e)}"
+                if not is_endpoint_failure(e):
+                    return error
+            pool.record_probe(url, False, error)
+            return error
+
+        errors = await asyncio.gather(*(probe(url) for url in urls))
+        local_llm_working = any(error is None for error in errors)
+        if not local_llm_working:
+            local_llm_error = errors[0] if len(errors) == 1 else "No local LLM endpoint is reachable"
+        health_status['local_llm_endpoints'] = pool.status()
     else:
         local_llm_error = "Local LLM not configured (using default placeholder)"
     
@@ -299,3 +418,12 @@ def ai_health_check(request):
         health_status['test_response'] = health_status.get('openai_test_response', 'OK')
     
     return Response(health_status)
+
+
+@async_api_view(['GET'])
+async def ai_metrics(request):
+    """Admission control counters and the state of every local LLM endpoint"""
+    return Response({
+        **await sync_to_async(ai_processor.admission.metrics)(),
+        'local_llm_endpoints': ai_processor.local_llm_pool.status(),
+    })
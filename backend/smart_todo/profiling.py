@@ -0,0 +1,229 @@
+"""
+Opt-in per-request profiling.
+
+With ``REQUEST_PROFILING = True``, a request carrying an ``X-Profile``
+header or a ``?_profile=`` query parameter is measured. SQL (count and
+time), serializer ``.data``, response rendering and ``AIProcessor`` calls
+are reported in a ``Server-Timing`` header, which browser devtools show
+next to the request. The value ``cprofile`` also records the request
+with cProfile and writes a ``.prof`` file to ``REQUEST_PROFILING_DIR``
+(inspect it with ``python -m pstats`` or snakeviz). Only the newest
+``REQUEST_PROFILING_MAX_FILES`` dumps are kept.
+
+The flag is honoured only with an ``X-Profile-Token`` header matching
+``REQUEST_PROFILING_TOKEN``, or without one when ``DEBUG`` is on. The
+middleware runs before authentication, so it checks a shared secret
+rather than the user. Serializers are instrumented only while a profiled
+request is in flight.
+
+When the setting is off the middleware removes itself at startup, and
+``timed()`` costs a single context-variable lookup.
+"""
+import contextvars
+import cProfile
+import glob
+import hmac
+import os
+import re
+import secrets
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = '_profile'
+TOKEN_HEADER = 'HTTP_X_PROFILE_TOKEN'
+
+# Timings of the request being profiled in this context, None otherwise
+_current = contextvars.ContextVar('request_timings', default=None)
+# Phases the current code is already inside of
+_open_phases = contextvars.ContextVar('profiling_phases', default=frozenset())
+
+
+class RequestTimings:
+    """Accumulated seconds (and call counts) per measured phase"""
+
+    def __init__(self):
+        self.durations = {}
+        self.counts = {}
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def server_timing(self, total):
+        metrics = [
+            f'{name};dur={seconds * 1000:.1f};desc="{self.counts[name]} calls"'
+            for name, seconds in self.durations.items()
+        ]
+        metrics.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(metrics)
+
+
+@contextmanager
+def timed(name):
+    """
+    Add the time spent in the block to ``name`` when the request is being profiled
+
+    Nested blocks of one phase count once. Blocks running concurrently, such
+    as AI calls under ``asyncio.gather``, are summed.
+    """
+    timings = _current.get()
+    phases = _open_phases.get()
+    if timings is None or name in phases:
+        yield
+        return
+    token = _open_phases.set(phases | {name})
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _open_phases.reset(token)
+        timings.add(name, time.perf_counter() - started)
+
+
+def _sql_timer(timings):
+    def wrapper(execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            timings.add('sql', time.perf_counter() - started)
+    return wrapper
+
+
+# Profiled requests in flight, and the serializer properties replaced meanwhile
+_instrumented_requests = 0
+_original_data = {}
+_instrument_lock = threading.Lock()
+
+
+@contextmanager
+def _instrumented_serializers():
+    """
+    Time ``.data`` of DRF serializers, where instances become primitives
+
+    The properties are replaced when the first profiled request starts and
+    restored when the last one ends.
+    """
+    global _instrumented_requests
+    from rest_framework import serializers
+
+    with _instrument_lock:
+        if not _instrumented_requests:
+            for cls in (serializers.Serializer, serializers.ListSerializer):
+                data = _original_data[cls] = cls.__dict__['data']
+
+                def timed_data(self, _data=data):
+                    with timed('serialize'):
+                        return _data.fget(self)
+                cls.data = property(timed_data, doc=data.__doc__)
+        _instrumented_requests += 1
+    try:
+        yield
+    finally:
+        with _instrument_lock:
+            _instrumented_requests -= 1
+            if not _instrumented_requests:
+                for cls, data in _original_data.items():
+                    cls.data = data
+                _original_data.clear()
+
+
+class RequestProfilingMiddleware:
+    """
+    Server-Timing (and optional cProfile) output for flagged requests
+
+    Enabled by ``REQUEST_PROFILING``; place it first in ``MIDDLEWARE`` so the
+    total covers the other middleware too. Rendering happens inside the view
+    call, but the body of a streaming response is not measured.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.profile_dir = getattr(settings, 'REQUEST_PROFILING_DIR', '')
+        self.max_files = getattr(settings, 'REQUEST_PROFILING_MAX_FILES', 100)
+        self.token = getattr(settings, 'REQUEST_PROFILING_TOKEN', '')
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mode = self._requested_mode(request)
+        if not mode:
+            return self.get_response(request)
+        with ExitStack() as stack:
+            timings, profiler = self._start(stack, mode)
+            started = time.perf_counter()
+            response = self.get_response(request)
+            return self._finish(request, response, timings, profiler, started)
+
+    async def __acall__(self, request):
+        mode = self._requested_mode(request)
+        if not mode:
+            return await self.get_response(request)
+        with ExitStack() as stack:
+            # cProfile follows the event loop thread, so other requests served
+            # concurrently show up in the profile too
+            timings, profiler = self._start(stack, mode)
+            started = time.perf_counter()
+            response = await self.get_response(request)
+            return self._finish(request, response, timings, profiler, started)
+
+    def _requested_mode(self, request):
+        mode = request.META.get(PROFILE_HEADER) or request.GET.get(PROFILE_PARAM)
+        if not mode:
+            return None
+        if self.token:
+            allowed = hmac.compare_digest(request.META.get(TOKEN_HEADER, ''), self.token)
+        else:
+            allowed = settings.DEBUG
+        return mode if allowed else None
+
+    def _start(self, stack, mode):
+        stack.enter_context(_instrumented_serializers())
+        timings = RequestTimings()
+        token = _current.set(timings)
+        stack.callback(_current.reset, token)
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(_sql_timer(timings)))
+        profiler = None
+        if mode == 'cprofile' and self.profile_dir:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            stack.callback(profiler.disable)
+        return timings, profiler
+
+    def _finish(self, request, response, timings, profiler, started):
+        total = time.perf_counter() - started
+        response['Server-Timing'] = timings.server_timing(total)
+        if profiler is not None:
+            profiler.disable()
+            response['X-Profile-Id'] = self._dump(request, profiler)
+        return response
+
+    def _dump(self, request, profiler):
+        """Write the profile and drop the oldest beyond ``max_files``; returns its id"""
+        os.makedirs(self.profile_dir, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', request.path).strip('-') or 'root'
+        # Names start with the time, so they sort oldest first
+        profile_id = secrets.token_hex(6)
+        name = f'{time.strftime("%Y%m%d-%H%M%S")}-{request.method}-{slug}-{profile_id}.prof'
+        profiler.dump_stats(os.path.join(self.profile_dir, name))
+        dumps = sorted(glob.glob(os.path.join(glob.escape(self.profile_dir), '*.prof')))
+        for path in dumps[:max(len(dumps) - self.max_files, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # removed by another worker
+        return profile_id
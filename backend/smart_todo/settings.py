@@ -3,8 +3,9 @@ Django settings for smart_todo project.
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'smart_todo.profiling.RequestProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -126,6 +128,67 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# Delta sync (/api/sync/) - readers stay this many seconds behind the newest
+# change-log entry so concurrent commits cannot be skipped; entries older than
+# SYNC_LOG_RETENTION_DAYS are removed by `manage.py prune_change_log`
+SYNC_SETTLE_SECONDS = config('SYNC_SETTLE_SECONDS', default=2, cast=int)
+SYNC_LOG_RETENTION_DAYS = config('SYNC_LOG_RETENTION_DAYS', default=30, cast=int)
+
+# Analytics rollups - days touched by task writes are rebuilt this many seconds
+# after commit by a background thread per process; 0 leaves them queued for
+# `manage.py backfill_task_stats --pending` (e.g. from cron)
+TASK_STATS_REFRESH_DELAY = config('TASK_STATS_REFRESH_DELAY', default=2.0, cast=float)
+
+# Server-sent events (/api/events/, ASGI only) - each process polls the change
+# log while streams are open; reconnects replay up to EVENT_STREAM_HISTORY entries
+EVENT_STREAM_POLL_SECONDS = config('EVENT_STREAM_POLL_SECONDS', default=1.0, cast=float)
+EVENT_STREAM_HISTORY = config('EVENT_STREAM_HISTORY', default=1000, cast=int)
+EVENT_STREAM_QUEUE_SIZE = config('EVENT_STREAM_QUEUE_SIZE', default=100, cast=int)
+EVENT_STREAM_MAX_CLIENTS = config('EVENT_STREAM_MAX_CLIENTS', default=10000, cast=int)
+EVENT_STREAM_KEEPALIVE_SECONDS = config('EVENT_STREAM_KEEPALIVE_SECONDS', default=15, cast=int)
+# Streams are closed after this long; EventSource reconnects with Last-Event-ID
+EVENT_STREAM_MAX_SECONDS = config('EVENT_STREAM_MAX_SECONDS', default=300, cast=int)
+
+# Caching - `responses` holds versioned DRF responses for hot read endpoints
+# (see tasks.caching). locmem is per process; `file` or `db` are shared by all
+# workers (run `python manage.py createcachetable` for `db`).
+RESPONSE_CACHE_ENABLED = config('RESPONSE_CACHE_ENABLED', default=True, cast=bool)
+RESPONSE_CACHE_BACKEND = config('RESPONSE_CACHE_BACKEND', default='locmem')
+RESPONSE_CACHE_MAX_ENTRY_BYTES = config('RESPONSE_CACHE_MAX_ENTRY_BYTES', default=512 * 1024, cast=int)
+
+_response_cache_backends = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'smart-todo-responses',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('RESPONSE_CACHE_DIR', default=os.path.join(tempfile.gettempdir(), 'smart_todo_responses')),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'response_cache',
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        **_response_cache_backends[RESPONSE_CACHE_BACKEND],
+        'TIMEOUT': config('RESPONSE_CACHE_TIMEOUT', default=300, cast=int),
+        'OPTIONS': {
+            'MAX_ENTRIES': config('RESPONSE_CACHE_MAX_ENTRIES', default=1000, cast=int),
+        },
+    },
+}
+
+# Model version counters are mirrored into a shared cache so validating a
+# cached response needs no database query. A per-process cache cannot be
+# trusted for this, so locmem keeps reading versions from the database.
+MODEL_VERSION_CACHE = None if RESPONSE_CACHE_BACKEND == 'locmem' else 'responses'
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -134,6 +197,15 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'tasks.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'tasks.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20
 }
@@ -158,6 +230,7 @@ CORS_ALLOW_ALL_ORIGINS = config('CORS_ALLOW_ALL_ORIGINS', default=DEBUG, cast=bo
 
 # Additional CORS settings for better compatibility
 CORS_ALLOW_CREDENTIALS = True
+CORS_EXPOSE_HEADERS = ['etag', 'last-modified', 'server-timing', 'x-profile-file']
 CORS_ALLOWED_HEADERS = [
     'accept',
     'accept-encoding',
@@ -168,11 +241,61 @@ CORS_ALLOWED_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'if-none-match',
+    'if-modified-since',
+    'x-profile',
 ]
 
 # AI Configuration
 OPENAI_API_KEY = config('OPENAI_API_KEY', default='')
 LOCAL_LLM_URL = config('LOCAL_LLM_URL', default='http://127.0.0.1:1234/v1/chat/completions')
+# Several OpenAI-compatible local backends, comma separated; requests are
+# balanced across them (see ai_module.llm_pool). Defaults to LOCAL_LLM_URL.
+LOCAL_LLM_URLS = config('LOCAL_LLM_URLS', default='', cast=Csv()) or [LOCAL_LLM_URL]
+LOCAL_LLM_EJECT_AFTER = config('LOCAL_LLM_EJECT_AFTER', default=3, cast=int)  # consecutive failures
+LOCAL_LLM_EJECT_SECONDS = config('LOCAL_LLM_EJECT_SECONDS', default=10.0, cast=float)
+LOCAL_LLM_HEALTH_INTERVAL = config('LOCAL_LLM_HEALTH_INTERVAL', default=10.0, cast=float)  # 0 disables
+
+# AI admission control (see ai_module.admission): model calls beyond the rate
+# limit, or beyond AI_MAX_CONCURRENCY running plus AI_MAX_QUEUE waiting, are
+# answered from the keyword fallbacks. The rate limit is split between the
+# WEB_CONCURRENCY worker processes unless AI_RATE_LIMIT_SHARED keeps one token
+# bucket in a locked database row.
+WEB_CONCURRENCY = config('WEB_CONCURRENCY', default=1, cast=int)  # set by the Dockerfile, read by gunicorn
+AI_RATE_LIMIT = config('AI_RATE_LIMIT', default=5.0, cast=float)  # calls per second, 0 disables
+AI_RATE_BURST = config('AI_RATE_BURST', default=20, cast=int)
+AI_MAX_CONCURRENCY = config('AI_MAX_CONCURRENCY', default=4, cast=int)
+AI_MAX_QUEUE = config('AI_MAX_QUEUE', default=32, cast=int)
+AI_QUEUE_TIMEOUT = config('AI_QUEUE_TIMEOUT', default=10.0, cast=float)  # seconds
+AI_RATE_LIMIT_SHARED = config('AI_RATE_LIMIT_SHARED', default=False, cast=bool)
+# A backend that answers with a rate limit (429) is skipped this long
+AI_BACKEND_BACKOFF = config('AI_BACKEND_BACKOFF', default=60.0, cast=float)  # seconds
+# Totals of the admission counters across workers, best effort
+AI_METRICS_CACHE = config('AI_METRICS_CACHE', default='responses')
+# Batch lane (re-ranking, context batches): at most this many of the
+# AI_MAX_CONCURRENCY slots, served after waiting interactive calls; batch
+# calls still waiting AI_BATCH_DEADLINE seconds after the job started are dropped
+AI_BATCH_MAX_CONCURRENCY = config('AI_BATCH_MAX_CONCURRENCY', default=2, cast=int)
+AI_BATCH_MAX_QUEUE = config('AI_BATCH_MAX_QUEUE', default=256, cast=int)
+AI_BATCH_QUEUE_TIMEOUT = config('AI_BATCH_QUEUE_TIMEOUT', default=120.0, cast=float)  # seconds
+AI_BATCH_DEADLINE = config('AI_BATCH_DEADLINE', default=300.0, cast=float)  # seconds
+# POST /api/ai/rerank/ ranks at most this many tasks and drops calls still
+# waiting after the timeout; larger backlogs go through `manage.py rerank_tasks`
+AI_RERANK_MAX_TASKS = config('AI_RERANK_MAX_TASKS', default=200, cast=int)
+AI_RERANK_TIMEOUT = config('AI_RERANK_TIMEOUT', default=60.0, cast=float)  # seconds
+
+# Context retention - processed entries older than this are compacted by
+# `manage.py compact_contexts` into per-period summaries plus a compressed archive
+CONTEXT_RETENTION_DAYS = config('CONTEXT_RETENTION_DAYS', default=30, cast=int)
+CONTEXT_RETENTION_PERIOD = config('CONTEXT_RETENTION_PERIOD', default='week')
+
+# Request profiling - when enabled, requests with an `X-Profile` header or
+# `?_profile=` get a Server-Timing header; `cprofile` also dumps a .prof file
+REQUEST_PROFILING = config('REQUEST_PROFILING', default=False, cast=bool)
+REQUEST_PROFILING_DIR = config('REQUEST_PROFILING_DIR', default=os.path.join(BASE_DIR, 'profiles'))
+REQUEST_PROFILING_MAX_FILES = config('REQUEST_PROFILING_MAX_FILES', default=100, cast=int)
+# Sent as X-Profile-Token; without it only DEBUG servers honour X-Profile
+REQUEST_PROFILING_TOKEN = config('REQUEST_PROFILING_TOKEN', default='')
 
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = '/static/'
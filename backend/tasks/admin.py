@@ -1,5 +1,92 @@
 from django.contrib import admin
-from .models import Task, Category, ContextEntry, Subtask
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models.functions import Substr
+from django.forms.models import BaseInlineFormSet
+from django.utils.functional import cached_property
+
+from .models import Task, Category, ContextEntry, Subtask, Tag, ContextSummary, DailyTaskStats
+from .search import get_search_backend
+
+# Unfiltered changelists of tables at least this large show the planner's
+# row estimate instead of running COUNT(*)
+ESTIMATED_COUNT_THRESHOLD = 10000
+# Existing subtasks rendered inline on a task's change form
+INLINE_SUBTASK_LIMIT = 50
+PREVIEW_LENGTH = 100
+
+
+def estimated_row_count(model, using):
+    """The database's row estimate for ``model``'s table, or None when it has none"""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)', [table])
+            row = cursor.fetchone()
+            # -1 (or 0 on old servers) until the table has been analyzed
+            return row[0] if row and row[0] > 0 else None
+        if connection.vendor == 'sqlite':
+            # Filled by ANALYZE; the first number of a stat row is the table size
+            if 'sqlite_stat1' not in connection.introspection.table_names(cursor):
+                return None
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+            row = cursor.fetchone()
+            return int(row[0].split()[0]) if row else None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that skips ``COUNT(*)`` for unfiltered changelists of large tables
+
+    Filtered or searched lists are still counted exactly, as their WHERE
+    clause usually hits an index. The page links of an estimated count may
+    be slightly off, which the admin tolerates.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class DeferredChangeList(ChangeList):
+    def get_queryset(self, request, *args, **kwargs):
+        queryset = super().get_queryset(request, *args, **kwargs)
+        return self.model_admin.get_changelist_queryset(queryset)
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Base admin for tables that grow without bound
+
+    Changelists use the estimated-count paginator, skip the second unfiltered
+    count, load only the columns they display (``list_defer`` names the large
+    ones) and search through the full-text index where one exists.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_defer = []
+
+    def get_changelist(self, request, **kwargs):
+        return DeferredChangeList
+
+    def get_changelist_queryset(self, queryset):
+        """Queryset behind the changelist only; change forms still load every column"""
+        return queryset.defer(*self.list_defer) if self.list_defer else queryset
+
+    def get_search_results(self, request, queryset, search_term):
+        backend = get_search_backend(queryset.model)
+        terms = search_term.split()
+        if not terms or backend is None:
+            return super().get_search_results(request, queryset, search_term)
+        return backend.search(queryset, terms), False
 
 
 @admin.register(Category)
@@ -8,35 +95,83 @@ class CategoryAdmin(admin.ModelAdmin):
     search_fields = ['name']
     readonly_fields = ['usage_count', 'created_at']
 
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ['name', 'created_at']
+    search_fields = ['name']
+    readonly_fields = ['created_at']
+
+class BoundedInlineFormSet(BaseInlineFormSet):
+    """Renders at most ``INLINE_SUBTASK_LIMIT`` existing subtasks"""
+
+    def get_queryset(self):
+        if not hasattr(self, '_bounded_queryset'):
+            self._bounded_queryset = super().get_queryset()[:INLINE_SUBTASK_LIMIT]
+        return self._bounded_queryset
+
 class SubtaskInline(admin.TabularInline):
     model = Subtask
+    formset = BoundedInlineFormSet
     extra = 0
     fields = ['title', 'completed', 'order']
+    show_change_link = True
 
 @admin.register(Task)
-class TaskAdmin(admin.ModelAdmin):
+class TaskAdmin(LargeTableAdmin):
     list_display = ['title', 'category', 'priority', 'status', 'deadline', 'created_at']
-    list_filter = ['status', 'priority', 'category', 'ai_enhanced', 'created_at']
+    # Filters list static choices; none of them scans the task table for values
+    list_filter = [
+        'status', ('priority', admin.ChoicesFieldListFilter), 'category', 'ai_enhanced', 'created_at',
+    ]
+    list_select_related = ['category']
+    list_defer = ['description', 'original_description', 'tags']
     search_fields = ['title', 'description']
-    readonly_fields = ['created_at', 'updated_at']
-    date_hierarchy = 'created_at'
+    autocomplete_fields = ['category']
+    readonly_fields = ['completed_at', 'created_at', 'updated_at']
     inlines = [SubtaskInline]
 
 
 @admin.register(Subtask)
-class SubtaskAdmin(admin.ModelAdmin):
+class SubtaskAdmin(LargeTableAdmin):
     list_display = ['title', 'task', 'completed', 'order', 'created_at']
     list_filter = ['completed', 'created_at']
+    list_select_related = ['task']
+    list_defer = ['task__description', 'task__original_description', 'task__tags']
     search_fields = ['title', 'task__title']
+    autocomplete_fields = ['task']
     readonly_fields = ['created_at', 'updated_at']
 
 @admin.register(ContextEntry)
-class ContextEntryAdmin(admin.ModelAdmin):
+class ContextEntryAdmin(LargeTableAdmin):
     list_display = ['source', 'content_preview', 'processed', 'created_at']
     list_filter = ['source', 'processed', 'created_at']
+    list_defer = ['content', 'insights']
     search_fields = ['content']
     readonly_fields = ['created_at']
-    
+
+    def get_changelist_queryset(self, queryset):
+        # The preview is cut by the database instead of loading whole email bodies
+        queryset = super().get_changelist_queryset(queryset)
+        return queryset.annotate(content_head=Substr('content', 1, PREVIEW_LENGTH + 1))
+
     def content_preview(self, obj):
-        return obj.content[:100] + "..." if len(obj.content) > 100 else obj.content
+        content = getattr(obj, 'content_head', None)
+        if content is None:
+            content = obj.content
+        return content[:PREVIEW_LENGTH] + "..." if len(content) > PREVIEW_LENGTH else content
     content_preview.short_description = 'Content Preview'
+
+
+@admin.register(ContextSummary)
+class ContextSummaryAdmin(admin.ModelAdmin):
+    list_display = ['source', 'period', 'period_start', 'period_end', 'entry_count']
+    list_filter = ['source', 'period']
+    readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(DailyTaskStats)
+class DailyTaskStatsAdmin(admin.ModelAdmin):
+    list_display = ['day', 'category', 'priority', 'created', 'completed', 'due', 'on_time']
+    list_filter = ['priority', 'category']
+    list_select_related = ['category']
+    date_hierarchy = 'day'
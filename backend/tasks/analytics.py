@@ -0,0 +1,404 @@
+"""
+Daily task analytics served from precomputed rollups.
+
+``DailyTaskStats`` keeps one row per day, category and priority with the
+tasks created, completed and due on that day. Each row depends only on the
+current task rows, so it can be maintained incrementally by recomputing the
+days that a write touched. Task signals collect the created, completed and
+deadline days of every written task, both before and after the write. On
+commit those days are queued as ``PendingStatsDay`` rows with one INSERT;
+requests never rebuild anything themselves. A background thread per process
+rebuilds the queued days ``TASK_STATS_REFRESH_DELAY`` seconds later, so a
+burst of writes to the same days costs one rebuild, with ``refresh_days``
+running three GROUP BY queries per run of consecutive days. With the delay
+set to 0 no thread runs and ``backfill_task_stats --pending`` drains the
+queue instead. On PostgreSQL, concurrent rebuilds of the same day take turns
+through advisory locks, so a rebuild never misses the rows another one is
+about to commit. ``rebuild_stats`` recomputes a whole range and backs the
+``backfill_task_stats`` command.
+
+Charts read a few hundred rollup rows (``stats_series``) instead of scanning
+the task table, and trail writes by about the refresh delay. Days are calendar days in ``TIME_ZONE``. A day's overdue
+count is ``due - on_time`` once the day is over. For the current day it is
+counted live, because it changes without any write.
+"""
+import threading
+from datetime import datetime, time, timedelta
+from time import sleep
+
+from django.conf import settings
+from django.db import close_old_connections, connections, router, transaction
+from django.db.models import Count, DateField, DurationField, ExpressionWrapper, F, Max, Min, Q, Sum
+from django.db.models.functions import Trunc, TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+from .models import DailyTaskStats, PendingStatsDay, Task
+from .versioning import mark_changed
+
+BUCKET_DAYS = {'day': 1, 'week': 7, 'month': 28}
+# Range returned when no ?start= is given
+DEFAULT_SPAN_DAYS = {'day': 31, 'week': 84, 'month': 366}
+MAX_BUCKETS = 400
+GROUP_FIELDS = ('category', 'priority')
+# Days rebuilt per transaction by rebuild_stats
+REBUILD_CHUNK_DAYS = 31
+# First key of the PostgreSQL advisory locks taken per rebuilt day
+STATS_LOCK_NAMESPACE = 0x5374
+
+_pending = threading.local()
+_refresher = None
+_refresher_lock = threading.Lock()
+_wake = threading.Event()
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _task_days(created_at, completed_at, deadline):
+    return [timezone.localdate(value) for value in (created_at, completed_at, deadline) if value is not None]
+
+
+def _flush_pending():
+    days = getattr(_pending, 'days', None)
+    if not days:
+        return
+    _pending.days = set()
+    queue_days(days)
+
+
+def mark_days(days):
+    """Queue a rebuild of ``days`` when the current transaction commits"""
+    if not hasattr(_pending, 'days'):
+        _pending.days = set()
+    _pending.days.update(days)
+    transaction.on_commit(_flush_pending)
+
+
+def task_days(task):
+    """The days a task instance counts towards"""
+    return _task_days(task.created_at, task.completed_at, task.deadline)
+
+
+def previous_task_days(task):
+    """The days a saved task counted towards before its unsaved changes"""
+    values = task.loaded_values('created_at', 'completed_at', 'deadline')
+    if values is None:
+        return task_row_days(Task.objects.filter(pk=task.pk))
+    return _task_days(*values)
+
+
+def mark_tasks(tasks):
+    """Schedule a rebuild of the days that task instances count towards"""
+    mark_days(day for task in tasks for day in task_days(task))
+
+
+def task_row_days(queryset):
+    """The days the rows of ``queryset`` count towards, read with one query"""
+    return {
+        day for row in queryset.values_list('created_at', 'completed_at', 'deadline').iterator()
+        for day in _task_days(*row)
+    }
+
+
+def mark_task_rows(queryset):
+    """``mark_tasks`` for the rows of ``queryset``"""
+    mark_days(task_row_days(queryset))
+
+
+def _runs(days):
+    """Sorted days grouped into ``(first, last)`` runs of consecutive days"""
+    runs = []
+    for day in sorted(set(days)):
+        if runs and day - runs[-1][1] == timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return [tuple(run) for run in runs]
+
+
+def _daily_counts(field, start, end, **aggregates):
+    rows = (
+        Task.objects.filter(**{f'{field}__gte': start, f'{field}__lt': end})
+        .annotate(day=TruncDate(field))
+        .order_by()
+        .values('day', 'category_id', 'priority')
+        .annotate(**aggregates)
+    )
+    for row in rows:
+        yield (row.pop('day'), row.pop('category_id'), row.pop('priority')), row
+
+
+def _rebuild(first, last):
+    start, end = _day_start(first), _day_start(last + timedelta(days=1))
+    duration = ExpressionWrapper(F('completed_at') - F('created_at'), output_field=DurationField())
+    stats = {}
+    for field, aggregates in (
+        ('created_at', {'created': Count('pk')}),
+        ('completed_at', {'completed': Count('pk'), 'completion_time': Sum(duration)}),
+        ('deadline', {'due': Count('pk'), 'on_time': Count('pk', filter=Q(completed_at__lte=F('deadline')))}),
+    ):
+        for key, values in _daily_counts(field, start, end, **aggregates):
+            stats.setdefault(key, {}).update(values)
+
+    rows = []
+    for (day, category_id, priority), values in stats.items():
+        completion_time = values.pop('completion_time', None)
+        rows.append(DailyTaskStats(
+            day=day, category_id=category_id, priority=priority,
+            completion_seconds=int(completion_time.total_seconds()) if completion_time else 0,
+            **values,
+        ))
+    DailyTaskStats.objects.filter(day__gte=first, day__lte=last).delete()
+    DailyTaskStats.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def _lock_days(days):
+    """
+    Wait for other transactions rebuilding any of ``days`` (PostgreSQL)
+
+    Without it, under READ COMMITTED two rebuilds of one day could both
+    delete the old rows and both insert theirs. Other databases serialize
+    writing transactions already.
+    """
+    connection = connections[router.db_for_write(DailyTaskStats)]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        # Always in the same order, so two rebuilds cannot deadlock
+        for day in sorted(days):
+            cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)', [STATS_LOCK_NAMESPACE, day.toordinal()])
+
+
+def queue_days(days):
+    """Queue ``days`` for the refresh thread, or for ``refresh_pending_days``"""
+    PendingStatsDay.objects.bulk_create([PendingStatsDay(day=day) for day in set(days)], ignore_conflicts=True)
+    _ensure_refresher()
+    _wake.set()
+
+
+def _ensure_refresher():
+    global _refresher
+    delay = getattr(settings, 'TASK_STATS_REFRESH_DELAY', 2.0)
+    if _refresher is not None or not delay:
+        return
+    with _refresher_lock:
+        if _refresher is None:
+            _refresher = threading.Thread(
+                target=_refresh_loop, args=(delay,), name='task-stats-refresh', daemon=True
+            )
+            _refresher.start()
+
+
+def _refresh_loop(delay):
+    while True:
+        _wake.wait()
+        # Days queued meanwhile are rebuilt in the same pass
+        sleep(delay)
+        _wake.clear()
+        close_old_connections()
+        try:
+            refresh_pending_days()
+        except Exception:
+            _wake.set()  # the days are still queued; retried after the next delay
+
+
+def refresh_pending_days(chunk_days=REBUILD_CHUNK_DAYS):
+    """Rebuild the queued days, ``chunk_days`` per transaction; returns the number of rows written"""
+    written = 0
+    while True:
+        days = list(PendingStatsDay.objects.order_by('day').values_list('day', flat=True)[:chunk_days])
+        if not days:
+            return written
+        # Dequeued before the rebuild and outside its transaction, so a write
+        # committing meanwhile queues the day again instead of waiting for it
+        PendingStatsDay.objects.filter(day__in=days).delete()
+        try:
+            written += refresh_days(days)
+        except Exception:
+            PendingStatsDay.objects.bulk_create([PendingStatsDay(day=day) for day in days], ignore_conflicts=True)
+            raise
+
+
+def refresh_days(days):
+    """Recompute the rollup rows of ``days``; returns the number of rows written"""
+    days = set(days)
+    written = 0
+    with transaction.atomic():
+        _lock_days(days)
+        for first, last in _runs(days):
+            written += _rebuild(first, last)
+        mark_changed(DailyTaskStats)
+    return written
+
+
+def task_date_range():
+    """``(first, last)`` day any task counts towards, or None without tasks"""
+    bounds = Task.objects.aggregate(
+        created=Min('created_at'), completed=Max('completed_at'), first_deadline=Min('deadline'),
+        last_created=Max('created_at'), last_deadline=Max('deadline'),
+    )
+    if bounds['created'] is None:
+        return None
+    first = min(value for value in (bounds['created'], bounds['first_deadline']) if value is not None)
+    last = max(
+        value for value in (bounds['last_created'], bounds['completed'], bounds['last_deadline']) if value is not None
+    )
+    return timezone.localdate(first), timezone.localdate(last)
+
+
+def rebuild_stats(first=None, last=None, chunk_days=REBUILD_CHUNK_DAYS, progress=None):
+    """
+    Recompute the rollups of ``first..last`` (default: every day with tasks)
+
+    Rows outside the range are left alone. Each chunk of ``chunk_days`` days
+    commits on its own; ``progress(last_day_done, rows)`` is called after each.
+    """
+    if first is None or last is None:
+        bounds = task_date_range()
+        if bounds is None:
+            return 0
+        first, last = first or bounds[0], last or bounds[1]
+    written = 0
+    while first <= last:
+        chunk_last = min(first + timedelta(days=chunk_days - 1), last)
+        rows = refresh_days([first + timedelta(days=offset) for offset in range((chunk_last - first).days + 1)])
+        written += rows
+        if progress:
+            progress(chunk_last, rows)
+        first = chunk_last + timedelta(days=1)
+    return written
+
+
+def _parse_day(params, name):
+    if not params.get(name):
+        return None
+    try:
+        day = parse_date(params[name])
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValidationError({name: 'Expected a date (YYYY-MM-DD).'})
+    return day
+
+
+def parse_stats_params(params):
+    """
+    Validate ``?bucket=``, ``?start=``, ``?end=``, ``?group_by=``, ``?category=`` and ``?priority=``
+
+    ``end`` defaults to today and ``start`` to ``DEFAULT_SPAN_DAYS[bucket]``
+    before ``end``; both are inclusive.
+    """
+    bucket = params.get('bucket', 'day')
+    if bucket not in BUCKET_DAYS:
+        raise ValidationError({'bucket': f"Expected one of: {', '.join(BUCKET_DAYS)}."})
+    group_by = params.get('group_by') or None
+    if group_by is not None and group_by not in GROUP_FIELDS:
+        raise ValidationError({'group_by': f"Expected one of: {', '.join(GROUP_FIELDS)}."})
+    end = _parse_day(params, 'end') or timezone.localdate()
+    start = _parse_day(params, 'start') or end - timedelta(days=DEFAULT_SPAN_DAYS[bucket] - 1)
+    if end < start:
+        raise ValidationError({'end': 'Must not be before start.'})
+    if ((end - start).days + 1) / BUCKET_DAYS[bucket] > MAX_BUCKETS:
+        raise ValidationError({'end': f'Range spans more than {MAX_BUCKETS} buckets.'})
+
+    filters = {}
+    category = params.get('category')
+    if category:
+        if category == 'none':
+            filters['category__isnull'] = True
+        elif category.isdigit():
+            filters['category_id'] = int(category)
+        else:
+            raise ValidationError({'category': 'Expected a category id or "none".'})
+    priority = params.get('priority')
+    if priority:
+        if not priority.isdigit():
+            raise ValidationError({'priority': 'Expected a priority value.'})
+        filters['priority'] = int(priority)
+    return {'bucket': bucket, 'start': start, 'end': end, 'group_by': group_by, 'filters': filters}
+
+
+def _bucket_of(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _live_overdue(group_by, filters, now):
+    """Tasks due earlier today and not completed by their deadline, per group"""
+    today_start = _day_start(timezone.localdate(now))
+    rows = (
+        Task.objects.filter(deadline__gte=today_start, deadline__lt=now, **filters)
+        .exclude(completed_at__lte=F('deadline'))
+        .order_by()
+    )
+    group = [group_by] if group_by else []
+    return {
+        row[group[0]] if group else None: row['overdue']
+        for row in rows.values(*group).annotate(overdue=Count('pk'))
+    }
+
+
+def stats_series(bucket, start, end, group_by=None, filters=None, now=None):
+    """
+    ``(series, totals)`` aggregated from the rollup rows of ``start..end``
+
+    Each series entry carries ``period`` (first day of the bucket), the group
+    value when ``group_by`` is set, ``created``, ``completed``, ``due``,
+    ``overdue`` and ``avg_completion_hours``.
+    """
+    filters = filters or {}
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    group = [group_by] if group_by else []
+    period = F('day') if bucket == 'day' else Trunc('day', bucket, output_field=DateField())
+    finished = Q(day__lt=today)
+    rows = (
+        DailyTaskStats.objects.filter(day__gte=start, day__lte=end, **filters)
+        .annotate(period=period)
+        .order_by()
+        .values('period', *group)
+        .annotate(
+            # Before ``due`` is redefined as an aggregate
+            overdue=Sum(F('due') - F('on_time'), filter=finished),
+            created=Sum('created'),
+            completed=Sum('completed'),
+            due=Sum('due'),
+            completion_seconds=Sum('completion_seconds'),
+        )
+        .order_by('period', *group)
+    )
+    series = {}
+    for row in rows:
+        row['overdue'] = row['overdue'] or 0
+        series[(row['period'], row[group[0]] if group else None)] = row
+
+    if start <= today <= end:
+        today_bucket = _bucket_of(today, bucket)
+        for value, overdue in _live_overdue(group_by, filters, now).items():
+            row = series.setdefault((today_bucket, value), {
+                'period': today_bucket, **({group[0]: value} if group else {}),
+                'created': 0, 'completed': 0, 'due': 0, 'overdue': 0, 'completion_seconds': 0,
+            })
+            row['overdue'] += overdue
+
+    totals = {'created': 0, 'completed': 0, 'due': 0, 'overdue': 0, 'completion_seconds': 0}
+    result = []
+    for key in sorted(series, key=lambda key: (key[0], key[1] is None, key[1] or 0)):
+        row = series[key]
+        for name in totals:
+            totals[name] += row[name]
+        result.append(_with_average(row))
+    return result, _with_average(totals)
+
+
+def _with_average(row):
+    seconds = row.pop('completion_seconds')
+    row['avg_completion_hours'] = round(seconds / row['completed'] / 3600, 2) if row['completed'] else None
+    return row
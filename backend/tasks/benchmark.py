@@ -0,0 +1,293 @@
+"""
+Synthetic data and an API load benchmark.
+
+``seed_dataset`` bulk-inserts realistic categories, tasks, subtasks and
+context entries with ``created_at`` spread over the past year. It writes in
+batches without per-row signals, so it produces no change-log or event
+entries; cached responses are invalidated and the daily task stats rebuilt
+once at the end.
+
+``run_benchmark`` replays read-heavy API scenarios from N threads and reports
+throughput, latency percentiles and SQL queries per request. By default it
+calls the application in-process through Django's test client against the
+configured database (SQLite or PostgreSQL, see ``DB_NAME`` in settings); with
+``base_url`` it sends real HTTP requests to a running server instead, where
+query counts are not available.
+"""
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import timedelta
+
+from django.db import connection, connections, transaction
+from django.db.models import Max, Min
+from django.test import Client
+from django.utils import timezone
+
+from .analytics import rebuild_stats
+from .bulk import BULK_BATCH_SIZE
+from .models import Category, ContextEntry, Subtask, Task
+from .similarity import sync_similarity_keys
+from .tagging import sync_task_tags
+from .versioning import mark_changed
+
+CATEGORY_NAMES = [
+    'Work', 'Personal', 'Health', 'Finance', 'Learning', 'Home', 'Travel', 'Shopping',
+    'Family', 'Errands', 'Projects', 'Meetings', 'Admin', 'Fitness', 'Reading',
+]
+VERBS = [
+    'Prepare', 'Review', 'Write', 'Call', 'Schedule', 'Update', 'Fix', 'Plan',
+    'Send', 'Book', 'Organize', 'Finish', 'Draft', 'Clean', 'Pay', 'Renew',
+]
+OBJECTS = [
+    'quarterly report', 'budget', 'presentation', 'dentist appointment', 'project plan',
+    'invoice', 'team meeting', 'insurance', 'grocery list', 'flight', 'blog post',
+    'code review', 'tax return', 'gym plan', 'client proposal', 'newsletter',
+]
+TAGS = ['urgent', 'quick', 'waiting', 'email', 'phone', 'errand', 'deep-work', 'weekly', 'q3', 'blocked']
+PHRASES = [
+    'Please send the latest numbers before the deadline',
+    'Reminder that the meeting moved to Thursday afternoon',
+    'Can we review the proposal together this week',
+    'The invoice is overdue and needs attention',
+    'Dinner plans for the weekend are still open',
+    'Need to renew the subscription before it expires',
+    'Team sync notes: follow up on the open action items',
+    'Flight confirmation and hotel booking details attached',
+]
+STATUS_WEIGHTS = (('todo', 5), ('in_progress', 3), ('done', 2))
+# Words that occur in seeded titles and content, used by the search scenarios
+SEARCH_WORDS = ['report', 'budget', 'meeting', 'invoice', 'proposal', 'flight']
+
+# Placeholders: {task_id} is an existing task, {word} a term in SEARCH_WORDS
+SCENARIOS = {
+    'tasks-list': '/api/tasks/',
+    'tasks-filtered': '/api/tasks/?status=todo&ordering=-priority',
+    'tasks-search': '/api/tasks/?search={word}',
+    'tasks-detail': '/api/tasks/{task_id}/',
+    'tasks-stats': '/api/tasks/stats/',
+    'tasks-overdue': '/api/tasks/overdue/',
+    'tasks-high-priority': '/api/tasks/high_priority/',
+    'subtasks-list': '/api/subtasks/?task={task_id}',
+    'contexts-list': '/api/contexts/',
+    'contexts-search': '/api/contexts/?search={word}',
+    'categories-list': '/api/categories/',
+    'analytics-monthly': '/api/analytics/?bucket=month&group_by=category',
+}
+
+
+def _spread_dates(objects, rng, now, days):
+    for obj in objects:
+        obj.created_at = now - timedelta(seconds=rng.randrange(days * 86400))
+        if hasattr(obj, 'updated_at'):
+            obj.updated_at = obj.created_at + timedelta(seconds=rng.randrange(7 * 86400))
+        if getattr(obj, 'status', None) == 'done':
+            obj.completed_at = min(obj.updated_at, now)
+
+
+def _task(rng, categories, now):
+    verb, thing = rng.choice(VERBS), rng.choice(OBJECTS)
+    deadline = None
+    if rng.random() < 0.7:
+        deadline = now + timedelta(days=rng.randint(-30, 60), hours=rng.randint(0, 23))
+    return Task(
+        title=f'{verb} {thing}',
+        description=' '.join(rng.choices(PHRASES, k=rng.randint(0, 4))),
+        category=rng.choice(categories) if rng.random() < 0.85 else None,
+        priority=rng.choice(Task.PRIORITY_CHOICES)[0],
+        deadline=deadline,
+        status=rng.choices(*zip(*STATUS_WEIGHTS))[0],
+        tags=rng.sample(TAGS, rng.randint(0, 3)),
+    )
+
+
+def seed_dataset(tasks=10000, subtasks_per_task=3, contexts=10000, categories=len(CATEGORY_NAMES),
+                 days=365, batch_size=BULK_BATCH_SIZE, seed=0, progress=None):
+    """
+    Insert a synthetic dataset and return ``{model: rows created}``
+
+    The same ``seed`` always produces the same rows. Subtask counts per task
+    are uniform on ``0..2 * subtasks_per_task``. ``progress(label, done)``
+    is called after every batch.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    names = [
+        CATEGORY_NAMES[i] if i < len(CATEGORY_NAMES) else f'{CATEGORY_NAMES[i % len(CATEGORY_NAMES)]} {i}'
+        for i in range(categories)
+    ]
+    existing = set(Category.objects.filter(name__in=names).values_list('name', flat=True))
+    Category.objects.bulk_create([Category(name=name) for name in names if name not in existing])
+    category_objects = list(Category.objects.filter(name__in=names)) or [None]
+    counts = {'categories': len(names) - len(existing), 'tasks': 0, 'subtasks': 0, 'contexts': 0}
+
+    while counts['tasks'] < tasks:
+        size = min(batch_size, tasks - counts['tasks'])
+        with transaction.atomic():
+            batch = Task.objects.bulk_create([_task(rng, category_objects, now) for _ in range(size)])
+            # created_at/updated_at are auto fields, so backdate them afterwards
+            _spread_dates(batch, rng, now, days)
+            Task.objects.bulk_update(batch, ['created_at', 'updated_at', 'completed_at'])
+            sync_task_tags(batch)
+            sync_similarity_keys(batch)
+            subtasks = [
+                Subtask(task=task, title=f'Step {order + 1}', order=order, completed=rng.random() < 0.4)
+                for task in batch for order in range(rng.randint(0, 2 * subtasks_per_task))
+            ]
+            Subtask.objects.bulk_create(subtasks, batch_size=batch_size)
+        counts['tasks'] += size
+        counts['subtasks'] += len(subtasks)
+        if progress:
+            progress('tasks', counts['tasks'])
+
+    sources = [choice for choice, _ in ContextEntry.SOURCE_CHOICES]
+    while counts['contexts'] < contexts:
+        size = min(batch_size, contexts - counts['contexts'])
+        with transaction.atomic():
+            batch = ContextEntry.objects.bulk_create([
+                ContextEntry(
+                    content='. '.join(rng.choices(PHRASES, k=rng.randint(1, 6))),
+                    source=rng.choice(sources),
+                    processed=rng.random() < 0.5,
+                )
+                for _ in range(size)
+            ])
+            _spread_dates(batch, rng, now, days)
+            ContextEntry.objects.bulk_update(batch, ['created_at'])
+        counts['contexts'] += size
+        if progress:
+            progress('contexts', counts['contexts'])
+
+    mark_changed(Category, Task, Subtask, ContextEntry)
+    rebuild_stats()
+    return counts
+
+
+def _sample_task_ids(rng, size=500):
+    bounds = Task.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return []
+    span = range(bounds['low'], bounds['high'] + 1)
+    candidates = rng.sample(span, min(size, len(span)))
+    return list(Task.objects.filter(pk__in=candidates).values_list('pk', flat=True))
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _in_process_worker(paths, next_index, samples):
+    client = Client()
+    counter = _QueryCounter()
+    try:
+        with connection.execute_wrapper(counter):
+            while (index := next_index()) is not None:
+                counter.count = 0
+                started = time.perf_counter()
+                response = client.get(paths[index])
+                elapsed = time.perf_counter() - started
+                samples.append((elapsed, response.status_code, counter.count, response.get('X-Cache') == 'hit'))
+    finally:
+        connections.close_all()
+
+
+def _http_worker(base_url, paths, next_index, samples):
+    while (index := next_index()) is not None:
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(base_url + paths[index], timeout=60) as response:
+                response.read()
+                status, cache = response.status, response.headers.get('X-Cache')
+        except urllib.error.HTTPError as e:
+            status, cache = e.code, None
+        except OSError:
+            status, cache = 0, None
+        samples.append((time.perf_counter() - started, status, None, cache == 'hit'))
+
+
+def run_scenario(path_template, requests=200, concurrency=4, warmup=10, base_url=None, seed=0):
+    """Issue ``requests`` GETs from ``concurrency`` threads and summarize them"""
+    rng = random.Random(seed)
+    task_ids = _sample_task_ids(rng) if '{task_id}' in path_template else []
+    if '{task_id}' in path_template and not task_ids:
+        return {'path': path_template, 'skipped': 'no tasks'}
+    paths = [
+        path_template.format(task_id=rng.choice(task_ids) if task_ids else '', word=rng.choice(SEARCH_WORDS))
+        for _ in range(warmup + requests)
+    ]
+
+    def run(indexes):
+        lock = threading.Lock()
+        iterator = iter(indexes)
+
+        def next_index():
+            with lock:
+                return next(iterator, None)
+
+        samples = []
+        if base_url:
+            target, args = _http_worker, (base_url.rstrip('/'), paths, next_index, samples)
+        else:
+            target, args = _in_process_worker, (paths, next_index, samples)
+        threads = [threading.Thread(target=target, args=args) for _ in range(max(concurrency, 1))]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples, time.perf_counter() - started
+
+    run(range(warmup))
+    samples, wall_time = run(range(warmup, warmup + requests))
+
+    latencies = sorted(sample[0] * 1000 for sample in samples)
+    queries = [sample[2] for sample in samples if sample[2] is not None]
+    return {
+        'path': path_template,
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if not 200 <= sample[1] < 400),
+        'throughput_rps': round(len(samples) / wall_time, 1) if wall_time else None,
+        'mean_ms': round(statistics.fmean(latencies), 2) if latencies else None,
+        'p50_ms': round(_percentile(latencies, 0.50), 2) if latencies else None,
+        'p95_ms': round(_percentile(latencies, 0.95), 2) if latencies else None,
+        'p99_ms': round(_percentile(latencies, 0.99), 2) if latencies else None,
+        'max_ms': round(latencies[-1], 2) if latencies else None,
+        'queries_per_request': round(statistics.fmean(queries), 2) if queries else None,
+        'cache_hits': sum(1 for sample in samples if sample[3]),
+    }
+
+
+def run_benchmark(scenarios=None, requests=200, concurrency=4, warmup=10, base_url=None, seed=0, progress=None):
+    """Run ``scenarios`` (names in ``SCENARIOS``, default all) one after another"""
+    results = {}
+    for name in scenarios or SCENARIOS:
+        results[name] = run_scenario(
+            SCENARIOS[name], requests=requests, concurrency=concurrency,
+            warmup=warmup, base_url=base_url, seed=seed,
+        )
+        if progress:
+            progress(name, results[name])
+    return results
+
+
+def dataset_size():
+    return {
+        'categories': Category.objects.count(),
+        'tasks': Task.objects.count(),
+        'subtasks': Subtask.objects.count(),
+        'contexts': ContextEntry.objects.count(),
+    }
@@ -0,0 +1,35 @@
+"""
+Helpers shared by the bulk write paths (bulk API actions and importers).
+"""
+from collections import Counter
+
+from django.db.models import F
+
+from .models import Category
+from .signals import send_bulk_change
+
+BULK_BATCH_SIZE = 500
+
+
+def resolve_categories(names):
+    """Return ``{name: Category}`` for ``names``, creating missing ones in one INSERT"""
+    names = {name for name in names if name}
+    if not names:
+        return {}
+    categories = {category.name: category for category in Category.objects.filter(name__in=names)}
+    missing = names - set(categories)
+    if missing:
+        Category.objects.bulk_create([Category(name=name) for name in missing], ignore_conflicts=True)
+        created = {category.name: category for category in Category.objects.filter(name__in=missing)}
+        categories.update(created)
+        send_bulk_change(Category, [category.pk for category in created.values()])
+    return categories
+
+
+def increment_category_usage(category_ids):
+    """Add one use per occurrence of each id, one UPDATE per distinct category"""
+    uses_by_category = Counter(pk for pk in category_ids if pk)
+    for category_id, uses in uses_by_category.items():
+        Category.objects.filter(pk=category_id).update(usage_count=F('usage_count') + uses)
+    if uses_by_category:
+        send_bulk_change(Category, uses_by_category)
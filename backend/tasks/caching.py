@@ -0,0 +1,134 @@
+"""
+Versioned response cache for hot, read-only viewset actions.
+
+Cache keys include the current version of every model a response depends on,
+so any write produces new keys and stale entries simply age out; nothing has
+to be invalidated explicitly. Entries live in the ``responses`` cache alias
+(locmem, file or database, see ``RESPONSE_CACHE_BACKEND``).
+
+Hits and misses are counted in process and added to the shared counters at
+most every ``STATS_FLUSH_SECONDS``, so a hit costs one cache read and no write.
+"""
+import functools
+import hashlib
+import pickle
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from .versioning import get_versions
+
+STATS_KEY = 'response-cache:stats:{}:{}'
+STATS_FLUSH_SECONDS = 10
+
+# Qualified names of every decorated action, for cache_stats()
+CACHED_VIEWS = []
+
+
+def response_cache():
+    return caches['responses']
+
+
+_counts = Counter()
+_counts_lock = threading.Lock()
+_next_flush = 0.0
+
+
+def _count(view_name, outcome):
+    with _counts_lock:
+        _counts[view_name, outcome] += 1
+    if time.monotonic() >= _next_flush:
+        flush_stats()
+
+
+def flush_stats():
+    """Add the counts of this process to the shared counters"""
+    global _next_flush
+    with _counts_lock:
+        counts = dict(_counts)
+        _counts.clear()
+        _next_flush = time.monotonic() + STATS_FLUSH_SECONDS
+    cache = response_cache()
+    for (view_name, outcome), count in counts.items():
+        key = STATS_KEY.format(view_name, outcome)
+        # add() seeds the counter so incr() never races on a missing key
+        cache.add(key, 0, timeout=None)
+        try:
+            cache.incr(key, count)
+        except ValueError:
+            pass
+
+
+def cached_response(*models, time_bucket=None):
+    """
+    Cache a viewset action's response data under the versions of ``models``
+
+    ``time_bucket`` (seconds) is for responses that also depend on the clock,
+    such as overdue counts; they are recomputed at least that often.
+    """
+
+    def decorator(view_method):
+        view_name = view_method.__qualname__
+        CACHED_VIEWS.append(view_name)
+
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if not settings.RESPONSE_CACHE_ENABLED:
+                return view_method(self, request, *args, **kwargs)
+
+            # Versions are read before the data so a concurrent write can
+            # only make the cached entry newer than its key, never older.
+            versions = get_versions(*models)
+            state = [
+                view_name, request.accepted_renderer.format,
+                repr(sorted(request.query_params.lists())), repr(sorted(versions.items())),
+            ]
+            if time_bucket:
+                state.append(str(int(time.time() // time_bucket)))
+            key = 'response:' + hashlib.md5('|'.join(state).encode()).hexdigest()
+
+            cache = response_cache()
+            payload = cache.get(key)
+            if payload is not None:
+                _count(view_name, 'hits')
+                response = Response(pickle.loads(payload))
+                response['X-Cache'] = 'hit'
+                return response
+
+            _count(view_name, 'misses')
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                payload = pickle.dumps(response.data, protocol=pickle.HIGHEST_PROTOCOL)
+                if len(payload) <= settings.RESPONSE_CACHE_MAX_ENTRY_BYTES:
+                    if time_bucket:
+                        cache.set(key, payload, timeout=time_bucket)
+                    else:
+                        cache.set(key, payload)
+            response['X-Cache'] = 'miss'
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def cache_stats():
+    """Hit/miss counters per cached view, as seen by the configured backend"""
+    flush_stats()
+    cache = response_cache()
+    keys = {
+        (name, outcome): STATS_KEY.format(name, outcome)
+        for name in CACHED_VIEWS for outcome in ('hits', 'misses')
+    }
+    values = cache.get_many(list(keys.values()))
+    stats = {}
+    for (name, outcome), key in keys.items():
+        stats.setdefault(name, {'hits': 0, 'misses': 0})[outcome] = values.get(key, 0)
+    for counts in stats.values():
+        total = counts['hits'] + counts['misses']
+        counts['hit_rate'] = round(counts['hits'] / total, 4) if total else None
+    return stats
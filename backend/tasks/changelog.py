@@ -0,0 +1,101 @@
+"""
+Change log behind the ``/api/sync/`` delta endpoint.
+
+Writes to synced models append ``ChangeLogEntry`` rows once the surrounding
+transaction commits, so entry ids are allocated roughly in commit order.
+Readers stay ``SYNC_SETTLE_SECONDS`` behind the newest entry to cover the
+short window in which two concurrent commits can still land out of order.
+Deletions are kept as ``delete`` entries, which serve as tombstones.
+Context entries are logged as well for the event stream (``tasks.events``),
+but are not part of the sync payload.
+"""
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import Category, ChangeLogEntry, ContextEntry, Subtask, Task
+
+SYNC_MODELS = {
+    'tasks': Task,
+    'subtasks': Subtask,
+    'categories': Category,
+}
+_LABELS = {model._meta.label_lower: name for name, model in SYNC_MODELS.items()}
+LOGGED_MODELS = [*SYNC_MODELS.values(), ContextEntry]
+_LOGGED_LABELS = {model._meta.label_lower for model in LOGGED_MODELS}
+
+_pending = threading.local()
+
+
+def _flush_pending():
+    changes = getattr(_pending, 'changes', None)
+    if not changes:
+        return
+    _pending.changes = {}
+    ChangeLogEntry.objects.bulk_create([
+        ChangeLogEntry(model=label, object_id=object_id, action=action)
+        for (label, object_id), action in changes.items()
+    ], batch_size=1000)
+
+
+def record_changes(model, pks, action):
+    """Log ``action`` for ``pks`` of a logged model when the transaction commits"""
+    label = model._meta.label_lower
+    if label not in _LOGGED_LABELS:
+        return
+    if not hasattr(_pending, 'changes'):
+        _pending.changes = {}
+    for pk in pks:
+        # Later writes to the same row win; dicts keep first-write order
+        _pending.changes.pop((label, pk), None)
+        _pending.changes[(label, pk)] = action
+    transaction.on_commit(_flush_pending)
+
+
+def latest_cursor():
+    return ChangeLogEntry.objects.aggregate(latest=Max('id'))['latest'] or 0
+
+
+def changes_since(cursor, limit):
+    """
+    Return ``(changes, next_cursor, has_more)`` for entries after ``cursor``
+
+    ``changes`` maps each sync collection name to ``{'upserts': set, 'deletes': set}``
+    with the final action per object; ``None`` means the cursor predates the
+    retained log and the client must reload everything.
+    """
+    oldest = ChangeLogEntry.objects.aggregate(oldest=Min('id'))['oldest']
+    if oldest is not None and cursor < oldest - 1:
+        return None, latest_cursor(), False
+
+    settled = timezone.now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    entries = list(
+        ChangeLogEntry.objects.filter(id__gt=cursor, changed_at__lte=settled, model__in=_LABELS)
+        .order_by('id')
+        .values_list('id', 'model', 'object_id', 'action')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    changes = {name: {'upserts': set(), 'deletes': set()} for name in SYNC_MODELS}
+    for _, label, object_id, action in entries:
+        bucket = changes[_LABELS[label]]
+        if action == 'delete':
+            bucket['upserts'].discard(object_id)
+            bucket['deletes'].add(object_id)
+        else:
+            bucket['deletes'].discard(object_id)
+            bucket['upserts'].add(object_id)
+    next_cursor = entries[-1][0] if entries else cursor
+    return changes, next_cursor, has_more
+
+
+def prune_change_log(older_than_days):
+    """Delete log entries older than the retention window; returns the count"""
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    deleted, _ = ChangeLogEntry.objects.filter(changed_at__lt=cutoff).delete()
+    return deleted
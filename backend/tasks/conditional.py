@@ -0,0 +1,98 @@
+"""
+ETag / Last-Modified support for read endpoints.
+
+Validators come from the per-model version counters (and a row's own
+``updated_at`` for detail views), so a matching ``If-None-Match`` or
+``If-Modified-Since`` is answered with ``304`` before any queryset is
+evaluated or serialized.
+"""
+import functools
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .versioning import get_versions
+
+
+def conditional_get(view_method):
+    """Serve ``304 Not Modified`` for a viewset action when validators still match"""
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        validators = self.get_conditional_validators(request, *args, **kwargs)
+        if validators is None:
+            return view_method(self, request, *args, **kwargs)
+        etag, last_modified = validators
+
+        not_modified = get_conditional_response(
+            request._request,
+            etag=etag,
+            last_modified=int(last_modified.timestamp()) if last_modified else None,
+        )
+        response = not_modified or view_method(self, request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified.timestamp())
+            # Let clients keep the body but always revalidate it
+            patch_cache_control(response, no_cache=True)
+        return response
+
+    return wrapper
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag/Last-Modified validation to ``list`` and ``retrieve``.
+
+    ``conditional_models`` lists every model whose changes can alter the
+    responses (the viewset's own model first). Responses that depend on the
+    clock, such as ``is_overdue``, set ``conditional_time_bucket`` to the
+    number of seconds a validator may stay valid without any write.
+    """
+    conditional_models = ()
+    conditional_time_bucket = None
+
+    def get_conditional_validators(self, request, *args, **kwargs):
+        models = list(self.conditional_models)
+        state = [request.get_full_path(), request.accepted_renderer.format]
+        modified = []
+
+        if self.detail:
+            model = self.get_queryset().model
+            if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+                lookup = self.lookup_url_kwarg or self.lookup_field
+                row = model._default_manager.filter(
+                    **{self.lookup_field: kwargs[lookup]}
+                ).values_list('updated_at', flat=True).first()
+                if row is None:
+                    return None  # let the view raise its usual 404
+                state.append(row.isoformat())
+                modified.append(row)
+                models = [other for other in models if other is not model]
+
+        for label, (version, updated_at) in sorted(get_versions(*models).items()):
+            state.append(f'{label}:{version}')
+            if updated_at:
+                modified.append(updated_at)
+
+        if self.conditional_time_bucket:
+            bucket = int(time.time() // self.conditional_time_bucket)
+            state.append(f'bucket:{bucket}')
+            modified.append(
+                datetime.fromtimestamp(bucket * self.conditional_time_bucket, tz=dt_timezone.utc)
+            )
+
+        etag = quote_etag(hashlib.md5('|'.join(state).encode()).hexdigest())
+        return etag, max(modified) if modified else None
+
+    @conditional_get
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
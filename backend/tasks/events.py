@@ -0,0 +1,202 @@
+"""
+Fan-out of model change events for the ``/api/events/`` stream.
+
+Events are read from the change log (see ``tasks.changelog``), which every
+worker process writes, so a stream sees writes served by any worker. While
+streams are open, each process polls the log every
+``EVENT_STREAM_POLL_SECONDS`` from one task on its event loop, staying
+``SYNC_SETTLE_SECONDS`` behind the newest entry like ``/api/sync/`` so that
+concurrent commits are not skipped. Consecutive entries of the same type and
+action become one ``{id, type, action, ids}`` event whose id is the id of
+its last entry, which makes event ids change-log cursors.
+
+A reconnecting client's ``Last-Event-ID`` is replayed from the log by
+whichever worker it reaches. When the id predates the retained log, or more
+than ``EVENT_STREAM_HISTORY`` entries were missed, the client is told to
+resync (``reset``). Every open stream owns a small bounded ``asyncio.Queue``,
+so an idle connection costs a queue and nothing else; a slow client whose
+queue fills up gets ``reset`` as well instead of holding events back.
+"""
+import asyncio
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import ChangeLogEntry, ContextEntry, Subtask, Task
+
+EVENT_MODELS = {
+    Task: 'task',
+    Subtask: 'subtask',
+    ContextEntry: 'context',
+}
+_TYPES = {model._meta.label_lower: event_type for model, event_type in EVENT_MODELS.items()}
+
+# Change-log entries read per query by the poller
+POLL_BATCH_SIZE = 1000
+
+# Put on a subscriber queue in place of events it had to drop
+RESET = {'type': 'reset'}
+
+
+def _settled():
+    return timezone.now() - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+
+
+def settled_cursor():
+    """Id of the newest change-log entry the stream may publish"""
+    return ChangeLogEntry.objects.filter(changed_at__lte=_settled()).aggregate(latest=Max('id'))['latest'] or 0
+
+
+def read_entries(after, limit, upto=None):
+    """Settled change-log entries of ``EVENT_MODELS`` after ``after``, oldest first"""
+    queryset = ChangeLogEntry.objects.filter(id__gt=after, changed_at__lte=_settled(), model__in=_TYPES)
+    if upto is not None:
+        queryset = queryset.filter(id__lte=upto)
+    return list(queryset.order_by('id').values_list('id', 'model', 'object_id', 'action')[:limit])
+
+
+def group_events(entries):
+    """One event per run of consecutive entries with the same type and action"""
+    events = []
+    for entry_id, label, object_id, action in entries:
+        event_type = _TYPES[label]
+        if not events or events[-1]['type'] != event_type or events[-1]['action'] != action:
+            events.append({'id': entry_id, 'type': event_type, 'action': action, 'ids': {}})
+        events[-1]['id'] = entry_id
+        events[-1]['ids'][object_id] = None
+    for event in events:
+        event['ids'] = list(event['ids'])
+    return events
+
+
+def replay(after, upto, limit):
+    """
+    Events between the cursors ``after`` and ``upto``
+
+    ``None`` when some of them are no longer retained or there are more than
+    ``limit`` entries to replay.
+    """
+    oldest = ChangeLogEntry.objects.aggregate(oldest=Min('id'))['oldest']
+    if oldest is not None and after < oldest - 1:
+        return None
+    entries = read_entries(after, limit + 1, upto=upto)
+    if len(entries) > limit:
+        return None
+    return group_events(entries)
+
+
+class Subscription:
+    """One open stream: a bounded queue of the events after ``after``"""
+
+    def __init__(self, types, queue_size):
+        self.types = types
+        self.after = None
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def deliver(self, event):
+        if self.after is None or event['id'] <= self.after:
+            return
+        if self.types and event['type'] not in self.types:
+            return
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Drop the backlog and ask the client to resync instead
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESET)
+
+    async def get(self, timeout):
+        event = await asyncio.wait_for(self.queue.get(), timeout)
+        if event is RESET:
+            self.overflowed = False
+        return event
+
+
+class EventHub:
+    """The open streams of one process and the task polling the change log for them"""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._cursor = 0
+        self._loop = None
+        self._poller = None
+        self._ready = None
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def _start(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Streams of a loop that has shut down are gone with it
+            self._subscribers = set()
+            self._loop = loop
+            self._poller = None
+        if self._poller is None or self._poller.done():
+            self._ready = asyncio.Event()
+            self._poller = loop.create_task(self._poll())
+
+    async def _poll(self):
+        self._cursor = await sync_to_async(settled_cursor)()
+        self._ready.set()
+        while True:
+            await asyncio.sleep(settings.EVENT_STREAM_POLL_SECONDS)
+            if not self._subscribers:
+                return
+            try:
+                entries = await sync_to_async(read_entries)(self._cursor, POLL_BATCH_SIZE)
+                while entries:
+                    self.publish(group_events(entries), entries[-1][0])
+                    if len(entries) < POLL_BATCH_SIZE:
+                        break
+                    entries = await sync_to_async(read_entries)(self._cursor, POLL_BATCH_SIZE)
+            except DatabaseError:
+                continue  # retried on the next poll
+
+    def publish(self, events, cursor):
+        for event in events:
+            for subscriber in list(self._subscribers):
+                subscriber.deliver(event)
+        self._cursor = cursor
+
+    async def subscribe(self, types=None, last_event_id=None, queue_size=100):
+        """
+        Register a stream; returns ``(subscription, backlog)``
+
+        ``backlog`` holds the events after ``last_event_id`` that were
+        published before the stream subscribed, or is ``None`` when they can
+        no longer be replayed.
+        """
+        self._start()
+        subscription = Subscription(types, queue_size)
+        self._subscribers.add(subscription)
+        await self._ready.wait()
+        cursor = self._cursor
+        subscription.after = cursor
+        if last_event_id is None or last_event_id == cursor:
+            return subscription, []
+        if last_event_id > cursor:
+            if last_event_id > await sync_to_async(settled_cursor)():
+                return subscription, None  # not an id this log handed out
+            # Seen on a worker that polled a little sooner
+            subscription.after = last_event_id
+            return subscription, []
+        backlog = await sync_to_async(replay)(last_event_id, cursor, settings.EVENT_STREAM_HISTORY)
+        if backlog is not None and types:
+            backlog = [event for event in backlog if event['type'] in types]
+        return subscription, backlog
+
+    def unsubscribe(self, subscription):
+        self._subscribers.discard(subscription)
+
+
+hub = EventHub()
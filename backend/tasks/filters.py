@@ -0,0 +1,70 @@
+import django_filters
+from django.db.models import Count
+
+from .models import Task
+from .rollups import has_incomplete_subtasks, has_subtasks, subtask_rollups
+from .tagging import normalize_tag
+from .timeline import overdue_condition
+
+
+def _tag_names(value):
+    return [name for name in (normalize_tag(part) for part in value.split(',')) if name]
+
+
+class TaskFilter(django_filters.FilterSet):
+    """Task list filters; tag filters are answered from the tag index"""
+    tag = django_filters.CharFilter(method='filter_any_tag')
+    tags__all = django_filters.CharFilter(method='filter_all_tags')
+    has_subtasks = django_filters.BooleanFilter(method='filter_has_subtasks')
+    subtasks_incomplete = django_filters.BooleanFilter(method='filter_subtasks_incomplete')
+    progress__gte = django_filters.NumberFilter(method='filter_progress')
+    progress__lte = django_filters.NumberFilter(method='filter_progress')
+    overdue = django_filters.BooleanFilter(method='filter_overdue')
+
+    class Meta:
+        model = Task
+        fields = ['status', 'priority', 'category', 'ai_enhanced']
+
+    def filter_any_tag(self, queryset, name, value):
+        """``?tag=a,b`` - tasks tagged with any of the given tags"""
+        names = _tag_names(value)
+        if not names:
+            return queryset
+        through = Task.tag_index.through
+        return queryset.filter(
+            pk__in=through.objects.filter(tag__name__in=names).values('task_id')
+        )
+
+    def filter_all_tags(self, queryset, name, value):
+        """``?tags__all=a,b`` - tasks tagged with every one of the given tags"""
+        names = _tag_names(value)
+        if not names:
+            return queryset
+        through = Task.tag_index.through
+        matching = (
+            through.objects.filter(tag__name__in=names)
+            .values('task_id')
+            .annotate(matched=Count('tag_id'))
+            .filter(matched=len(names))
+            .values('task_id')
+        )
+        return queryset.filter(pk__in=matching)
+
+    def filter_has_subtasks(self, queryset, name, value):
+        """``?has_subtasks=true|false``"""
+        return queryset.filter(has_subtasks() if value else ~has_subtasks())
+
+    def filter_subtasks_incomplete(self, queryset, name, value):
+        """``?subtasks_incomplete=true`` - tasks with at least one open subtask"""
+        return queryset.filter(has_incomplete_subtasks() if value else ~has_incomplete_subtasks())
+
+    def filter_overdue(self, queryset, name, value):
+        """``?overdue=true|false`` - open tasks past their deadline, evaluated in SQL"""
+        return queryset.filter(overdue_condition() if value else ~overdue_condition())
+
+    def filter_progress(self, queryset, name, value):
+        """``?progress__gte=50`` - percent of subtasks done; tasks without subtasks never match"""
+        lookup = name.split('__')[-1]
+        return queryset.alias(rollup_progress=subtask_rollups()['subtask_progress']).filter(
+            **{f'rollup_progress__{lookup}': value}
+        )
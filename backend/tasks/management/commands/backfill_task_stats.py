@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from tasks.analytics import REBUILD_CHUNK_DAYS, rebuild_stats, refresh_pending_days
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily task stats rollups from the task table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First day to rebuild (YYYY-MM-DD); default: the earliest task')
+        parser.add_argument('--end', help='Last day to rebuild (YYYY-MM-DD); default: the latest task')
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='Rebuild only the last N days up to today (overrides --start/--end)',
+        )
+        parser.add_argument(
+            '--pending', action='store_true',
+            help='Rebuild only the days queued by task writes (for TASK_STATS_REFRESH_DELAY=0)',
+        )
+        parser.add_argument('--chunk-days', type=int, default=REBUILD_CHUNK_DAYS, help='Days per transaction')
+
+    def handle(self, *args, **options):
+        if options['chunk_days'] < 1:
+            raise CommandError('--chunk-days must be >= 1')
+        if options['pending']:
+            written = refresh_pending_days(chunk_days=options['chunk_days'])
+            self.stdout.write(self.style.SUCCESS(f"Wrote {written} daily task stats rows"))
+            return
+        if options['days'] is not None:
+            if options['days'] < 1:
+                raise CommandError('--days must be >= 1')
+            last = timezone.localdate()
+            first = last - timedelta(days=options['days'] - 1)
+        else:
+            first, last = self._day(options, 'start'), self._day(options, 'end')
+            if first and last and last < first:
+                raise CommandError('--end must not be before --start')
+
+        def progress(day, rows):
+            self.stdout.write(f"  rebuilt through {day}: {rows} rows")
+
+        written = rebuild_stats(first, last, chunk_days=options['chunk_days'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} daily task stats rows"))
+
+    @staticmethod
+    def _day(options, name):
+        if not options[name]:
+            return None
+        try:
+            day = parse_date(options[name])
+        except ValueError:
+            day = None
+        if day is None:
+            raise CommandError(f'--{name} must be a date (YYYY-MM-DD)')
+        return day
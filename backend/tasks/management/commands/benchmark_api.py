@@ -0,0 +1,77 @@
+import json
+import platform
+from datetime import datetime, timezone
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from tasks.benchmark import SCENARIOS, dataset_size, run_benchmark
+
+COLUMNS = ('requests', 'errors', 'throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request', 'cache_hits')
+
+
+class Command(BaseCommand):
+    help = 'Load-test the read API and report throughput, latency percentiles and queries per request'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'scenarios', nargs='*', metavar='scenario',
+            help=f"Scenarios to run (default all): {', '.join(SCENARIOS)}",
+        )
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per scenario')
+        parser.add_argument('--concurrency', type=int, default=4, help='Concurrent client threads')
+        parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests per scenario')
+        parser.add_argument(
+            '--base-url', help='Benchmark a running server (e.g. http://127.0.0.1:8000) instead of in-process',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--label', default='', help='Free-form name stored with the results')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        unknown = set(options['scenarios']) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        if options['requests'] < 1 or options['concurrency'] < 1 or options['warmup'] < 0:
+            raise CommandError('--requests and --concurrency must be >= 1, --warmup >= 0')
+
+        self.stdout.write(' '.join(['scenario'.ljust(20)] + [column.rjust(12) for column in COLUMNS]))
+
+        def progress(name, result):
+            if 'skipped' in result:
+                self.stdout.write(f"{name.ljust(20)} skipped: {result['skipped']}")
+                return
+            cells = ['-' if result[column] is None else str(result[column]) for column in COLUMNS]
+            self.stdout.write(' '.join([name.ljust(20)] + [cell.rjust(12) for cell in cells]))
+
+        results = run_benchmark(
+            options['scenarios'],
+            requests=options['requests'],
+            concurrency=options['concurrency'],
+            warmup=options['warmup'],
+            base_url=options['base_url'],
+            seed=options['seed'],
+            progress=progress,
+        )
+
+        if options['output']:
+            report = {
+                'label': options['label'],
+                'started_at': datetime.now(timezone.utc).isoformat(),
+                'target': options['base_url'] or 'in-process',
+                'database': connection.vendor,
+                'dataset': dataset_size(),
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'warmup': options['warmup'],
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'results': results,
+            }
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+        if any(result.get('errors') for result in results.values()):
+            raise CommandError('Some requests failed, see the errors column')
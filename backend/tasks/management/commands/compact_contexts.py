@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.models import ContextSummary
+from tasks.retention import compact_context_entries, compactable_entries
+
+
+class Command(BaseCommand):
+    help = 'Roll old, processed context entries into periodic summaries and archive their content'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.CONTEXT_RETENTION_DAYS,
+            help='Compact processed entries older than this many days',
+        )
+        parser.add_argument(
+            '--period', choices=[choice for choice, _ in ContextSummary.PERIOD_CHOICES],
+            default=settings.CONTEXT_RETENTION_PERIOD,
+            help='Length of each summary period',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--max-batches', type=int, default=None,
+            help='Stop after this many batches (run again later to continue)',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many entries are eligible')
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--days must be >= 0 and --batch-size >= 1')
+
+        if options['dry_run']:
+            count = compactable_entries(options['days']).count()
+            self.stdout.write(f"{count} context entries are eligible for compaction")
+            return
+
+        stats = compact_context_entries(
+            older_than_days=options['days'],
+            period=options['period'],
+            batch_size=options['batch_size'],
+            max_batches=options['max_batches'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {stats['entries_archived']} entries into {stats['summaries_touched']} "
+            f"summary updates over {stats['batches']} batches"
+        ))
@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.models import Task
+from tasks.transfer import EXPORT_CHUNK_SIZE, export_csv, export_ndjson
+
+
+class Command(BaseCommand):
+    help = 'Stream all tasks with their subtasks and category names to CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?', default='-', help='File to write, or - for stdout')
+        parser.add_argument(
+            '--format', choices=['ndjson', 'csv'], default=None,
+            help='Defaults to the output file extension, else ndjson',
+        )
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be >= 1')
+        output = options['output']
+        export_format = options['format'] or ('csv' if output.endswith('.csv') else 'ndjson')
+        export = export_csv if export_format == 'csv' else export_ndjson
+
+        stream = sys.stdout if output == '-' else open(output, 'w', encoding='utf-8', newline='')
+        try:
+            for block in export(Task.objects.all(), options['chunk_size']):
+                stream.write(block)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        if output != '-':
+            self.stdout.write(self.style.SUCCESS(f"Exported tasks to {output}"))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.models import Task
+from tasks.similarity import DEFAULT_THRESHOLD, duplicate_groups, rebuild_similarity_index
+
+
+class Command(BaseCommand):
+    help = 'Report groups of near-duplicate tasks from the similarity index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold', type=float, default=DEFAULT_THRESHOLD,
+            help='Minimum Jaccard similarity of the task words (0.1-1)',
+        )
+        parser.add_argument('--include-done', action='store_true', help='Also report finished tasks')
+        parser.add_argument('--rebuild', action='store_true', help='Recreate the similarity index first')
+
+    def handle(self, *args, **options):
+        if not 0.1 <= options['threshold'] <= 1:
+            raise CommandError('--threshold must be between 0.1 and 1')
+
+        if options['rebuild']:
+            def progress(done):
+                self.stdout.write(f"  indexed {done} tasks")
+
+            indexed = rebuild_similarity_index(progress=progress if options['verbosity'] > 1 else None)
+            self.stdout.write(f"Indexed {indexed} tasks")
+
+        groups = duplicate_groups(options['threshold'], options['include_done'])
+        titles = dict(
+            Task.objects.filter(pk__in=[pk for group in groups for pk in group['task_ids']]).values_list('pk', 'title')
+        )
+        for group in groups:
+            self.stdout.write(f"{len(group['task_ids'])} tasks, similarity >= {group['similarity']}:")
+            for task_id in group['task_ids']:
+                self.stdout.write(f"  #{task_id} {titles.get(task_id, '')}")
+        redundant = sum(len(group['task_ids']) - 1 for group in groups)
+        self.stdout.write(self.style.SUCCESS(
+            f"Found {len(groups)} groups of near-duplicates; {redundant} tasks could be merged away"
+        ))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.analytics import refresh_pending_days
+from tasks.bulk import BULK_BATCH_SIZE
+from tasks.transfer import import_task_records, parse_csv, parse_ndjson
+
+
+class Command(BaseCommand):
+    help = 'Import tasks from a CSV or NDJSON file written by export_tasks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--format', choices=['ndjson', 'csv'], default=None,
+            help='Defaults to the file extension, else ndjson',
+        )
+        parser.add_argument('--batch-size', type=int, default=BULK_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be >= 1')
+        path = options['path']
+        import_format = options['format'] or ('csv' if path.endswith('.csv') else 'ndjson')
+        parse = parse_csv if import_format == 'csv' else parse_ndjson
+
+        try:
+            with open(path, encoding='utf-8', newline='') as source:
+                stats = import_task_records(parse(source), batch_size=options['batch_size'])
+        except OSError as e:
+            raise CommandError(str(e))
+        # The refresh thread dies with the command
+        refresh_pending_days()
+
+        for error in stats['errors']:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['created']} tasks ({stats['failed']} failed)"
+        ))
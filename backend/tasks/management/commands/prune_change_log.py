@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tasks.changelog import prune_change_log
+
+
+class Command(BaseCommand):
+    help = 'Delete delta-sync change log entries older than the retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.SYNC_LOG_RETENTION_DAYS)
+
+    def handle(self, *args, **options):
+        deleted = prune_change_log(options['days'])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} change log entries"))
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_module.admission import ai_lane
+from ai_module.ai_processor import ai_processor
+from ai_module.ranking import DEFAULT_CHUNK_SIZE, rerank_tasks
+from tasks.analytics import refresh_pending_days
+from tasks.models import ContextEntry
+
+
+class Command(BaseCommand):
+    help = 'Re-prioritize all open tasks relative to each other with ranked AI chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Tasks per model call')
+        parser.add_argument('--limit', type=int, default=None, help='Rank at most this many open tasks')
+        parser.add_argument(
+            '--context-limit', type=int, default=10,
+            help='Recent context entries to analyze first (0 to skip)',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Report the changes without saving them')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 4:
+            raise CommandError('--chunk-size must be >= 4')
+
+        context_analysis = None
+        if options['context_limit'] > 0:
+            entries = [
+                {'content': entry.content, 'source': entry.source, 'created_at': entry.created_at.isoformat()}
+                for entry in ContextEntry.objects.all()[:options['context_limit']]
+            ]
+            with ai_lane('batch'):
+                context_analysis = ai_processor.analyze_context(entries)
+
+        result = rerank_tasks(
+            chunk_size=options['chunk_size'],
+            limit=options['limit'],
+            context_analysis=context_analysis,
+            dry_run=options['dry_run'],
+        )
+        # The refresh thread dies with the command
+        refresh_pending_days()
+        if options['verbosity'] > 1:
+            for change in result['changes']:
+                self.stdout.write(f"  #{change['id']} {change['title']}: {change['old']} -> {change['new']}")
+        verb = 'Would update' if options['dry_run'] else 'Updated'
+        if result['skipped']:
+            self.stdout.write(self.style.WARNING(
+                f"{len(result['skipped'])} tasks changed during the run and were left alone"
+            ))
+        if result['failed_chunks']:
+            self.stdout.write(self.style.WARNING(
+                f"{result['failed_chunks']} of {result['calls']} chunks failed or were shed; their tasks were left alone"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"Ranked {result['ranked']} open tasks in {result['calls']} calls; "
+            f"{verb} {len(result['changes'])} priorities"
+        ))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tasks.benchmark import CATEGORY_NAMES, seed_dataset
+from tasks.bulk import BULK_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Bulk-insert a reproducible synthetic dataset of tasks, subtasks, categories and context entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, default=10000)
+        parser.add_argument('--subtasks-per-task', type=int, default=3, help='Average subtasks per task')
+        parser.add_argument('--contexts', type=int, default=10000)
+        parser.add_argument('--categories', type=int, default=len(CATEGORY_NAMES))
+        parser.add_argument('--days', type=int, default=365, help='Spread created_at over this many past days')
+        parser.add_argument('--batch-size', type=int, default=BULK_BATCH_SIZE)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data')
+
+    def handle(self, *args, **options):
+        if min(options['tasks'], options['contexts'], options['subtasks_per_task']) < 0:
+            raise CommandError('Counts must be >= 0')
+        if options['batch_size'] < 1 or options['days'] < 1 or options['categories'] < 1:
+            raise CommandError('--batch-size, --days and --categories must be >= 1')
+
+        verbosity = options['verbosity']
+
+        def progress(label, done):
+            if verbosity > 1:
+                self.stdout.write(f"  {label}: {done}")
+
+        counts = seed_dataset(
+            tasks=options['tasks'],
+            subtasks_per_task=options['subtasks_per_task'],
+            contexts=options['contexts'],
+            categories=options['categories'],
+            days=options['days'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {counts['categories']} categories, {counts['tasks']} tasks, "
+            f"{counts['subtasks']} subtasks and {counts['contexts']} context entries"
+        ))
@@ -0,0 +1,97 @@
+import json
+import os
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Dependencies that must only be imported when an AI backend is first used.
+# ``requests`` is deferred by the AI module too, but rest_framework.compat
+# imports it for the optional coreapi schema support, so it is not checked.
+DEFERRED_MODULES = ('openai', 'httpx', 'backoff')
+
+# Startup of a fresh worker: settings, app registry and the whole URLconf,
+# which imports every view module
+STARTUP_SCRIPT = (
+    'import django; django.setup(); '
+    'from django.urls import get_resolver; get_resolver().url_patterns'
+)
+
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def measure_startup(runs=3):
+    """
+    Import times of a fresh interpreter loading Django and the URLconf
+
+    Runs ``python -X importtime`` ``runs`` times and keeps the fastest run.
+    Returns ``{'total_ms', 'modules'}`` where ``modules`` maps each module to
+    its cumulative import time in milliseconds.
+    """
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'smart_todo.settings')}
+    best = None
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f"Startup failed:\n{result.stderr[-2000:]}")
+        modules = {}
+        total_us = 0
+        for line in result.stderr.splitlines():
+            match = IMPORT_TIME_LINE.match(line)
+            if not match:
+                continue
+            cumulative, indent, name = int(match[2]), match[3], match[4]
+            modules[name] = cumulative / 1000
+            if len(indent) == 1:  # top-level imports; nested ones are included
+                total_us += cumulative
+        if best is None or total_us < best['total_ms'] * 1000:
+            best = {'total_ms': total_us / 1000, 'modules': modules}
+    return best
+
+
+class Command(BaseCommand):
+    help = 'Measure import time of a fresh worker and check that heavy AI dependencies load lazily'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help='Keep the fastest of this many runs')
+        parser.add_argument('--top', type=int, default=10, help='Number of slowest modules to list')
+        parser.add_argument('--max-ms', type=float, help='Fail when total import time exceeds this budget')
+        parser.add_argument(
+            '--forbid', nargs='*', default=list(DEFERRED_MODULES),
+            help='Modules that must not be imported at startup',
+        )
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        startup = measure_startup(max(options['runs'], 1))
+        modules = startup['modules']
+        slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:options['top']]
+        forbidden = [module for module in options['forbid'] if module in modules]
+        report = {
+            'total_ms': round(startup['total_ms'], 1),
+            'module_count': len(modules),
+            'slowest': [{'module': name, 'ms': round(ms, 1)} for name, ms in slowest],
+            'forbidden_imports': forbidden,
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.stdout.write(f"Startup imports: {report['total_ms']} ms across {report['module_count']} modules")
+            for item in report['slowest']:
+                self.stdout.write(f"  {item['ms']:>9.1f} ms  {item['module']}")
+
+        problems = []
+        if forbidden:
+            problems.append(f"imported at startup: {', '.join(forbidden)}")
+        if options['max_ms'] is not None and startup['total_ms'] > options['max_ms']:
+            problems.append(f"{report['total_ms']} ms exceeds the {options['max_ms']} ms budget")
+        if problems:
+            raise CommandError('; '.join(problems))
+        if not options['json']:
+            self.stdout.write(self.style.SUCCESS('Startup benchmark passed'))
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:38
+
+from django.db import migrations
+
+
+def create_search_indexes(apps, schema_editor):
+    from tasks.search import install_search_indexes
+    install_search_indexes(schema_editor.connection)
+
+
+def drop_search_indexes(apps, schema_editor):
+    from tasks.search import uninstall_search_indexes
+    uninstall_search_indexes(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0002_subtask'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:39
+
+from django.db import migrations, models
+
+
+def backfill_tag_index(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    Tag = apps.get_model('tasks', 'Tag')
+    through = Task.tag_index.through
+
+    tag_ids = {}
+    rows = []
+    for task_id, tags in Task.objects.values_list('id', 'tags').iterator(chunk_size=2000):
+        if not isinstance(tags, list):
+            continue
+        names = {tag.strip().lower()[:100] for tag in tags if isinstance(tag, str) and tag.strip()}
+        for name in names:
+            if name not in tag_ids:
+                tag_ids[name] = Tag.objects.get_or_create(name=name)[0].pk
+            rows.append(through(task_id=task_id, tag_id=tag_ids[name]))
+        if len(rows) >= 2000:
+            through.objects.bulk_create(rows, ignore_conflicts=True)
+            rows = []
+    through.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_fulltext_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='tag_index',
+            field=models.ManyToManyField(blank=True, editable=False, related_name='tasks', to='tasks.tag'),
+        ),
+        migrations.RunPython(backfill_tag_index, migrations.RunPython.noop),
+    ]
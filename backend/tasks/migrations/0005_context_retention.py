@@ -0,0 +1,58 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_tag_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedContextEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True)),
+                ('source', models.CharField(choices=[('email', 'Email'), ('whatsapp', 'WhatsApp'), ('note', 'Note'), ('meeting', 'Meeting'), ('other', 'Other')], max_length=20)),
+                ('compressed_content', models.BinaryField()),
+                ('insights', models.JSONField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(db_index=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Archived Context Entries',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ContextSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('email', 'Email'), ('whatsapp', 'WhatsApp'), ('note', 'Note'), ('meeting', 'Meeting'), ('other', 'Other')], max_length=20)),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], default='week', max_length=10)),
+                ('period_start', models.DateField()),
+                ('period_end', models.DateField()),
+                ('entry_count', models.IntegerField(default=0)),
+                ('summary', models.TextField(blank=True)),
+                ('insights', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Context Summaries',
+                'ordering': ['-period_start', 'source'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='contextsummary',
+            constraint=models.UniqueConstraint(fields=('source', 'period', 'period_start'), name='unique_context_summary_period'),
+        ),
+        migrations.AddField(
+            model_name='archivedcontextentry',
+            name='summary',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='tasks.contextsummary'),
+        ),
+    ]
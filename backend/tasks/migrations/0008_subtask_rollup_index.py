@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 10:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0007_change_log'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subtask',
+            index=models.Index(fields=['task', 'completed'], name='subtask_task_completed_idx'),
+        ),
+    ]
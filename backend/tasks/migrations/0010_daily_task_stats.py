@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import F
+
+
+def backfill_completed_at(apps, schema_editor):
+    # The last edit of a finished task is the best record of when it finished
+    Task = apps.get_model('tasks', 'Task')
+    Task.objects.filter(status='done', completed_at__isnull=True).update(completed_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0009_task_deadline_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.CreateModel(
+            name='DailyTaskStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('priority', models.IntegerField(choices=[(0, 'Low'), (25, 'Medium-Low'), (50, 'Medium'), (75, 'Medium-High'), (100, 'High')])),
+                ('created', models.IntegerField(default=0)),
+                ('completed', models.IntegerField(default=0)),
+                ('due', models.IntegerField(default=0)),
+                ('on_time', models.IntegerField(default=0)),
+                ('completion_seconds', models.BigIntegerField(default=0)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tasks.category')),
+            ],
+            options={
+                'verbose_name_plural': 'Daily Task Stats',
+                'ordering': ['day', 'category', 'priority'],
+                'indexes': [models.Index(fields=['day', 'category', 'priority'], name='daily_task_stats_day_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_completed_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.7 on 2026-10-19 11:44
+
+import hashlib
+import random
+import re
+import struct
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# A frozen copy of tasks.similarity as of this migration, so its output
+# does not depend on later changes to that module
+BANDS = 20
+ROWS = 3
+STOP_WORDS = frozenset(
+    'a an and are as at be by for from has have in into is it its of on or re fw fwd the this '
+    'to was were will with'.split()
+)
+PRIME = (1 << 61) - 1
+
+
+def _hash64(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big')
+
+
+def similarity_keys(title, description):
+    words = {
+        word for word in re.findall(r'\w+', f'{title or ""} {description or ""}'.lower())
+        if len(word) > 1 and word not in STOP_WORDS
+    }
+    if not words:
+        return []
+    rng = random.Random(0x5eed)
+    permutations = [(rng.randrange(1, PRIME), rng.randrange(0, PRIME)) for _ in range(BANDS * ROWS)]
+    hashes = [_hash64(word.encode('utf-8')) for word in words]
+    signature = [min((a * value + b) % PRIME for value in hashes) for a, b in permutations]
+    keys = []
+    for band in range(BANDS):
+        key = _hash64(struct.pack(f'>H{ROWS}Q', band, *signature[band * ROWS:(band + 1) * ROWS]))
+        keys.append(key - (1 << 64) if key >= 1 << 63 else key)
+    return keys
+
+
+def index_existing_tasks(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    TaskSimilarityKey = apps.get_model('tasks', 'TaskSimilarityKey')
+    rows = []
+    for pk, title, description in Task.objects.values_list('pk', 'title', 'description').iterator():
+        rows.extend(TaskSimilarityKey(task_id=pk, key=key) for key in similarity_keys(title, description))
+        if len(rows) >= 500:
+            TaskSimilarityKey.objects.bulk_create(rows)
+            rows = []
+    TaskSimilarityKey.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0010_daily_task_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskSimilarityKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField()),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similarity_keys', to='tasks.task')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key', 'task'], name='task_similarity_key_idx')],
+            },
+        ),
+        migrations.RunPython(index_existing_tasks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-19 12:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0011_task_similarity_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingStatsDay',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False)),
+            ],
+        ),
+    ]
@@ -1,3 +1,5 @@
+import zlib
+
 from django.db import models
 from django.utils import timezone
 
@@ -16,6 +18,18 @@ class Category(models.Model):
         return self.name
 
 
+class Tag(models.Model):
+    """Normalized tag index mirroring the free-form ``Task.tags`` lists"""
+    name = models.CharField(max_length=100, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
 class Task(models.Model):
     """Main task model with AI-enhanced features"""
     STATUS_CHOICES = [
@@ -45,16 +59,82 @@ class Task(models.Model):
     deadline = models.DateTimeField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='todo')
     tags = models.JSONField(default=list, blank=True)
+    # Kept in sync with ``tags`` on save, see tasks.tagging
+    tag_index = models.ManyToManyField(Tag, related_name='tasks', blank=True, editable=False)
     ai_enhanced = models.BooleanField(default=False)
     original_description = models.TextField(blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the status becomes 'done', cleared when it leaves it
+    completed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-priority', 'deadline', '-created_at']
+        indexes = [
+            # Deadline ranges of the timeline and overdue queries
+            models.Index(fields=['deadline', 'status'], name='task_deadline_status_idx'),
+        ]
     
+    # Fields whose loaded values are remembered, see changed_fields()
+    TRACKED_FIELDS = (
+        'title', 'description', 'status', 'completed_at', 'deadline', 'category', 'priority', 'created_at',
+    )
+
     def __str__(self):
         return self.title
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded_values()
+        return instance
+
+    def _remember_loaded_values(self):
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in map(self._meta.get_field, self.TRACKED_FIELDS) if field.attname not in deferred
+        }
+
+    def loaded_values(self, *names):
+        """Values of tracked fields as last loaded or saved, or None if any is unknown"""
+        loaded = getattr(self, '_loaded_values', None)
+        if self._state.adding or loaded is None:
+            return None
+        attnames = [self._meta.get_field(name).attname for name in names]
+        if not all(attname in loaded for attname in attnames):
+            return None
+        return tuple(loaded[attname] for attname in attnames)
+
+    def changed_fields(self, names):
+        """The tracked ``names`` changed since the last load or save; all of them when unknown"""
+        changed = set()
+        for name in names:
+            loaded = self.loaded_values(name)
+            if loaded is None or loaded[0] != getattr(self, self._meta.get_field(name).attname):
+                changed.add(name)
+        return changed
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if self.sync_completed_at() and update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'completed_at'}
+        super().save(*args, **kwargs)
+        self._remember_loaded_values()
+
+    def sync_completed_at(self, now=None):
+        """Keep ``completed_at`` in step with ``status``; True when it changed
+
+        Called by ``save()``; bulk write paths call it themselves.
+        """
+        if self.status == 'done':
+            if self.completed_at is None:
+                self.completed_at = now or timezone.now()
+                return True
+        elif self.completed_at is not None:
+            self.completed_at = None
+            return True
+        return False
     
     @property
     def is_overdue(self):
@@ -81,6 +161,10 @@ class Subtask(models.Model):
 
     class Meta:
         ordering = ['order', 'created_at']
+        indexes = [
+            # Serves the subtask rollup subqueries without touching the table
+            models.Index(fields=['task', 'completed'], name='subtask_task_completed_idx'),
+        ]
 
     def __str__(self):
         return f"{self.task.title} - {self.title}"
@@ -107,3 +191,149 @@ class ContextEntry(models.Model):
     
     def __str__(self):
         return f"{self.source}: {self.content[:50]}..."
+
+
+class ContextSummary(models.Model):
+    """Compacted roll-up of archived context entries for one source and period"""
+    PERIOD_CHOICES = [
+        ('day', 'Day'),
+        ('week', 'Week'),
+        ('month', 'Month'),
+    ]
+
+    source = models.CharField(max_length=20, choices=ContextEntry.SOURCE_CHOICES)
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES, default='week')
+    period_start = models.DateField()
+    period_end = models.DateField()
+    entry_count = models.IntegerField(default=0)
+    summary = models.TextField(blank=True)
+    insights = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Context Summaries"
+        ordering = ['-period_start', 'source']
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'period', 'period_start'], name='unique_context_summary_period'),
+        ]
+
+    def __str__(self):
+        return f"{self.source}: {self.period_start} - {self.period_end} ({self.entry_count})"
+
+
+class ArchivedContextEntry(models.Model):
+    """Cold storage for compacted context entries, content is zlib-compressed"""
+    original_id = models.BigIntegerField(unique=True)
+    source = models.CharField(max_length=20, choices=ContextEntry.SOURCE_CHOICES)
+    compressed_content = models.BinaryField()
+    insights = models.JSONField(null=True, blank=True)
+    summary = models.ForeignKey(
+        ContextSummary,
+        on_delete=models.CASCADE,
+        related_name='entries'
+    )
+    created_at = models.DateTimeField(db_index=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = "Archived Context Entries"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.source}: archived entry {self.original_id}"
+
+    @property
+    def content(self):
+        return zlib.decompress(bytes(self.compressed_content)).decode('utf-8')
+
+    @staticmethod
+    def compress(content):
+        return zlib.compress(content.encode('utf-8'), 9)
+
+
+class DailyTaskStats(models.Model):
+    """
+    Task counts for one day, category and priority, maintained by tasks.analytics
+
+    ``created``, ``completed`` and ``due`` count tasks whose ``created_at``,
+    ``completed_at`` or ``deadline`` falls on ``day``. ``on_time`` counts the
+    due ones completed by their deadline, so ``due - on_time`` are overdue
+    once the day is over. ``completion_seconds`` sums created-to-completed
+    durations of the completed tasks.
+    """
+    day = models.DateField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    priority = models.IntegerField(choices=Task.PRIORITY_CHOICES)
+    created = models.IntegerField(default=0)
+    completed = models.IntegerField(default=0)
+    due = models.IntegerField(default=0)
+    on_time = models.IntegerField(default=0)
+    completion_seconds = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Daily Task Stats"
+        ordering = ['day', 'category', 'priority']
+        indexes = [
+            models.Index(fields=['day', 'category', 'priority'], name='daily_task_stats_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.category_id or '-'}/{self.priority}: +{self.created} ✓{self.completed}"
+
+
+class PendingStatsDay(models.Model):
+    """A day whose ``DailyTaskStats`` rows are out of date, queued by tasks.analytics"""
+    day = models.DateField(primary_key=True)
+
+    def __str__(self):
+        return str(self.day)
+
+
+class TaskSimilarityKey(models.Model):
+    """
+    One MinHash LSH band key of a task's text, maintained by tasks.similarity
+
+    Tasks sharing a key are near-duplicate candidates; the (key, task) index
+    answers both the lookup and the report's GROUP BY from the index alone.
+    """
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='similarity_keys')
+    key = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['key', 'task'], name='task_similarity_key_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task_id}: {self.key}"
+
+
+class ModelVersion(models.Model):
+    """Per-model change counter used to validate cached and conditional responses"""
+    name = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class ChangeLogEntry(models.Model):
+    """Append-only log of task, subtask and category writes; the id is the sync cursor"""
+    ACTION_CHOICES = [
+        ('upsert', 'Created or updated'),
+        ('delete', 'Deleted'),
+    ]
+
+    model = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    changed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name_plural = "Change Log Entries"
+        ordering = ['id']
+
+    def __str__(self):
+        return f"#{self.pk} {self.action} {self.model}:{self.object_id}"
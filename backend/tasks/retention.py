@@ -0,0 +1,116 @@
+"""
+Context entry retention: compacts old, processed entries out of the hot table.
+
+Entries older than the retention window are folded into one ``ContextSummary``
+per source and period (their insights merged as counts), and their raw content
+moves to ``ArchivedContextEntry`` in compressed form. Work happens in small
+batches, each in its own transaction, so runs can be interrupted and resumed.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedContextEntry, ContextEntry, ContextSummary
+
+# Insight keys produced by AIProcessor.analyze_context that hold lists
+LIST_INSIGHT_KEYS = ['key_themes', 'urgency_indicators', 'time_constraints']
+TOP_INSIGHTS = 10
+
+
+def period_bounds(day, period):
+    """Return the first and last date of the ``period`` containing ``day``"""
+    if period == 'day':
+        return day, day
+    if period == 'week':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    if period == 'month':
+        start = day.replace(day=1)
+        next_month = (start + timedelta(days=32)).replace(day=1)
+        return start, next_month - timedelta(days=1)
+    raise ValueError(f'Unknown period: {period}')
+
+
+def merge_insights(insights, entries):
+    """Fold the insights of ``entries`` into a summary's count-based insights"""
+    merged = {key: Counter(insights.get(key, {})) for key in LIST_INSIGHT_KEYS + ['mood_tone']}
+    for entry in entries:
+        entry_insights = entry.insights if isinstance(entry.insights, dict) else {}
+        for key in LIST_INSIGHT_KEYS:
+            values = entry_insights.get(key) or []
+            if isinstance(values, list):
+                merged[key].update(str(value) for value in values)
+        mood = entry_insights.get('mood_tone')
+        if mood:
+            merged['mood_tone'][str(mood)] += 1
+    return {key: dict(counter.most_common()) for key, counter in merged.items()}
+
+
+def describe_summary(summary):
+    themes = list(summary.insights.get('key_themes', {}))[:TOP_INSIGHTS]
+    urgent = list(summary.insights.get('urgency_indicators', {}))[:TOP_INSIGHTS]
+    text = (
+        f"{summary.entry_count} {summary.get_source_display()} entries "
+        f"from {summary.period_start} to {summary.period_end}."
+    )
+    if themes:
+        text += f" Themes: {', '.join(themes)}."
+    if urgent:
+        text += f" Urgent: {', '.join(urgent)}."
+    return text
+
+
+def compactable_entries(older_than_days):
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    return ContextEntry.objects.filter(processed=True, created_at__lt=cutoff)
+
+
+def compact_batch(entries, period):
+    """Summarize and archive one batch of entries, then delete them from the hot table"""
+    groups = defaultdict(list)
+    for entry in entries:
+        start, end = period_bounds(timezone.localdate(entry.created_at), period)
+        groups[(entry.source, start, end)].append(entry)
+
+    with transaction.atomic():
+        archived = []
+        for (source, start, end), group in groups.items():
+            summary, _ = ContextSummary.objects.select_for_update().get_or_create(
+                source=source, period=period, period_start=start,
+                defaults={'period_end': end},
+            )
+            summary.entry_count += len(group)
+            summary.insights = merge_insights(summary.insights, group)
+            summary.summary = describe_summary(summary)
+            summary.save()
+            archived.extend(
+                ArchivedContextEntry(
+                    original_id=entry.pk,
+                    source=entry.source,
+                    compressed_content=ArchivedContextEntry.compress(entry.content),
+                    insights=entry.insights,
+                    summary=summary,
+                    created_at=entry.created_at,
+                )
+                for entry in group
+            )
+        ArchivedContextEntry.objects.bulk_create(archived, ignore_conflicts=True)
+        ContextEntry.objects.filter(pk__in=[entry.pk for entry in entries]).delete()
+    return len(groups)
+
+
+def compact_context_entries(older_than_days=30, period='week', batch_size=500, max_batches=None):
+    """Compact eligible entries batch by batch; returns counts of what was done"""
+    period_bounds(timezone.localdate(), period)  # validate early
+    stats = {'entries_archived': 0, 'summaries_touched': 0, 'batches': 0}
+    queryset = compactable_entries(older_than_days).order_by('id')
+    while max_batches is None or stats['batches'] < max_batches:
+        entries = list(queryset[:batch_size])
+        if not entries:
+            break
+        stats['summaries_touched'] += compact_batch(entries, period)
+        stats['entries_archived'] += len(entries)
+        stats['batches'] += 1
+    return stats
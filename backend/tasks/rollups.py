@@ -0,0 +1,67 @@
+"""
+Subtask progress computed by the database.
+
+The counts are correlated subqueries rather than a JOIN + GROUP BY, so they
+combine with any other filter, ordering or ``.only()`` on the task queryset
+and can be used in ``WHERE`` clauses (see the progress filters in
+``TaskFilter``). Each is answered from the ``(task, completed)`` index.
+"""
+from django.db.models import Case, Count, Exists, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThan
+
+from .models import Subtask
+
+ROLLUP_FIELDS = ('subtask_count', 'subtasks_completed', 'subtask_progress')
+
+
+def _count_subtasks(**filters):
+    counts = (
+        Subtask.objects.filter(task=OuterRef('pk'), **filters)
+        .order_by()  # Meta.ordering would leak into the GROUP BY
+        .values('task')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def subtask_rollups():
+    """Expressions for ``subtask_count``, ``subtasks_completed`` and ``subtask_progress``"""
+    total = _count_subtasks()
+    completed = _count_subtasks(completed=True)
+    return {
+        'subtask_count': total,
+        'subtasks_completed': completed,
+        # Whole percent done; NULL when the task has no subtasks
+        'subtask_progress': Case(
+            When(GreaterThan(total, 0), then=completed * 100 / total),
+            default=None,
+            output_field=IntegerField(),
+        ),
+    }
+
+
+def with_subtask_rollups(queryset):
+    return queryset.annotate(**subtask_rollups())
+
+
+def has_incomplete_subtasks():
+    return Exists(Subtask.objects.filter(task=OuterRef('pk'), completed=False))
+
+
+def has_subtasks():
+    return Exists(Subtask.objects.filter(task=OuterRef('pk')))
+
+
+def rollups_for(task):
+    """Rollup values for a task that was not loaded through ``with_subtask_rollups``"""
+    if not hasattr(task, 'subtask_count'):
+        # Uses prefetched subtasks when present, one query otherwise
+        subtasks = task.subtasks.all()
+        task.subtask_count = len(subtasks)
+        task.subtasks_completed = sum(1 for subtask in subtasks if subtask.completed)
+        task.subtask_progress = (
+            task.subtasks_completed * 100 // task.subtask_count if task.subtask_count else None
+        )
+    return {name: getattr(task, name) for name in ROLLUP_FIELDS}
@@ -0,0 +1,192 @@
+"""
+Full-text search backends for tasks and context entries.
+
+PostgreSQL searches a GIN-indexed ``to_tsvector`` expression, SQLite searches
+an FTS5 external-content table kept in sync by triggers. Both are maintained
+by the database itself on every write, so bulk updates stay indexed too.
+Any other database falls back to DRF's ``icontains`` search.
+"""
+from django.db import connections, router
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+
+# Searchable columns per table. JSON columns are indexed as their text form.
+SEARCH_INDEXES = {
+    'tasks_task': {'columns': ['title', 'description', 'tags'], 'json': ['tags']},
+    'tasks_contextentry': {'columns': ['content'], 'json': []},
+}
+
+SEARCH_CONFIG = 'english'
+
+
+def _tsvector_sql(table, qualify=False):
+    spec = SEARCH_INDEXES[table]
+    parts = []
+    for column in spec['columns']:
+        ref = f'"{table}"."{column}"' if qualify else column
+        if column in spec['json']:
+            ref = f'{ref}::text'
+        parts.append(f"coalesce({ref}, '')")
+    document = " || ' ' || ".join(parts)
+    return f"to_tsvector('{SEARCH_CONFIG}', {document})"
+
+
+def _fts_table(table):
+    return f'{table}_fts'
+
+
+def _sqlite_fts_statements(table):
+    fts = _fts_table(table)
+    columns = SEARCH_INDEXES[table]['columns']
+    names = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    delete_row = (
+        f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values});"
+    )
+    insert_row = f'INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values});'
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{names}, content='{table}', content_rowid='id', tokenize='porter unicode61')",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert_row} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete_row} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {names} ON {table} '
+        f'BEGIN {delete_row} {insert_row} END',
+    ]
+
+
+def install_search_indexes(connection):
+    """Create (or repair) the full-text indexes for every searchable table"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for table in SEARCH_INDEXES:
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {table}_search_idx '
+                    f'ON {table} USING GIN ({_tsvector_sql(table)})'
+                )
+        elif connection.vendor == 'sqlite':
+            for table in SEARCH_INDEXES:
+                fts = _fts_table(table)
+                cursor.execute(
+                    "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+                    [f'{fts}_ai', f'{fts}_ad', f'{fts}_au'],
+                )
+                if cursor.fetchone()[0] == 3:
+                    continue
+                # Table rebuilds during migrations drop the triggers, so
+                # reinstall them and reindex from the content table.
+                for statement in _sqlite_fts_statements(table):
+                    cursor.execute(statement)
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+    _fts_tables.pop(connection.alias, None)
+
+
+def uninstall_search_indexes(connection):
+    with connection.cursor() as cursor:
+        for table in SEARCH_INDEXES:
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'DROP INDEX IF EXISTS {table}_search_idx')
+            elif connection.vendor == 'sqlite':
+                fts = _fts_table(table)
+                for suffix in ('ai', 'ad', 'au'):
+                    cursor.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffix}')
+                cursor.execute(f'DROP TABLE IF EXISTS {fts}')
+    _fts_tables.pop(connection.alias, None)
+
+
+def install_search_indexes_after_migrate(sender, using, **kwargs):
+    """post_migrate hook: SQLite table rebuilds silently drop FTS triggers"""
+    connection = connections[using]
+    if connection.vendor == 'sqlite' and set(SEARCH_INDEXES) <= set(connection.introspection.table_names()):
+        install_search_indexes(connection)
+
+
+# alias -> set of FTS5 tables present, looked up once per process
+_fts_tables = {}
+
+
+class PostgresSearchBackend:
+    """Ranked ``websearch_to_tsquery`` matches against the GIN expression index"""
+
+    @staticmethod
+    def search(queryset, terms):
+        table = queryset.model._meta.db_table
+        vector = _tsvector_sql(table, qualify=True)
+        query = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+        text = ' '.join(terms)
+        return queryset.filter(
+            RawSQL(f'{vector} @@ {query}', [text], output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL(f'ts_rank({vector}, {query})', [text], output_field=FloatField())
+        )
+
+
+class SQLiteSearchBackend:
+    """Ranked FTS5 ``MATCH`` against the external-content index table"""
+
+    @staticmethod
+    def match_expression(terms):
+        # Quote every term so user input can never be parsed as FTS5 syntax,
+        # and prefix-match it so partial words still find results.
+        return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+    @classmethod
+    def search(cls, queryset, terms):
+        table = queryset.model._meta.db_table
+        fts = _fts_table(table)
+        match = cls.match_expression(terms)
+        return queryset.filter(
+            RawSQL(
+                f'"{table}"."id" IN (SELECT rowid FROM {fts} WHERE {fts} MATCH %s)',
+                [match],
+                output_field=BooleanField(),
+            )
+        ).annotate(
+            # bm25() is lower-is-better; negate it so both backends sort descending
+            search_rank=RawSQL(
+                f'(SELECT -bm25({fts}) FROM {fts} WHERE {fts} MATCH %s AND rowid = "{table}"."id")',
+                [match],
+                output_field=FloatField(),
+            )
+        )
+
+
+def get_search_backend(model):
+    """Return the full-text backend for ``model``, or None to use ``icontains``"""
+    table = model._meta.db_table
+    if table not in SEARCH_INDEXES:
+        return None
+    connection = connections[router.db_for_read(model)]
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend
+    if connection.vendor == 'sqlite':
+        if connection.alias not in _fts_tables:
+            _fts_tables[connection.alias] = set(connection.introspection.table_names())
+        if _fts_table(table) in _fts_tables[connection.alias]:
+            return SQLiteSearchBackend
+    return None
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    Drop-in replacement for ``SearchFilter`` that uses the full-text index.
+
+    Keeps the ``?search=`` interface. Results are ordered by relevance unless
+    the client asked for an explicit ``?ordering=``, so place this filter after
+    ``OrderingFilter`` in ``filter_backends``.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        backend = get_search_backend(queryset.model)
+        if not search_terms or backend is None:
+            return super().filter_queryset(request, queryset, view)
+
+        queryset = backend.search(queryset, search_terms)
+        if not request.query_params.get(api_settings.ORDERING_PARAM):
+            ordering = queryset.query.order_by or queryset.model._meta.ordering
+            queryset = queryset.order_by('-search_rank', *ordering)
+        return queryset
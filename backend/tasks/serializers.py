@@ -1,5 +1,10 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Task, Category, ContextEntry, Subtask
+from .bulk import BULK_BATCH_SIZE, increment_category_usage
+from .signals import send_bulk_change
+from .models import Task, Category, ContextEntry, Subtask, Tag, ContextSummary, ArchivedContextEntry
+from .rollups import rollups_for
+from .similarity import DEFAULT_THRESHOLD
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -12,15 +17,103 @@ class CategorySerializer(serializers.ModelSerializer):
     def get_task_count(self, obj):
         return obj.tasks.count()
 
+class TagSerializer(serializers.ModelSerializer):
+    task_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Tag
+        fields = ['id', 'name', 'task_count']
+
 class SubtaskSerializer(serializers.ModelSerializer):
     class Meta:
         model = Subtask
-        fields = ['id', 'title', 'completed', 'order', 'created_at', 'updated_at']
+        fields = ['id', 'task', 'title', 'completed', 'order', 'created_at', 'updated_at']
+
+def _param_list(request, name):
+    value = request.query_params.get(name, '') if request is not None else ''
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+class SparseFieldsetMixin:
+    """
+    Lets read requests choose fields with ``?fields=a,b`` or ``?omit=c``
+
+    ``field_columns`` maps computed fields to the model columns they read so
+    views can restrict the query with ``.only()`` via ``get_sparse_columns``.
+    ``optional_fields`` (e.g. nested relations) are only rendered when named
+    in ``?include=``.
+    """
+    field_columns = {}
+    optional_fields = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        selected = self.get_sparse_field_names(request)
+        if selected is not None:
+            for name in set(self.fields) - set(selected):
+                self.fields.pop(name)
+        for name in set(self.optional_fields) - set(self.get_included_fields(request)):
+            self.fields.pop(name, None)
+
+    @classmethod
+    def get_included_fields(cls, request):
+        """Optional fields requested with ``?include=``"""
+        return [name for name in _param_list(request, 'include') if name in cls.optional_fields]
+
+    @classmethod
+    def get_sparse_field_names(cls, request):
+        """Requested field names, or None when the full representation is wanted"""
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return None
+        available = list(cls.Meta.fields)
+        wanted = [name for name in _param_list(request, 'fields') if name in available]
+        omitted = set(_param_list(request, 'omit'))
+        if not wanted and not omitted:
+            return None
+        return [name for name in (wanted or available) if name not in omitted]
+
+    @classmethod
+    def get_sparse_columns(cls, request):
+        """Model columns needed for the requested fields, or None for all"""
+        names = cls.get_sparse_field_names(request)
+        if names is None:
+            return None
+        model_fields = {field.name for field in cls.Meta.model._meta.concrete_fields}
+        columns = {'id'}
+        for name in names:
+            if name in cls.field_columns:
+                columns.update(cls.field_columns[name])
+            elif name in model_fields:
+                columns.add(name)
+        return sorted(columns)
+
+
+class SubtaskRollupField(serializers.Field):
+    """Subtask count/progress, read from the rollup annotations when present"""
+
+    def __init__(self, **kwargs):
+        super().__init__(source='*', read_only=True, **kwargs)
 
-class TaskSerializer(serializers.ModelSerializer):
+    def to_representation(self, task):
+        return rollups_for(task)[self.field_name]
+
+
+class TaskSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     priority_label = serializers.CharField(read_only=True)
     is_overdue = serializers.BooleanField(read_only=True)
+    subtask_count = SubtaskRollupField()
+    subtasks_completed = SubtaskRollupField()
+    subtask_progress = SubtaskRollupField()
+    subtasks = SubtaskSerializer(many=True, read_only=True)
+
+    field_columns = {
+        'category_name': ['category__name'],
+        'priority_label': ['priority'],
+        'is_overdue': ['deadline', 'status'],
+    }
+    optional_fields = ('subtasks',)
     
     class Meta:
         model = Task
@@ -28,18 +121,42 @@ class TaskSerializer(serializers.ModelSerializer):
             'id', 'title', 'description', 'category', 'category_name',
             'priority', 'priority_label', 'deadline', 'status', 'tags',
             'ai_enhanced', 'original_description', 'is_overdue',
-            'created_at', 'updated_at'
+            'subtask_count', 'subtasks_completed', 'subtask_progress', 'subtasks',
+            'completed_at', 'created_at', 'updated_at'
         ]
+        read_only_fields = ['completed_at']
     
     def create(self, validated_data):
         # Increment category usage count
         category = validated_data.get('category')
         if category:
-            category.usage_count += 1
-            category.save()
+            increment_category_usage([category.pk])
         return super().create(validated_data)
 
 
+class TaskBulkUpdateSerializer(serializers.ModelSerializer):
+    """Fields that can be set on every task matched by a bulk selection"""
+
+    class Meta:
+        model = Task
+        fields = ['status', 'priority', 'category', 'deadline', 'ai_enhanced']
+
+
+class TaskDuplicateCheckSerializer(serializers.Serializer):
+    """Text of a task about to be created or edited, checked for near-duplicates"""
+    title = serializers.CharField(max_length=200)
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    exclude = serializers.IntegerField(required=False, help_text='Id of the task being edited')
+    threshold = serializers.FloatField(default=DEFAULT_THRESHOLD, min_value=0.1, max_value=1.0)
+    limit = serializers.IntegerField(default=10, min_value=1, max_value=50)
+
+
+class TaskDuplicateReportSerializer(serializers.Serializer):
+    """Query parameters of the near-duplicate report"""
+    threshold = serializers.FloatField(default=DEFAULT_THRESHOLD, min_value=0.1, max_value=1.0)
+    include_done = serializers.BooleanField(default=False)
+
+
 class TaskCreateSerializer(serializers.ModelSerializer):
     """Simplified serializer for task creation with AI suggestions"""
     category_name = serializers.CharField(write_only=True, required=False)
@@ -56,15 +173,70 @@ class TaskCreateSerializer(serializers.ModelSerializer):
         if category_name:
             category, created = Category.objects.get_or_create(name=category_name)
             validated_data['category'] = category
+            increment_category_usage([category.pk])
         return Task.objects.create(**validated_data)
 
 
+class SubtaskImportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Subtask
+        fields = ['title', 'completed', 'order']
+
+
+class TaskImportSerializer(serializers.ModelSerializer):
+    """A task record from ``tasks.transfer`` exports; validating it runs no queries"""
+    category = serializers.CharField(max_length=50, required=False, allow_blank=True, allow_null=True)
+    subtasks = SubtaskImportSerializer(many=True, required=False)
+    # Read-only on the model serializers; kept on import when exported
+    created_at = serializers.DateTimeField(required=False, allow_null=True)
+    updated_at = serializers.DateTimeField(required=False, allow_null=True)
+    completed_at = serializers.DateTimeField(required=False, allow_null=True)
+
+    class Meta:
+        model = Task
+        fields = [
+            'title', 'description', 'category', 'priority', 'deadline', 'status',
+            'tags', 'ai_enhanced', 'original_description', 'created_at', 'updated_at', 'completed_at', 'subtasks',
+        ]
+
+
+class ContextEntryListSerializer(serializers.ListSerializer):
+    """Saves many context entries with batched multi-row INSERTs"""
+
+    def create(self, validated_data):
+        entries = [ContextEntry(**item) for item in validated_data]
+        entries = ContextEntry.objects.bulk_create(entries, batch_size=BULK_BATCH_SIZE)
+        send_bulk_change(ContextEntry, [entry.pk for entry in entries])
+        return entries
+
+
 class ContextEntrySerializer(serializers.ModelSerializer):
     class Meta:
         model = ContextEntry
         fields = [
             'id', 'content', 'source', 'insights', 'processed', 'created_at'
         ]
+        list_serializer_class = ContextEntryListSerializer
+
+
+class ContextSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ContextSummary
+        fields = [
+            'id', 'source', 'period', 'period_start', 'period_end',
+            'entry_count', 'summary', 'insights', 'updated_at'
+        ]
+
+
+class ArchivedContextEntrySerializer(serializers.ModelSerializer):
+    content = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = ArchivedContextEntry
+        fields = [
+            'id', 'original_id', 'content', 'source', 'insights', 'summary',
+            'created_at', 'archived_at'
+        ]
 
 
 class AITaskSuggestionSerializer(serializers.Serializer):
@@ -73,3 +245,14 @@ class AITaskSuggestionSerializer(serializers.Serializer):
     context_limit = serializers.IntegerField(default=10, min_value=1, max_value=50)
     include_categories = serializers.BooleanField(default=True)
     user_preferences = serializers.DictField(required=False)
+
+
+class AIRerankSerializer(serializers.Serializer):
+    """Serializer for whole-backlog re-prioritization requests"""
+    chunk_size = serializers.IntegerField(default=25, min_value=4, max_value=100)
+    # Bounded so one request finishes; the management command has no cap
+    limit = serializers.IntegerField(
+        default=settings.AI_RERANK_MAX_TASKS, min_value=1, max_value=settings.AI_RERANK_MAX_TASKS
+    )
+    context_limit = serializers.IntegerField(default=10, min_value=0, max_value=50)
+    dry_run = serializers.BooleanField(default=False)
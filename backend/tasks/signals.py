@@ -0,0 +1,130 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from .analytics import mark_days, mark_task_rows, mark_tasks, previous_task_days, task_days
+from .changelog import LOGGED_MODELS, record_changes
+from .models import Category, ContextEntry, Subtask, Tag, Task
+from .similarity import sync_similarity_keys, sync_similarity_rows
+from .tagging import sync_task_tags
+from .versioning import mark_changed
+
+# Sent by write paths that bypass post_save/post_delete (bulk_create,
+# bulk_update, queryset.update) with the primary keys they touched.
+bulk_change = Signal()
+
+VERSIONED_MODELS = [Task, Category, Subtask, ContextEntry, Tag]
+
+
+def send_bulk_change(model, pks, deleted=False):
+    bulk_change.send(sender=model, pks=list(pks), deleted=deleted)
+
+
+@receiver(post_save, sender=Task)
+def update_tag_index(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """Mirror ``Task.tags`` into the indexed tag table"""
+    if raw or (update_fields is not None and 'tags' not in update_fields):
+        return
+    sync_task_tags([instance])
+
+
+def bump_model_version(sender, **kwargs):
+    mark_changed(sender)
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_model_version, sender=model, dispatch_uid=f'version-save-{model.__name__}')
+    post_delete.connect(bump_model_version, sender=model, dispatch_uid=f'version-delete-{model.__name__}')
+    bulk_change.connect(bump_model_version, sender=model, dispatch_uid=f'version-bulk-{model.__name__}')
+
+
+def log_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        record_changes(sender, [instance.pk], 'upsert')
+
+
+def log_deleted(sender, instance, **kwargs):
+    record_changes(sender, [instance.pk], 'delete')
+
+
+def log_bulk_change(sender, pks, deleted=False, **kwargs):
+    record_changes(sender, pks, 'delete' if deleted else 'upsert')
+
+
+for model in LOGGED_MODELS:
+    post_save.connect(log_saved, sender=model, dispatch_uid=f'changelog-save-{model.__name__}')
+    post_delete.connect(log_deleted, sender=model, dispatch_uid=f'changelog-delete-{model.__name__}')
+    bulk_change.connect(log_bulk_change, sender=model, dispatch_uid=f'changelog-bulk-{model.__name__}')
+
+
+@receiver(pre_delete, sender=Category)
+def detach_category_tasks(sender, instance, **kwargs):
+    """Deleting a category nulls ``Task.category`` with an UPDATE that sends no signals"""
+    pks = list(instance.tasks.values_list('pk', flat=True))
+    if pks:
+        send_bulk_change(Task, pks)
+
+
+# Fields a task's daily stats depend on
+STATS_FIELDS = {'status', 'completed_at', 'deadline', 'category', 'priority'}
+# Primary keys read per query when marking the days of bulk writes
+STATS_BATCH_SIZE = 500
+
+
+def _affects_stats(instance, update_fields):
+    """Whether a save writes a changed value of any of ``STATS_FIELDS``"""
+    fields = STATS_FIELDS if update_fields is None else STATS_FIELDS.intersection(update_fields)
+    return bool(fields) and bool(instance.changed_fields(fields))
+
+
+@receiver(pre_save, sender=Task, dispatch_uid='stats-presave-Task')
+def remember_previous_stats_days(sender, instance, raw=False, update_fields=None, **kwargs):
+    """A save can move a task to other days, whose stats need rebuilding too"""
+    if raw or not _affects_stats(instance, update_fields):
+        instance._previous_stats_days = None
+    elif instance._state.adding:
+        instance._previous_stats_days = []
+    else:
+        # Marked after the write: outside atomic blocks a mark is queued at once
+        instance._previous_stats_days = previous_task_days(instance)
+
+
+@receiver(post_save, sender=Task, dispatch_uid='stats-save-Task')
+def mark_saved_stats_days(sender, instance, raw=False, **kwargs):
+    previous = instance.__dict__.pop('_previous_stats_days', None)
+    if previous is not None:
+        mark_days([*previous, *task_days(instance)])
+
+
+@receiver(post_delete, sender=Task, dispatch_uid='stats-delete-Task')
+def mark_deleted_stats_days(sender, instance, **kwargs):
+    mark_tasks([instance])
+
+
+@receiver(bulk_change, sender=Task, dispatch_uid='stats-bulk-Task')
+def mark_bulk_stats_days(sender, pks, deleted=False, **kwargs):
+    """Writers that move tasks between days mark the old days before writing"""
+    if not deleted:
+        for start in range(0, len(pks), STATS_BATCH_SIZE):
+            mark_task_rows(Task.objects.filter(pk__in=pks[start:start + STATS_BATCH_SIZE]))
+
+
+# Fields the near-duplicate index is computed from
+SIMILARITY_FIELDS = {'title', 'description'}
+
+
+@receiver(post_save, sender=Task, dispatch_uid='similarity-save-Task')
+def update_similarity_keys(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Hashing a long description is costly, so only changed text is reindexed"""
+    fields = SIMILARITY_FIELDS if update_fields is None else SIMILARITY_FIELDS.intersection(update_fields)
+    if raw or not fields:
+        return
+    # post_save runs before save() refreshes the loaded values
+    if instance.changed_fields(fields):
+        sync_similarity_keys([instance])
+
+
+@receiver(bulk_change, sender=Task, dispatch_uid='similarity-bulk-Task')
+def update_bulk_similarity_keys(sender, pks, deleted=False, **kwargs):
+    """Deleted tasks lose their keys by cascade"""
+    if not deleted:
+        sync_similarity_rows(pks)
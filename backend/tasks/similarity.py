@@ -0,0 +1,240 @@
+"""
+Near-duplicate detection for tasks with a MinHash LSH index.
+
+A task's text (title and description) is reduced to its set of normalized
+words, and two tasks are near-duplicates when the Jaccard similarity of
+those sets reaches a threshold. Comparing every pair would be quadratic, so
+each task gets a MinHash signature of ``BANDS * ROWS`` values. The signature
+is cut into ``BANDS`` bands, and every band is hashed into one indexed
+``TaskSimilarityKey`` row. Tasks that share any key become candidates, and
+only candidates are compared exactly. With 20 bands of 3 rows, a pair with
+similarity 0.5 shares a key with probability 0.93, and one with 0.7 with
+probability 0.9999. A lookup reads ``BANDS`` index entries plus a few
+candidate rows, however many tasks exist.
+
+Keys are rewritten when a task's title or description is saved, including
+by bulk writes that send ``bulk_change``. ``rebuild_similarity_index``
+recreates them all and backs ``manage.py find_duplicate_tasks --rebuild``.
+"""
+import hashlib
+import random
+import re
+import struct
+
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Task, TaskSimilarityKey
+from .timeline import OPEN_STATUSES
+
+BANDS = 20
+ROWS = 3
+DEFAULT_THRESHOLD = 0.6
+# Candidates compared exactly per lookup, most shared bands first
+MAX_CANDIDATES = 200
+# Members of one key compared in the report; larger buckets are mostly copies
+MAX_BUCKET_SIZE = 200
+INDEX_BATCH_SIZE = 500
+
+STOP_WORDS = frozenset(
+    'a an and are as at be by for from has have in into is it its of on or re fw fwd the this '
+    'to was were will with'.split()
+)
+_WORD = re.compile(r'\w+')
+_PRIME = (1 << 61) - 1
+# Fixed seed: keys must stay comparable across processes and restarts
+_rng = random.Random(0x5eed)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(BANDS * ROWS)]
+
+
+def _hash64(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big')
+
+
+def text_words(title, description=''):
+    """The set of normalized words compared between tasks"""
+    words = _WORD.findall(f'{title or ""} {description or ""}'.lower())
+    return frozenset(word for word in words if len(word) > 1 and word not in STOP_WORDS)
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def minhash(words):
+    """``BANDS * ROWS`` minimum hash values of ``words`` under fixed permutations"""
+    hashes = [_hash64(word.encode('utf-8')) for word in words]
+    return [min((a * value + b) % _PRIME for value in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity_keys(words):
+    """One signed 64-bit key per band; empty when there are no words to compare"""
+    if not words:
+        return []
+    signature = minhash(words)
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        key = _hash64(struct.pack(f'>H{ROWS}Q', band, *rows))
+        # Fit a signed BigIntegerField
+        keys.append(key - (1 << 64) if key >= 1 << 63 else key)
+    return keys
+
+
+def task_keys(task):
+    return similarity_keys(text_words(task.title, task.description))
+
+
+def sync_similarity_keys(tasks):
+    """Rewrite the index rows of ``tasks`` whose keys changed"""
+    wanted = {task.pk: set(task_keys(task)) for task in tasks if task.pk}
+    if not wanted:
+        return
+    current = {}
+    for task_id, key in TaskSimilarityKey.objects.filter(task_id__in=wanted).values_list('task_id', 'key'):
+        current.setdefault(task_id, set()).add(key)
+    stale = [task_id for task_id, keys in wanted.items() if current.get(task_id, set()) != keys]
+    if not stale:
+        return
+    with transaction.atomic():
+        TaskSimilarityKey.objects.filter(task_id__in=stale).delete()
+        TaskSimilarityKey.objects.bulk_create(
+            [TaskSimilarityKey(task_id=task_id, key=key) for task_id in stale for key in wanted[task_id]],
+            batch_size=INDEX_BATCH_SIZE,
+        )
+
+
+def sync_similarity_rows(pks):
+    """``sync_similarity_keys`` for tasks by primary key, ``INDEX_BATCH_SIZE`` per query"""
+    pks = list(pks)
+    for start in range(0, len(pks), INDEX_BATCH_SIZE):
+        sync_similarity_keys(
+            Task.objects.filter(pk__in=pks[start:start + INDEX_BATCH_SIZE]).only('title', 'description')
+        )
+
+
+def rebuild_similarity_index(batch_size=INDEX_BATCH_SIZE, progress=None):
+    """Recreate the keys of every task; returns the number of tasks indexed"""
+    TaskSimilarityKey.objects.all().delete()
+    done = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            Task.objects.filter(pk__gt=last_pk).order_by('pk').only('title', 'description')[:batch_size]
+        )
+        if not batch:
+            return done
+        TaskSimilarityKey.objects.bulk_create(
+            [TaskSimilarityKey(task_id=task.pk, key=key) for task in batch for key in task_keys(task)],
+            batch_size=INDEX_BATCH_SIZE,
+        )
+        done += len(batch)
+        last_pk = batch[-1].pk
+        if progress:
+            progress(done)
+
+
+def _task_words(pks):
+    rows = Task.objects.filter(pk__in=pks).values_list('pk', 'title', 'description')
+    return {pk: text_words(title, description) for pk, title, description in rows}
+
+
+def find_similar(title, description='', threshold=DEFAULT_THRESHOLD, limit=10, exclude=None, queryset=None):
+    """
+    Tasks whose text is at least ``threshold`` similar to ``title`` and ``description``
+
+    Returns ``[(similarity, task)]``, most similar first. ``exclude`` skips a
+    task id (the task being edited); ``queryset`` restricts the matches.
+    """
+    words = text_words(title, description)
+    keys = similarity_keys(words)
+    if not keys:
+        return []
+    candidates = (
+        TaskSimilarityKey.objects.filter(key__in=keys)
+        .exclude(task_id=exclude)
+        .values('task_id')
+        .annotate(bands=Count('pk'))
+        .order_by('-bands', '-task_id')
+        .values_list('task_id', flat=True)[:MAX_CANDIDATES]
+    )
+    queryset = queryset if queryset is not None else Task.objects.all()
+    matches = []
+    for task in queryset.filter(pk__in=list(candidates)).select_related('category'):
+        similarity = jaccard(words, text_words(task.title, task.description))
+        if similarity >= threshold:
+            matches.append((similarity, task))
+    matches.sort(key=lambda match: (-match[0], -match[1].pk))
+    return matches[:limit]
+
+
+class _Groups:
+    """Union-find over task ids"""
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, item):
+        parent = self.parent.setdefault(item, item)
+        if parent != item:
+            parent = self.parent[item] = self.find(parent)
+        return parent
+
+    def union(self, a, b):
+        self.parent[self.find(a)] = self.find(b)
+
+
+def duplicate_groups(threshold=DEFAULT_THRESHOLD, include_done=False):
+    """
+    Groups of near-duplicate tasks, largest first
+
+    Only tasks sharing a key are compared: one GROUP BY over the key index
+    finds the shared keys, and each bucket is checked against the exact
+    similarity. Each group has its task ids (ascending) and the lowest
+    similarity that linked two of them.
+    """
+    allowed = None
+    if not include_done:
+        allowed = set(Task.objects.filter(status__in=OPEN_STATUSES).values_list('pk', flat=True))
+    shared = (
+        TaskSimilarityKey.objects.values('key').annotate(tasks=Count('pk')).filter(tasks__gt=1)
+        .values_list('key', flat=True)
+    )
+    buckets = {}
+    for key, task_id in (
+        TaskSimilarityKey.objects.filter(key__in=shared).order_by('key', 'task_id').values_list('key', 'task_id')
+    ):
+        if allowed is None or task_id in allowed:
+            buckets.setdefault(key, []).append(task_id)
+
+    words = {}
+    groups = _Groups()
+    weakest = {}
+    for members in buckets.values():
+        members = members[:MAX_BUCKET_SIZE]
+        if len(members) < 2:
+            continue
+        missing = [pk for pk in members if pk not in words]
+        if missing:
+            words.update(_task_words(missing))
+        for index, first in enumerate(members):
+            for second in members[index + 1:]:
+                if groups.find(first) == groups.find(second):
+                    continue
+                similarity = jaccard(words.get(first), words.get(second))
+                if similarity >= threshold:
+                    low = min(weakest.get(groups.find(first), 1.0), weakest.get(groups.find(second), 1.0))
+                    groups.union(first, second)
+                    weakest[groups.find(first)] = min(low, similarity)
+
+    members_by_root = {}
+    for task_id in list(groups.parent):
+        members_by_root.setdefault(groups.find(task_id), []).append(task_id)
+    result = [
+        {'task_ids': sorted(members), 'similarity': round(weakest.get(root, 1.0), 3)}
+        for root, members in members_by_root.items() if len(members) > 1
+    ]
+    result.sort(key=lambda group: (-len(group['task_ids']), group['task_ids'][0]))
+    return result
@@ -0,0 +1,65 @@
+"""
+Keeps the indexed ``Tag`` table in sync with the free-form ``Task.tags`` lists.
+
+``Task.tags`` stays the source of truth for the API; ``Task.tag_index`` is a
+normalized copy that filters and aggregations can hit through indexes instead
+of deserializing every JSON column.
+"""
+from .models import Tag, Task
+
+MAX_TAG_LENGTH = Tag._meta.get_field('name').max_length
+
+
+def normalize_tag(value):
+    """Canonical form used for the index: trimmed and lower-cased"""
+    if not isinstance(value, str):
+        return ''
+    return value.strip().lower()[:MAX_TAG_LENGTH]
+
+
+def normalize_tags(values):
+    if not isinstance(values, (list, tuple)):
+        return []
+    names = []
+    for value in values:
+        name = normalize_tag(value)
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def get_or_create_tags(names):
+    """Return ``{name: Tag}`` for ``names``, creating missing tags in one INSERT"""
+    names = set(names)
+    if not names:
+        return {}
+    tags = {tag.name: tag for tag in Tag.objects.filter(name__in=names)}
+    missing = names - set(tags)
+    if missing:
+        Tag.objects.bulk_create([Tag(name=name) for name in missing], ignore_conflicts=True)
+        tags.update({tag.name: tag for tag in Tag.objects.filter(name__in=missing)})
+    return tags
+
+
+def sync_task_tags(tasks):
+    """Rewrite the tag index rows for ``tasks`` from their ``tags`` lists"""
+    tasks = [task for task in tasks if task.pk]
+    if not tasks:
+        return
+    wanted = {task.pk: normalize_tags(task.tags) for task in tasks}
+    tags = get_or_create_tags(name for names in wanted.values() for name in names)
+
+    through = Task.tag_index.through
+    current = {}
+    for task_id, tag_id in through.objects.filter(task_id__in=wanted).values_list('task_id', 'tag_id'):
+        current.setdefault(task_id, set()).add(tag_id)
+
+    rows = []
+    for task_id, names in wanted.items():
+        tag_ids = {tags[name].pk for name in names}
+        existing = current.get(task_id, set())
+        if existing - tag_ids:
+            through.objects.filter(task_id=task_id, tag_id__in=existing - tag_ids).delete()
+        rows.extend(through(task_id=task_id, tag_id=tag_id) for tag_id in tag_ids - existing)
+    if rows:
+        through.objects.bulk_create(rows, ignore_conflicts=True)
@@ -0,0 +1,329 @@
+from datetime import timedelta
+
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from .analytics import rebuild_stats, refresh_pending_days
+from .models import ChangeLogEntry, DailyTaskStats, PendingStatsDay, Subtask, Task, TaskSimilarityKey
+from .similarity import BANDS, duplicate_groups, find_similar, jaccard, text_words
+
+
+class CommittedWritesMixin:
+    """Signal receivers defer their work to ``on_commit``, which test transactions never reach"""
+
+    def committed(self):
+        return self.captureOnCommitCallbacks(execute=True)
+
+
+@override_settings(SYNC_SETTLE_SECONDS=0)
+class SyncCursorTests(CommittedWritesMixin, APITestCase):
+    """``/api/sync/`` hands out every change once, in change-log order, with deletes as tombstones"""
+
+    def sync(self, since=None, **params):
+        if since is not None:
+            params['since'] = since
+        response = self.client.get('/api/sync/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def task_ids(self, payload, key='updated'):
+        if key == 'updated':
+            return sorted(task['id'] for task in payload['tasks']['updated'])
+        return payload['tasks']['deleted']
+
+    def test_without_cursor_resets(self):
+        payload = self.sync()
+        self.assertTrue(payload['reset'])
+        self.assertEqual(payload['cursor'], 0)
+
+    def test_changes_after_cursor(self):
+        start = self.sync()['cursor']
+        with self.committed():
+            first = Task.objects.create(title='first')
+        with self.committed():
+            second = Task.objects.create(title='second')
+
+        payload = self.sync(start)
+        self.assertFalse(payload['reset'])
+        self.assertEqual(self.task_ids(payload), [first.pk, second.pk])
+        self.assertEqual(self.task_ids(payload, 'deleted'), [])
+
+        with self.committed():
+            first.title = 'first, renamed'
+            first.save()
+        second_pk = second.pk
+        with self.committed():
+            second.delete()
+        later = self.sync(payload['cursor'])
+        self.assertEqual(self.task_ids(later), [first.pk])
+        self.assertEqual(later['tasks']['updated'][0]['title'], 'first, renamed')
+        self.assertEqual(self.task_ids(later, 'deleted'), [second_pk])
+
+        # Nothing new: same cursor, empty payload
+        idle = self.sync(later['cursor'])
+        self.assertEqual(idle['cursor'], later['cursor'])
+        self.assertEqual(self.task_ids(idle), [])
+        self.assertEqual(self.task_ids(idle, 'deleted'), [])
+
+    def test_delete_after_upsert_is_only_a_tombstone(self):
+        start = self.sync()['cursor']
+        with self.committed():
+            task = Task.objects.create(title='short-lived')
+            subtask = Subtask.objects.create(task=task, title='step')
+        task_pk, subtask_pk = task.pk, subtask.pk
+        with self.committed():
+            task.delete()
+
+        payload = self.sync(start)
+        self.assertEqual(self.task_ids(payload), [])
+        self.assertEqual(self.task_ids(payload, 'deleted'), [task_pk])
+        # Cascaded deletes are logged as well
+        self.assertEqual(payload['subtasks']['deleted'], [subtask_pk])
+
+    def test_pages_follow_log_order(self):
+        start = self.sync()['cursor']
+        tasks = []
+        # Created in reverse priority order, so the log order is not the list order
+        for priority in (0, 50, 100):
+            with self.committed():
+                tasks.append(Task.objects.create(title=f'p{priority}', priority=priority))
+
+        page = self.sync(start, limit=2)
+        self.assertTrue(page['has_more'])
+        self.assertEqual(self.task_ids(page), [task.pk for task in tasks[:2]])
+        rest = self.sync(page['cursor'], limit=2)
+        self.assertFalse(rest['has_more'])
+        self.assertEqual(self.task_ids(rest), [tasks[2].pk])
+
+    def test_one_transaction_logs_final_action_once(self):
+        start = self.sync()['cursor']
+        with self.committed():
+            task = Task.objects.create(title='draft')
+            task.title = 'final'
+            task.save()
+        self.assertEqual(ChangeLogEntry.objects.filter(object_id=task.pk).count(), 1)
+        self.assertEqual(self.task_ids(self.sync(start)), [task.pk])
+
+    def test_pruned_cursor_resets(self):
+        start = self.sync()['cursor']
+        for title in ('a', 'b', 'c'):
+            with self.committed():
+                Task.objects.create(title=title)
+        ChangeLogEntry.objects.filter(pk__lt=ChangeLogEntry.objects.latest('pk').pk).delete()
+
+        payload = self.sync(start)
+        self.assertTrue(payload['reset'])
+        self.assertEqual(payload['cursor'], ChangeLogEntry.objects.latest('pk').pk)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/sync/', {'since': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalGetTests(CommittedWritesMixin, APITestCase):
+    """ETags of the list endpoints change with every write, bulk writes included"""
+
+    def setUp(self):
+        with self.committed():
+            self.tasks = [Task.objects.create(title=f'task {index}') for index in range(3)]
+
+    def get(self, url, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, **headers)
+
+    def assertInvalidated(self, write, url='/api/categories/'):
+        etag = self.get(url)['ETag']
+        self.assertEqual(self.get(url, etag).status_code, 304)
+        with self.committed():
+            response = write()
+        self.assertLess(response.status_code, 300, getattr(response, 'data', None))
+        fresh = self.get(url, etag)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['ETag'], etag)
+        self.assertEqual(self.get(url, fresh['ETag']).status_code, 304)
+
+    def test_not_modified_without_writes(self):
+        response = self.get('/api/tags/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get('/api/tags/', response['ETag']).status_code, 304)
+
+    def test_bulk_create(self):
+        self.assertInvalidated(lambda: self.client.post(
+            '/api/tasks/bulk_create/', [{'title': 'new'}], format='json'
+        ))
+
+    def test_bulk_update_items(self):
+        self.assertInvalidated(lambda: self.client.patch(
+            '/api/tasks/bulk_update/', [{'id': self.tasks[0].pk, 'status': 'done'}], format='json'
+        ))
+
+    def test_bulk_update_selection(self):
+        self.assertInvalidated(lambda: self.client.patch(
+            '/api/tasks/bulk_update/', {'ids': [task.pk for task in self.tasks], 'update': {'priority': 100}},
+            format='json',
+        ))
+
+    def test_bulk_delete(self):
+        self.assertInvalidated(lambda: self.client.post(
+            '/api/tasks/bulk_delete/', {'ids': [self.tasks[0].pk]}, format='json'
+        ))
+
+    def test_single_write_invalidates_dependent_list(self):
+        self.assertInvalidated(
+            lambda: self.client.patch(f'/api/tasks/{self.tasks[0].pk}/', {'tags': ['home']}, format='json'),
+            url='/api/tags/',
+        )
+
+    def test_rolled_back_write_keeps_etag(self):
+        etag = self.get('/api/categories/')['ETag']
+        with self.committed():
+            response = self.client.post('/api/tasks/bulk_create/', [{'title': 'ok'}, {'title': ''}], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.get('/api/categories/', etag).status_code, 304)
+
+
+@override_settings(TASK_STATS_REFRESH_DELAY=0)
+class RollupTests(CommittedWritesMixin, APITestCase):
+    """Queued day rebuilds leave the rollups as a full rebuild would"""
+
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.tomorrow = self.today + timedelta(days=1)
+
+    def stats(self):
+        return {
+            (row.day, row.priority): (row.created, row.completed, row.due, row.on_time)
+            for row in DailyTaskStats.objects.all()
+        }
+
+    def refresh(self):
+        refresh_pending_days()
+        incremental = self.stats()
+        rebuild_stats()
+        self.assertEqual(incremental, self.stats())
+        return incremental
+
+    def test_writes_queue_days_instead_of_rebuilding(self):
+        with self.committed():
+            Task.objects.create(title='queued', deadline=timezone.now() + timedelta(days=1))
+        self.assertFalse(DailyTaskStats.objects.exists())
+        self.assertEqual(set(PendingStatsDay.objects.values_list('day', flat=True)), {self.today, self.tomorrow})
+        self.refresh()
+        self.assertFalse(PendingStatsDay.objects.exists())
+
+    def test_status_change(self):
+        with self.committed():
+            task = Task.objects.create(title='report', priority=50, deadline=timezone.now() + timedelta(days=1))
+        self.assertEqual(self.refresh(), {
+            (self.today, 50): (1, 0, 0, 0),
+            (self.tomorrow, 50): (0, 0, 1, 0),
+        })
+
+        with self.committed():
+            task.status = 'done'
+            task.save()
+        self.assertEqual(self.refresh(), {
+            (self.today, 50): (1, 1, 0, 0),
+            (self.tomorrow, 50): (0, 0, 1, 1),
+        })
+
+        with self.committed():
+            response = self.client.patch(
+                '/api/tasks/bulk_update/', {'ids': [task.pk], 'update': {'status': 'todo'}}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.refresh(), {
+            (self.today, 50): (1, 0, 0, 0),
+            (self.tomorrow, 50): (0, 0, 1, 0),
+        })
+
+    def test_moved_deadline_and_priority(self):
+        with self.committed():
+            task = Task.objects.create(title='move', priority=0, deadline=timezone.now() + timedelta(days=1))
+        self.refresh()
+        later = self.today + timedelta(days=3)
+        with self.committed():
+            response = self.client.patch('/api/tasks/bulk_update/', [{
+                'id': task.pk, 'priority': 100, 'deadline': (timezone.now() + timedelta(days=3)).isoformat(),
+            }], format='json')
+        self.assertEqual(response.status_code, 200)
+        # The old day and group are emptied, not left behind
+        self.assertEqual(self.refresh(), {
+            (self.today, 100): (1, 0, 0, 0),
+            (later, 100): (0, 0, 1, 0),
+        })
+
+    def test_delete(self):
+        with self.committed():
+            task = Task.objects.create(title='gone', status='done')
+        self.assertEqual(self.refresh(), {(self.today, 0): (1, 1, 0, 0)})
+        with self.committed():
+            task.delete()
+        self.assertEqual(self.refresh(), {})
+
+
+class NearDuplicateTests(CommittedWritesMixin, APITestCase):
+    """The similarity index finds tasks by word overlap and follows edits"""
+
+    def setUp(self):
+        self.passport = Task.objects.create(
+            title='Renew passport', description='Book an appointment at the city office before the trip'
+        )
+        self.unrelated = Task.objects.create(title='Water the plants', description='Balcony and kitchen')
+
+    def test_words_ignore_case_punctuation_and_stop_words(self):
+        self.assertEqual(text_words('Renew the Passport!', 'at THE office'), {'renew', 'passport', 'office'})
+        self.assertEqual(jaccard(text_words('a b c d'), text_words('c d e f')), 0.0)
+        self.assertEqual(jaccard(text_words('aa bb cc dd'), text_words('cc dd ee ff')), 2 / 6)
+
+    def test_index_holds_one_key_per_band(self):
+        self.assertEqual(TaskSimilarityKey.objects.filter(task=self.passport).count(), BANDS)
+
+    def test_find_similar(self):
+        matches = find_similar('renew PASSPORT', 'book appointment at city office before trip, soon')
+        self.assertEqual([task.pk for _, task in matches], [self.passport.pk])
+        self.assertAlmostEqual(matches[0][0], 8 / 9)
+        self.assertEqual(find_similar('renew passport', 'book appointment at city office before trip',
+                                      exclude=self.passport.pk), [])
+        self.assertEqual(find_similar('completely different words here'), [])
+
+    def test_threshold(self):
+        # Shares 6 of 10 words with the passport task
+        text = ('renew passport', 'book appointment city office tomorrow morning')
+        self.assertEqual(find_similar(*text, threshold=0.7), [])
+        matches = find_similar(*text, threshold=0.5)
+        self.assertEqual([task.pk for _, task in matches], [self.passport.pk])
+        self.assertAlmostEqual(matches[0][0], 0.6)
+
+    def test_edit_reindexes(self):
+        with self.committed():
+            self.unrelated.title = 'Renew passport'
+            self.unrelated.description = 'Book an appointment at the city office before the trip'
+            self.unrelated.save()
+        matches = find_similar('Renew passport', 'book appointment city office before trip')
+        self.assertEqual({task.pk for _, task in matches}, {self.passport.pk, self.unrelated.pk})
+
+    def test_bulk_edit_reindexes(self):
+        with self.committed():
+            response = self.client.patch('/api/tasks/bulk_update/', [
+                {'id': self.passport.pk, 'title': 'Water the plants', 'description': 'Balcony and kitchen'},
+            ], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(duplicate_groups(), [{'task_ids': [self.passport.pk, self.unrelated.pk], 'similarity': 1.0}])
+        self.assertEqual(find_similar('Renew passport', 'book appointment city office before trip'), [])
+
+    def test_groups_skip_done_tasks_by_default(self):
+        copy = Task.objects.create(title='renew passport', description=self.passport.description, status='done')
+        self.assertEqual(duplicate_groups(), [])
+        self.assertEqual(
+            duplicate_groups(include_done=True), [{'task_ids': [self.passport.pk, copy.pk], 'similarity': 1.0}]
+        )
+
+    def test_check_duplicates_endpoint(self):
+        response = self.client.post('/api/tasks/check_duplicates/', {
+            'title': 'Renew passport', 'description': 'appointment at the city office before the trip',
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([match['task']['id'] for match in response.data['duplicates']], [self.passport.pk])
+        self.assertGreaterEqual(response.data['duplicates'][0]['similarity'], response.data['threshold'])
@@ -0,0 +1,134 @@
+"""
+Deadline timeline: tasks or counts bucketed by day, week or month.
+
+Bucketing (``Trunc``) and the overdue flag are computed by the database and
+the deadline range is answered from the ``(deadline, status)`` index, so a
+calendar or agenda view is one small query instead of a full list download.
+Buckets without tasks are omitted.
+"""
+import zoneinfo
+from datetime import datetime, time, timedelta
+
+from django.db.models import BooleanField, Count, ExpressionWrapper, Q
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+OPEN_STATUSES = ('todo', 'in_progress')
+BUCKET_DAYS = {'day': 1, 'week': 7, 'month': 28}
+# Range returned when no ?end= is given
+DEFAULT_SPAN_DAYS = {'day': 31, 'week': 84, 'month': 366}
+MAX_BUCKETS = 400
+MAX_TIMELINE_TASKS = 2000
+
+
+def overdue_condition(now=None):
+    """Open tasks whose deadline has passed; the SQL counterpart of ``Task.is_overdue``"""
+    return Q(deadline__lt=now or timezone.now(), status__in=OPEN_STATUSES)
+
+
+def with_overdue(queryset, now=None):
+    return queryset.annotate(
+        overdue=ExpressionWrapper(overdue_condition(now), output_field=BooleanField())
+    )
+
+
+def _bucket_start(value, bucket):
+    start = datetime.combine(value, time.min)
+    if bucket == 'week':
+        start -= timedelta(days=value.weekday())
+    elif bucket == 'month':
+        start = start.replace(day=1)
+    return start
+
+
+def _parse_bound(value, name, tz):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValidationError({name: 'Expected a date (YYYY-MM-DD) or an ISO 8601 datetime.'})
+        parsed = datetime.combine(day, time.min)
+    return timezone.make_aware(parsed, tz) if timezone.is_naive(parsed) else parsed
+
+
+def parse_timeline_params(params):
+    """
+    Validate ``?bucket=``, ``?tz=``, ``?start=``, ``?end=`` and ``?mode=``
+
+    ``start`` defaults to the beginning of the current bucket and ``end`` to
+    ``DEFAULT_SPAN_DAYS`` after ``start``; both are read in ``tz``.
+    """
+    bucket = params.get('bucket', 'day')
+    if bucket not in BUCKET_DAYS:
+        raise ValidationError({'bucket': f"Expected one of: {', '.join(BUCKET_DAYS)}."})
+    mode = params.get('mode', 'counts')
+    if mode not in ('counts', 'tasks'):
+        raise ValidationError({'mode': 'Expected counts or tasks.'})
+    try:
+        tz = zoneinfo.ZoneInfo(params['tz']) if params.get('tz') else timezone.get_current_timezone()
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+        raise ValidationError({'tz': 'Unknown time zone.'})
+
+    if params.get('start'):
+        start = _parse_bound(params['start'], 'start', tz)
+    else:
+        start = timezone.make_aware(_bucket_start(timezone.localdate(timezone=tz), bucket), tz)
+    if params.get('end'):
+        end = _parse_bound(params['end'], 'end', tz)
+    else:
+        end = start + timedelta(days=DEFAULT_SPAN_DAYS[bucket])
+    if end <= start:
+        raise ValidationError({'end': 'Must be after start.'})
+    if (end - start).days / BUCKET_DAYS[bucket] > MAX_BUCKETS:
+        raise ValidationError({'end': f'Range spans more than {MAX_BUCKETS} buckets.'})
+    return {'bucket': bucket, 'mode': mode, 'tz': tz, 'start': start, 'end': end}
+
+
+def _in_range(queryset, bucket, start, end, tz):
+    return queryset.filter(deadline__gte=start, deadline__lt=end).annotate(
+        period=Trunc('deadline', bucket, tzinfo=tz)
+    )
+
+
+def timeline_counts(queryset, bucket, start, end, tz, now=None):
+    """``[{'start', 'total', 'done', 'overdue'}]`` per bucket, from one GROUP BY query"""
+    rows = (
+        _in_range(queryset, bucket, start, end, tz)
+        .order_by()
+        .values('period')
+        .annotate(
+            total=Count('pk'),
+            done=Count('pk', filter=Q(status='done')),
+            overdue=Count('pk', filter=overdue_condition(now)),
+        )
+        .order_by('period')
+    )
+    return [
+        {'start': row['period'], 'total': row['total'], 'done': row['done'], 'overdue': row['overdue']}
+        for row in rows
+    ]
+
+
+def timeline_tasks(queryset, bucket, start, end, tz, now=None, limit=MAX_TIMELINE_TASKS):
+    """
+    ``([{'start', 'tasks'}], truncated)`` with compact task rows per bucket
+
+    Reads only the columns a calendar entry shows, in deadline order, and
+    stops after ``limit`` tasks.
+    """
+    rows = list(
+        with_overdue(_in_range(queryset, bucket, start, end, tz), now)
+        .order_by('deadline', 'pk')
+        .values('id', 'title', 'status', 'priority', 'deadline', 'category__name', 'overdue', 'period')[:limit + 1]
+    )
+    truncated = len(rows) > limit
+    buckets = []
+    for row in rows[:limit]:
+        period = row.pop('period')
+        row['category'] = row.pop('category__name')
+        if not buckets or buckets[-1]['start'] != period:
+            buckets.append({'start': period, 'tasks': []})
+        buckets[-1]['tasks'].append(row)
+    return buckets, truncated
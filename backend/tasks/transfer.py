@@ -0,0 +1,197 @@
+"""
+Task export and import (CSV and NDJSON).
+
+Exports read tasks through ``.iterator(chunk_size=...)``, which uses a
+server-side cursor on PostgreSQL and prefetches categories and subtasks per
+chunk. Output is produced in blocks, so memory stays flat however many tasks
+there are. Imports validate each record without touching the database. They
+then save ``batch_size`` tasks at a time with ``bulk_create``, resolving
+category names through a map that is filled once per new name. Exported
+``created_at``, ``updated_at`` and ``completed_at`` survive the round trip,
+so analytics and the timeline see the original dates.
+"""
+import csv
+import io
+import json
+
+from django.db import transaction
+
+from .bulk import BULK_BATCH_SIZE, increment_category_usage, resolve_categories
+from .models import Subtask, Task
+from .serializers import TaskImportSerializer
+from .signals import send_bulk_change
+from .tagging import sync_task_tags
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_COLUMNS = [
+    'id', 'title', 'description', 'category', 'priority', 'deadline', 'status', 'tags',
+    'ai_enhanced', 'original_description', 'created_at', 'updated_at', 'completed_at', 'subtasks',
+]
+# Set by auto_now_add / auto_now on insert; imported values are written afterwards
+IMPORTED_TIMESTAMPS = ('created_at', 'updated_at')
+# Stored as JSON inside a CSV cell
+JSON_COLUMNS = ('tags', 'subtasks')
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def iter_task_records(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield one plain dict per task, with its category name and subtasks"""
+    queryset = queryset.select_related('category').prefetch_related('subtasks').order_by('pk')
+    for task in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': task.pk,
+            'title': task.title,
+            'description': task.description,
+            'category': task.category.name if task.category else None,
+            'priority': task.priority,
+            'deadline': _isoformat(task.deadline),
+            'status': task.status,
+            'tags': task.tags,
+            'ai_enhanced': task.ai_enhanced,
+            'original_description': task.original_description,
+            'created_at': _isoformat(task.created_at),
+            'updated_at': _isoformat(task.updated_at),
+            'completed_at': _isoformat(task.completed_at),
+            'subtasks': [
+                {'title': subtask.title, 'completed': subtask.completed, 'order': subtask.order}
+                for subtask in task.subtasks.all()
+            ],
+        }
+
+
+def export_ndjson(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield NDJSON text, one block per ``chunk_size`` tasks"""
+    block = []
+    for record in iter_task_records(queryset, chunk_size):
+        block.append(json.dumps(record))
+        if len(block) >= chunk_size:
+            yield '\n'.join(block) + '\n'
+            block.clear()
+    if block:
+        yield '\n'.join(block) + '\n'
+
+
+def export_csv(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield CSV text with a header row, one block per ``chunk_size`` tasks"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for count, record in enumerate(iter_task_records(queryset, chunk_size), start=1):
+        for column in JSON_COLUMNS:
+            record[column] = json.dumps(record[column])
+        writer.writerow(record)
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def parse_ndjson(lines):
+    """
+    Yield ``(line_number, record, errors)`` for NDJSON ``lines`` (str or bytes)
+
+    A ``ValueError`` raised while reading, e.g. for an undecodable or overlong
+    line, is reported as an error and ends the input.
+    """
+    line_number = 0
+    try:
+        for line_number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line), None
+            except ValueError as e:
+                yield line_number, None, {'non_field_errors': [f'Invalid JSON: {e}']}
+    except ValueError as e:
+        yield line_number + 1, None, {'non_field_errors': [f'{e}; import stopped']}
+
+
+def _csv_record(row):
+    record = {}
+    for column, value in row.items():
+        if column is None or value in (None, ''):
+            continue  # extra cells, or empty optional values
+        record[column] = json.loads(value) if column in JSON_COLUMNS else value
+    return record
+
+
+def parse_csv(lines):
+    """Yield ``(line_number, record, errors)`` for CSV text ``lines`` written by ``export_csv``"""
+    reader = csv.DictReader(lines)
+    try:
+        for row in reader:
+            try:
+                yield reader.line_num, _csv_record(row), None
+            except ValueError as e:
+                yield reader.line_num, None, {'non_field_errors': [f'Invalid JSON cell: {e}']}
+    except (ValueError, csv.Error) as e:
+        yield reader.line_num + 1, None, {'non_field_errors': [f'{e}; import stopped']}
+
+
+def _save_batch(batch, categories):
+    with transaction.atomic():
+        # Only names not seen earlier in this import cost a query
+        new_names = {item.get('category') for item in batch} - set(categories) - {None, ''}
+        if new_names:
+            categories.update(resolve_categories(new_names))
+
+        subtask_data = [item.pop('subtasks', []) for item in batch]
+        timestamps = [{name: item.pop(name, None) for name in IMPORTED_TIMESTAMPS} for item in batch]
+        tasks = [Task(category=categories.get(item.pop('category', None)), **item) for item in batch]
+        for task in tasks:
+            task.sync_completed_at()
+        tasks = Task.objects.bulk_create(tasks, batch_size=BULK_BATCH_SIZE)
+
+        # bulk_update skips auto_now, so the exported dates stick
+        dated = []
+        for task, values in zip(tasks, timestamps):
+            values = {name: value for name, value in values.items() if value is not None}
+            if values:
+                for name, value in values.items():
+                    setattr(task, name, value)
+                dated.append(task)
+        if dated:
+            Task.objects.bulk_update(dated, IMPORTED_TIMESTAMPS, batch_size=BULK_BATCH_SIZE)
+        subtasks = Subtask.objects.bulk_create([
+            Subtask(task=task, **{'order': position, **data})
+            for task, items in zip(tasks, subtask_data) for position, data in enumerate(items)
+        ], batch_size=BULK_BATCH_SIZE)
+
+        sync_task_tags(tasks)
+        increment_category_usage(task.category_id for task in tasks)
+        send_bulk_change(Task, [task.pk for task in tasks])
+        if subtasks:
+            send_bulk_change(Subtask, [subtask.pk for subtask in subtasks])
+    return len(tasks)
+
+
+def import_task_records(rows, batch_size=BULK_BATCH_SIZE, max_errors=100):
+    """
+    Create tasks from ``(line_number, record, errors)`` rows
+
+    Each batch commits on its own; invalid records are skipped. Returns
+    ``{'created', 'failed', 'errors'}`` with at most ``max_errors`` errors.
+    """
+    categories = {}
+    stats = {'created': 0, 'failed': 0, 'errors': []}
+    batch = []
+    for line_number, record, errors in rows:
+        if errors is None:
+            serializer = TaskImportSerializer(data=record)
+            if serializer.is_valid():
+                batch.append(dict(serializer.validated_data))
+                if len(batch) >= batch_size:
+                    stats['created'] += _save_batch(batch, categories)
+                    batch = []
+                continue
+            errors = serializer.errors
+        stats['failed'] += 1
+        if len(stats['errors']) < max_errors:
+            stats['errors'].append({'line': line_number, 'errors': errors})
+    if batch:
+        stats['created'] += _save_batch(batch, categories)
+    return stats
@@ -1,13 +1,23 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TaskViewSet, CategoryViewSet, ContextEntryViewSet, SubtaskViewSet
+from .views import (
+    TaskViewSet, CategoryViewSet, ContextEntryViewSet, SubtaskViewSet, TagViewSet,
+    ContextSummaryViewSet, ArchivedContextEntryViewSet, TaskAnalyticsViewSet, response_cache_stats, sync, event_stream
+)
 
 router = DefaultRouter()
 router.register(r'tasks', TaskViewSet)
 router.register(r'categories', CategoryViewSet)
 router.register(r'contexts', ContextEntryViewSet)
+router.register(r'context-summaries', ContextSummaryViewSet)
+router.register(r'context-archive', ArchivedContextEntryViewSet)
 router.register(r'subtasks', SubtaskViewSet)
+router.register(r'tags', TagViewSet, basename='tag')
+router.register(r'analytics', TaskAnalyticsViewSet, basename='analytics')
 
 urlpatterns = [
+    path('cache/stats/', response_cache_stats, name='response_cache_stats'),
+    path('sync/', sync, name='sync'),
+    path('events/', event_stream, name='event_stream'),
     path('', include(router.urls)),
 ]
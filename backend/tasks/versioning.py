@@ -0,0 +1,93 @@
+"""
+Per-model version counters.
+
+Every write to a versioned model bumps its ``ModelVersion`` row once per
+transaction, after commit. Readers that fetch the version *before* querying
+data can therefore never pair old data with a new version, which makes the
+counters safe to use as cache keys and HTTP validators.
+
+When ``MODEL_VERSION_CACHE`` names a shared cache, versions are mirrored into
+it on every bump so readers can validate without a database query.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ModelVersion
+
+_pending = threading.local()
+
+
+def _label(model):
+    return model if isinstance(model, str) else model._meta.label_lower
+
+
+def _version_cache():
+    alias = getattr(settings, 'MODEL_VERSION_CACHE', None)
+    return caches[alias] if alias else None
+
+
+def _cache_key(label):
+    return f'model-version:{label}'
+
+
+def _flush_pending():
+    labels = getattr(_pending, 'labels', None)
+    if not labels:
+        return
+    _pending.labels = set()
+    now = timezone.now()
+    for label in sorted(labels):
+        updated = ModelVersion.objects.filter(name=label).update(
+            version=F('version') + 1, updated_at=now
+        )
+        if not updated:
+            ModelVersion.objects.get_or_create(name=label, defaults={'version': 1, 'updated_at': now})
+
+    cache = _version_cache()
+    if cache is not None:
+        cache.set_many({
+            _cache_key(name): (version, updated_at)
+            for name, version, updated_at in ModelVersion.objects.filter(name__in=labels).values_list(
+                'name', 'version', 'updated_at'
+            )
+        }, timeout=None)
+
+
+def mark_changed(*models):
+    """Schedule a version bump for ``models`` when the current transaction commits"""
+    if not hasattr(_pending, 'labels'):
+        _pending.labels = set()
+    _pending.labels.update(_label(model) for model in models)
+    # Outside atomic blocks this runs immediately; inside, many writes in
+    # one transaction collapse into a single bump per model.
+    transaction.on_commit(_flush_pending)
+
+
+def get_versions(*models):
+    """Return ``{label: (version, updated_at)}`` for ``models`` in one query"""
+    labels = [_label(model) for model in models]
+    versions = {label: (0, None) for label in labels}
+    cache = _version_cache()
+    if cache is not None:
+        cached = cache.get_many([_cache_key(label) for label in labels])
+        for label in labels:
+            if _cache_key(label) in cached:
+                versions[label] = cached[_cache_key(label)]
+        labels = [label for label in labels if _cache_key(label) not in cached]
+        if not labels:
+            return versions
+
+    for name, version, updated_at in ModelVersion.objects.filter(name__in=labels).values_list(
+        'name', 'version', 'updated_at'
+    ):
+        versions[name] = (version, updated_at)
+    if cache is not None:
+        for label in labels:
+            # add() never overwrites a newer value written by a concurrent bump
+            cache.add(_cache_key(label), versions[label], timeout=None)
+    return versions
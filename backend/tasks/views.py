@@ -1,21 +1,102 @@
+import asyncio
+import json
+import time
+
 from rest_framework import viewsets, status, filters
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
+from asgiref.sync import sync_to_async
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Q
-from .models import Task, Category, ContextEntry, Subtask
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Case, Count, Max, Q, Value, When, prefetch_related_objects
+from django.db.models.functions import Coalesce, Now
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from .analytics import mark_task_rows, parse_stats_params, stats_series
+from .bulk import BULK_BATCH_SIZE, increment_category_usage, resolve_categories
+from .caching import cache_stats, cached_response
+from .changelog import SYNC_MODELS, changes_since, latest_cursor
+from .events import EVENT_MODELS, hub
+from .conditional import ConditionalGetMixin, conditional_get
+from .filters import TaskFilter
+from .models import (
+    Task, Category, ContextEntry, Subtask, Tag, ContextSummary, ArchivedContextEntry, DailyTaskStats
+)
+from .rollups import ROLLUP_FIELDS, with_subtask_rollups
+from .search import FullTextSearchFilter
+from .signals import send_bulk_change
+from .similarity import duplicate_groups, find_similar
 from .serializers import (
     TaskSerializer, TaskCreateSerializer, CategorySerializer, 
-    ContextEntrySerializer, AITaskSuggestionSerializer, SubtaskSerializer
+    ContextEntrySerializer, AITaskSuggestionSerializer, SubtaskSerializer,
+    TagSerializer, TaskBulkUpdateSerializer, ContextSummarySerializer,
+    ArchivedContextEntrySerializer, TaskDuplicateCheckSerializer, TaskDuplicateReportSerializer
 )
+from .tagging import sync_task_tags
+from .timeline import overdue_condition, parse_timeline_params, timeline_counts, timeline_tasks
+from .transfer import EXPORT_CHUNK_SIZE, export_csv, export_ndjson, import_task_records, parse_csv, parse_ndjson
+
+
+MAX_INGEST_LINE_BYTES = 1024 * 1024
+MAX_INGEST_ERRORS = 100
+# Keeps the CASE expression of a reorder UPDATE within database parameter limits
+MAX_REORDER_SUBTASKS = 1000
+_OVERLONG_LINE = object()
+
+
+def _iter_lines(stream):
+    """Yield lines from a file-like body, replacing overlong ones with a marker"""
+    while True:
+        line = stream.readline(MAX_INGEST_LINE_BYTES + 1)
+        if not line:
+            return
+        if len(line) > MAX_INGEST_LINE_BYTES and not line.endswith(b'\n'):
+            # Drain the rest of the line without buffering it
+            while line and not line.endswith(b'\n'):
+                line = stream.readline(MAX_INGEST_LINE_BYTES)
+            yield _OVERLONG_LINE
+            continue
+        yield line
+
 
+def _checked_lines(stream):
+    """Lines of an upload body; an overlong line raises ``ValueError``"""
+    for line in _iter_lines(stream):
+        if line is _OVERLONG_LINE:
+            raise ValueError(f'Line exceeds {MAX_INGEST_LINE_BYTES} bytes')
+        yield line
 
-class TaskViewSet(viewsets.ModelViewSet):
+
+def _streaming_body(request, chunks):
+    """
+    Adapt a sync generator for ``StreamingHttpResponse``
+
+    Under ASGI, Django 4.2 would read a sync iterator into memory before
+    sending it, so it is pulled one chunk at a time from the request's
+    thread instead (which also keeps any server-side cursor on its connection).
+    """
+    if not isinstance(getattr(request, '_request', request), ASGIRequest):
+        return chunks
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+
+    async def body():
+        while (chunk := await next_chunk(chunks, None)) is not None:
+            yield chunk
+
+    return body()
+
+
+class TaskViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet for managing tasks with filtering and search"""
     queryset = Task.objects.all()
+    conditional_models = (Task, Category, Subtask)
+    conditional_time_bucket = 60  # is_overdue flips as deadlines pass
     serializer_class = TaskSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['status', 'priority', 'category', 'ai_enhanced']
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter]
+    filterset_class = TaskFilter
     search_fields = ['title', 'description', 'tags']
     ordering_fields = ['priority', 'deadline', 'created_at', 'updated_at']
     ordering = ['-priority', 'deadline']
@@ -24,36 +105,54 @@ class TaskViewSet(viewsets.ModelViewSet):
         if self.action == 'create':
             return TaskCreateSerializer
         return TaskSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'create':
+            return queryset
+        if self.request.method in ('GET', 'HEAD'):
+            names = TaskSerializer.get_sparse_field_names(self.request)
+            if names is None or set(names) & set(ROLLUP_FIELDS):
+                queryset = with_subtask_rollups(queryset)
+            if 'subtasks' in TaskSerializer.get_included_fields(self.request):
+                # ?include=subtasks - one extra query for the whole page
+                queryset = queryset.prefetch_related('subtasks')
+        columns = TaskSerializer.get_sparse_columns(self.request)
+        if columns is None:
+            return queryset.select_related('category')
+        # Only fetch the columns the requested fields need; large text
+        # columns like description stay in the database.
+        if 'category__name' in columns:
+            queryset = queryset.select_related('category')
+        return queryset.only(*columns)
     
     @action(detail=False, methods=['get'])
+    @conditional_get
+    @cached_response(Task, Category, Subtask, time_bucket=60)
     def overdue(self, request):
         """Get all overdue tasks"""
-        from django.utils import timezone
-        overdue_tasks = self.queryset.filter(
-            deadline__lt=timezone.now(),
-            status__in=['todo', 'in_progress']
-        )
+        overdue_tasks = self.get_queryset().filter(overdue_condition())
         serializer = self.get_serializer(overdue_tasks, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @conditional_get
+    @cached_response(Task, Category, Subtask, time_bucket=60)
     def high_priority(self, request):
         """Get high priority tasks"""
-        high_priority_tasks = self.queryset.filter(priority__gte=75)
+        high_priority_tasks = self.get_queryset().filter(priority__gte=75)
         serializer = self.get_serializer(high_priority_tasks, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
+    @conditional_get
+    @cached_response(Task, time_bucket=60)
     def stats(self, request):
         """Get task statistics"""
-        from django.utils import timezone
         total_tasks = self.queryset.count()
         completed_tasks = self.queryset.filter(status='done').count()
         pending_tasks = self.queryset.filter(status__in=['todo', 'in_progress']).count()
-        overdue_tasks = self.queryset.filter(
-            deadline__lt=timezone.now(),
-            status__in=['todo', 'in_progress']
-        ).count()
+        overdue_tasks = self.queryset.filter(overdue_condition()).count()
         
         return Response({
             'total_tasks': total_tasks,
@@ -63,13 +162,289 @@ class TaskViewSet(viewsets.ModelViewSet):
             'completion_rate': round((completed_tasks / total_tasks * 100) if total_tasks > 0 else 0, 2)
         })
 
+    @action(detail=False, methods=['get'])
+    @conditional_get
+    @cached_response(Task, Category, time_bucket=60)
+    def timeline(self, request):
+        """
+        Tasks (``?mode=tasks``) or counts per day, week or month of their deadline
+
+        ``?bucket=day|week|month``, ``?start=`` and ``?end=`` (dates or
+        datetimes, read in ``?tz=``) select the range; the usual task filters
+        and ``?search=`` apply.
+        """
+        params = parse_timeline_params(request.query_params)
+        queryset = self.filter_queryset(Task.objects.all())
+        now = timezone.now()
+        args = (queryset, params['bucket'], params['start'], params['end'], params['tz'])
+        data = {
+            'bucket': params['bucket'],
+            'timezone': str(params['tz']),
+            'start': params['start'],
+            'end': params['end'],
+        }
+        if params['mode'] == 'tasks':
+            data['buckets'], data['truncated'] = timeline_tasks(*args, now=now)
+        else:
+            data['buckets'] = timeline_counts(*args, now=now)
+        return Response(data)
+
+    @action(detail=False, methods=['post'])
+    def check_duplicates(self, request):
+        """
+        Existing tasks nearly duplicating ``{"title": ..., "description": ...}``
+
+        Meant to be called before a task is created; ``exclude`` skips the
+        task being edited. Matches come from the similarity index, so the cost
+        does not grow with the number of tasks.
+        """
+        serializer = TaskDuplicateCheckSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        matches = find_similar(
+            data['title'], data['description'], threshold=data['threshold'], limit=data['limit'],
+            exclude=data.get('exclude'), queryset=with_subtask_rollups(Task.objects.all()),
+        )
+        return Response({
+            'threshold': data['threshold'],
+            'duplicates': [
+                {'similarity': round(similarity, 3), 'task': TaskSerializer(task).data}
+                for similarity, task in matches
+            ],
+        })
+
+    @action(detail=False, methods=['get'])
+    @conditional_get
+    @cached_response(Task)
+    def duplicates(self, request):
+        """
+        Groups of near-duplicate tasks, largest first
+
+        ``?threshold=`` (0.1-1, Jaccard similarity of the words) and
+        ``?include_done=true`` to include finished tasks.
+        """
+        serializer = TaskDuplicateReportSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        groups = duplicate_groups(params['threshold'], params['include_done'])
+        ids = [task_id for group in groups for task_id in group['task_ids']]
+        tasks = {
+            task['id']: task
+            for task in Task.objects.filter(pk__in=ids).values('id', 'title', 'status', 'priority', 'created_at')
+        }
+        return Response({
+            'threshold': params['threshold'],
+            'group_count': len(groups),
+            # Tasks that could go if each group kept one
+            'redundant_tasks': len(ids) - len(groups),
+            'groups': [
+                {
+                    'similarity': group['similarity'],
+                    'tasks': [tasks[task_id] for task_id in group['task_ids'] if task_id in tasks],
+                }
+                for group in groups
+            ],
+        })
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream every task, with its category name and subtasks, as NDJSON or CSV
+
+        ``?type=csv`` switches from NDJSON; the task list filters (``status``,
+        ``tag``, ``has_subtasks``...) narrow the export.
+        """
+        export_type = request.query_params.get('type', 'ndjson')
+        if export_type not in ('ndjson', 'csv'):
+            return Response({'error': 'type must be "ndjson" or "csv"'}, status=status.HTTP_400_BAD_REQUEST)
+        filterset = TaskFilter(request.query_params, queryset=Task.objects.all(), request=request)
+        if not filterset.is_valid():
+            return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        if export_type == 'csv':
+            chunks, content_type = export_csv(filterset.qs, EXPORT_CHUNK_SIZE), 'text/csv'
+        else:
+            chunks, content_type = export_ndjson(filterset.qs, EXPORT_CHUNK_SIZE), 'application/x-ndjson'
+        response = StreamingHttpResponse(_streaming_body(request, chunks), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="tasks.{export_type}"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_tasks(self, request):
+        """
+        Import tasks from an export (``text/csv`` body, NDJSON otherwise)
+
+        The body is read line by line and saved in batches of ``?batch_size=``
+        tasks; each batch commits on its own and invalid records are reported
+        by line number.
+        """
+        try:
+            batch_size = min(max(int(request.query_params.get('batch_size', BULK_BATCH_SIZE)), 1), 5000)
+        except ValueError:
+            return Response({'error': 'batch_size must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        stream = request.stream
+        if stream is None:
+            return Response({'error': 'Empty request body'}, status=status.HTTP_400_BAD_REQUEST)
+
+        lines = _checked_lines(stream)
+        if request.content_type.startswith('text/csv'):
+            rows = parse_csv(line.decode('utf-8') for line in lines)
+        else:
+            rows = parse_ndjson(lines)
+        stats = import_task_records(rows, batch_size=batch_size, max_errors=MAX_INGEST_ERRORS)
+        return Response({
+            **stats,
+            'errors_truncated': stats['failed'] > len(stats['errors']),
+        }, status=status.HTTP_201_CREATED if stats['created'] else status.HTTP_400_BAD_REQUEST)
+
+    def _get_bulk_selection(self, data):
+        """Resolve ``{"ids": [...]}`` or ``{"filter": {...}}`` to a task queryset"""
+        if not hasattr(data, 'get'):
+            raise ValidationError({'error': 'Expected an object with "ids" or "filter"'})
+        ids = data.get('ids')
+        filter_data = data.get('filter')
+        if ids is not None:
+            if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+                raise ValidationError({'ids': 'Expected a list of task ids'})
+            return Task.objects.filter(pk__in=ids)
+        if isinstance(filter_data, dict) and filter_data:
+            filterset = TaskFilter(data=filter_data, queryset=Task.objects.all())
+            unknown = set(filter_data) - set(filterset.filters)
+            if unknown:
+                # An ignored key would silently widen the selection to every task
+                raise ValidationError({'filter': f'Unknown filters: {", ".join(sorted(unknown))}'})
+            if not filterset.is_valid():
+                raise ValidationError({'filter': filterset.errors})
+            return filterset.qs
+        raise ValidationError({'error': 'Provide "ids" or a non-empty "filter"'})
+
+    @action(detail=False, methods=['post'])
+    def bulk_create(self, request):
+        """Create many tasks in one transaction; nothing is saved if any item is invalid"""
+        if not isinstance(request.data, list):
+            return Response({'error': 'Expected a list of tasks'}, status=status.HTTP_400_BAD_REQUEST)
+
+        items, errors = [], []
+        for index, item in enumerate(request.data):
+            serializer = TaskCreateSerializer(data=item)
+            if serializer.is_valid():
+                items.append(dict(serializer.validated_data))
+            else:
+                errors.append({'index': index, 'errors': serializer.errors})
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
 
-class CategoryViewSet(viewsets.ModelViewSet):
+        with transaction.atomic():
+            categories = resolve_categories(item.get('category_name') for item in items)
+            tasks = []
+            for item in items:
+                category_name = item.pop('category_name', None)
+                tasks.append(Task(category=categories.get(category_name), **item))
+                tasks[-1].sync_completed_at()
+            tasks = Task.objects.bulk_create(tasks, batch_size=BULK_BATCH_SIZE)
+            sync_task_tags(tasks)
+            increment_category_usage(task.category_id for task in tasks)
+            send_bulk_change(Task, [task.pk for task in tasks])
+
+        prefetch_related_objects(tasks, 'subtasks')  # rollups without a query per task
+        serializer = TaskSerializer(tasks, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['patch'])
+    def bulk_update(self, request):
+        """
+        Update many tasks in one transaction
+
+        Accepts either a list of partial tasks with their ``id``, or
+        ``{"ids": [...]}`` / ``{"filter": {...}}`` with an ``"update"`` object
+        that is applied to every selected task in a single UPDATE.
+        """
+        if isinstance(request.data, list):
+            return self._bulk_update_items(request.data)
+        return self._bulk_update_selection(request.data)
+
+    def _bulk_update_items(self, items):
+        ids = [item.get('id') for item in items if isinstance(item, dict)]
+        tasks = Task.objects.in_bulk([pk for pk in ids if isinstance(pk, int)])
+
+        changed, fields, errors = [], set(), []
+        for index, item in enumerate(items):
+            task = tasks.get(item.get('id')) if isinstance(item, dict) else None
+            if task is None:
+                errors.append({'index': index, 'errors': {'id': ['Task not found.']}})
+                continue
+            previous_category_id = task.category_id
+            serializer = TaskSerializer(task, data=item, partial=True)
+            if not serializer.is_valid():
+                errors.append({'index': index, 'errors': serializer.errors})
+                continue
+            for field, value in serializer.validated_data.items():
+                setattr(task, field, value)
+            fields.update(serializer.validated_data)
+            changed.append((task, previous_category_id))
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        now = timezone.now()
+        updated_tasks = [task for task, _ in changed]
+        for task in updated_tasks:
+            task.updated_at = now
+            if task.sync_completed_at(now):
+                fields.add('completed_at')
+        with transaction.atomic():
+            # The days the tasks counted towards before this update
+            mark_task_rows(Task.objects.filter(pk__in=[task.pk for task in updated_tasks]))
+            Task.objects.bulk_update(updated_tasks, sorted(fields | {'updated_at'}), batch_size=BULK_BATCH_SIZE)
+            if 'tags' in fields:
+                sync_task_tags(updated_tasks)
+            increment_category_usage(
+                task.category_id for task, previous in changed if task.category_id != previous
+            )
+            send_bulk_change(Task, [task.pk for task in updated_tasks])
+        return Response({'updated': len(updated_tasks)})
+
+    def _bulk_update_selection(self, data):
+        queryset = self._get_bulk_selection(data)
+        serializer = TaskBulkUpdateSerializer(data=data.get('update'), partial=True)
+        serializer.is_valid(raise_exception=True)
+        values = serializer.validated_data
+        if not values:
+            raise ValidationError({'update': 'Nothing to update'})
+
+        with transaction.atomic():
+            category = values.get('category')
+            if category is not None:
+                reassigned = queryset.exclude(category=category).count()
+                increment_category_usage([category.pk] * reassigned)
+            pks = list(queryset.values_list('pk', flat=True))
+            now = timezone.now()
+            if 'status' in values:
+                # Tasks that were already done keep their completion time
+                values['completed_at'] = Coalesce('completed_at', Value(now)) if values['status'] == 'done' else None
+            mark_task_rows(Task.objects.filter(pk__in=pks))
+            # queryset.update() skips auto_now, so stamp updated_at explicitly
+            updated = Task.objects.filter(pk__in=pks).update(updated_at=now, **values)
+            send_bulk_change(Task, pks)
+        return Response({'updated': updated})
+
+    @action(detail=False, methods=['post'])
+    def bulk_delete(self, request):
+        """Delete every task selected by ``{"ids": [...]}`` or ``{"filter": {...}}``"""
+        queryset = self._get_bulk_selection(request.data)
+        with transaction.atomic():
+            _, deleted = queryset.delete()
+        return Response({'deleted': deleted.get(Task._meta.label, 0)})
+
+
+class CategoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet for managing task categories"""
     queryset = Category.objects.all()
+    conditional_models = (Category, Task)
     serializer_class = CategorySerializer
     
     @action(detail=False, methods=['get'])
+    @conditional_get
+    @cached_response(Category, Task)
     def popular(self, request):
         """Get most used categories"""
         popular_categories = self.queryset.filter(usage_count__gt=0)[:10]
@@ -77,15 +452,61 @@ class CategoryViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class ContextEntryViewSet(viewsets.ModelViewSet):
+class TagViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    """Tag frequencies from the tag index, most used first"""
+    serializer_class = TagSerializer
+    conditional_models = (Tag, Task)
+
+    def get_queryset(self):
+        queryset = Tag.objects.annotate(task_count=Count('tasks')).filter(task_count__gt=0)
+        prefix = self.request.query_params.get('prefix', '').strip().lower()
+        if prefix:
+            # Autocomplete: name__startswith can use the unique index on name
+            queryset = queryset.filter(name__startswith=prefix)
+        return queryset.order_by('-task_count', 'name')
+
+
+class TaskAnalyticsViewSet(ConditionalGetMixin, viewsets.ViewSet):
+    """Created/completed/due/overdue series read from the daily stats rollups"""
+    conditional_models = (DailyTaskStats,)
+    # Today's overdue count is live
+    conditional_time_bucket = 60
+
+    @conditional_get
+    @cached_response(DailyTaskStats, time_bucket=60)
+    def list(self, request):
+        """
+        Per ``?bucket=day|week|month`` series for ``?start=..?end=`` (dates, inclusive)
+
+        ``?group_by=category|priority`` splits every bucket; ``?category=``
+        (an id or ``none``) and ``?priority=`` restrict it.
+        """
+        params = parse_stats_params(request.query_params)
+        series, totals = stats_series(
+            params['bucket'], params['start'], params['end'], params['group_by'], params['filters']
+        )
+        return Response({
+            'bucket': params['bucket'],
+            'start': params['start'],
+            'end': params['end'],
+            'group_by': params['group_by'],
+            'totals': totals,
+            'series': series,
+        })
+
+
+class ContextEntryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet for managing daily context entries"""
     queryset = ContextEntry.objects.all()
+    conditional_models = (ContextEntry,)
     serializer_class = ContextEntrySerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter]
     filterset_fields = ['source', 'processed']
     search_fields = ['content']
     
     @action(detail=False, methods=['get'])
+    @conditional_get
+    @cached_response(ContextEntry)
     def recent(self, request):
         """Get recent context entries for AI processing"""
         limit = request.query_params.get('limit', 10)
@@ -98,14 +519,99 @@ class ContextEntryViewSet(viewsets.ModelViewSet):
         """Create multiple context entries at once"""
         serializer = self.get_serializer(data=request.data, many=True)
         if serializer.is_valid():
-            serializer.save()
+            with transaction.atomic():
+                serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'])
+    def ingest(self, request):
+        """
+        Stream newline-delimited JSON context entries into the database
+
+        The body is read line by line and inserted in chunks of
+        ``?chunk_size=`` entries (default 500), so memory stays bounded no
+        matter how large the upload is. Each chunk commits on its own; invalid
+        lines are skipped and reported by line number.
+        """
+        try:
+            chunk_size = min(max(int(request.query_params.get('chunk_size', BULK_BATCH_SIZE)), 1), 5000)
+        except ValueError:
+            return Response({'error': 'chunk_size must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        stream = request.stream
+        if stream is None:
+            return Response({'error': 'Empty request body'}, status=status.HTTP_400_BAD_REQUEST)
+
+        created, failed, errors, chunk = 0, 0, [], []
+
+        def flush():
+            nonlocal created
+            with transaction.atomic():
+                entries = ContextEntry.objects.bulk_create(chunk)
+                send_bulk_change(ContextEntry, [entry.pk for entry in entries])
+            created += len(entries)
+            chunk.clear()
+
+        for line_number, line in enumerate(_iter_lines(stream), start=1):
+            if line is _OVERLONG_LINE:
+                line_errors = {'non_field_errors': [f'Line exceeds {MAX_INGEST_LINE_BYTES} bytes']}
+            elif not line.strip():
+                continue
+            else:
+                try:
+                    serializer = self.get_serializer(data=json.loads(line))
+                    valid = serializer.is_valid()
+                    line_errors = serializer.errors
+                except ValueError as e:
+                    valid, line_errors = False, {'non_field_errors': [f'Invalid JSON: {e}']}
+                if valid:
+                    chunk.append(ContextEntry(**serializer.validated_data))
+                    if len(chunk) >= chunk_size:
+                        flush()
+                    continue
+            failed += 1
+            if len(errors) < MAX_INGEST_ERRORS:
+                errors.append({'line': line_number, 'errors': line_errors})
+        if chunk:
+            flush()
 
-class SubtaskViewSet(viewsets.ModelViewSet):
+        return Response({
+            'created': created,
+            'failed': failed,
+            'errors': errors,
+            'errors_truncated': failed > len(errors),
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
+
+
+class ContextSummaryViewSet(viewsets.ReadOnlyModelViewSet):
+    """Compacted context history produced by `manage.py compact_contexts`"""
+    queryset = ContextSummary.objects.all()
+    serializer_class = ContextSummarySerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = {
+        'source': ['exact'],
+        'period': ['exact'],
+        'period_start': ['gte', 'lte'],
+    }
+
+
+class ArchivedContextEntryViewSet(viewsets.ReadOnlyModelViewSet):
+    """Raw content of compacted context entries, decompressed on read"""
+    queryset = ArchivedContextEntry.objects.all()
+    serializer_class = ArchivedContextEntrySerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = {
+        'source': ['exact'],
+        'summary': ['exact'],
+        'created_at': ['gte', 'lte'],
+    }
+
+
+class SubtaskViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet for managing subtasks"""
     queryset = Subtask.objects.all()
+    conditional_models = (Subtask,)
     serializer_class = SubtaskSerializer
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['task', 'completed']
@@ -114,9 +620,236 @@ class SubtaskViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['patch'])
     def toggle_completed(self, request, pk=None):
-        """Toggle subtask completion status"""
-        subtask = self.get_object()
-        subtask.completed = not subtask.completed
-        subtask.save()
+        """
+        Toggle subtask completion status
+
+        The flip happens in a single UPDATE, so concurrent toggles never
+        overwrite each other. ``{"completed": true|false}`` sets the flag
+        instead of flipping it.
+        """
+        try:
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound()
+        completed = request.data.get('completed') if hasattr(request.data, 'get') else None
+        if completed is None:
+            new_value = Case(When(completed=True, then=Value(False)), default=Value(True))
+        elif isinstance(completed, bool):
+            new_value = Value(completed)
+        else:
+            raise ValidationError({'completed': 'Must be a boolean'})
+
+        updated = self.get_queryset().filter(pk=pk).update(completed=new_value, updated_at=Now())
+        if not updated:
+            raise NotFound()
+        subtask = self.get_queryset().get(pk=pk)
+        send_bulk_change(Subtask, [subtask.pk])
         serializer = self.get_serializer(subtask)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['post'])
+    def reorder(self, request):
+        """
+        Reorder a task's subtasks with one UPDATE
+
+        Takes ``{"task": id, "order": [subtask ids...]}``. Listed subtasks are
+        numbered in the given order; subtasks left out keep their relative
+        order after them.
+        """
+        data = request.data if hasattr(request.data, 'get') else {}
+        task_id, ordered_ids = data.get('task'), data.get('order')
+        if not isinstance(task_id, int):
+            raise ValidationError({'task': 'Expected a task id'})
+        if not isinstance(ordered_ids, list) or not all(isinstance(pk, int) for pk in ordered_ids):
+            raise ValidationError({'order': 'Expected a list of subtask ids'})
+        if len(set(ordered_ids)) != len(ordered_ids):
+            raise ValidationError({'order': 'Subtask ids must be unique'})
+        if len(ordered_ids) > MAX_REORDER_SUBTASKS:
+            raise ValidationError({'order': f'At most {MAX_REORDER_SUBTASKS} subtasks can be reordered at once'})
+
+        with transaction.atomic():
+            # Lock the checklist so concurrent reorders apply one after another
+            current = list(
+                Subtask.objects.select_for_update().filter(task_id=task_id).values_list('pk', 'order')
+            )
+            if not current and not Task.objects.filter(pk=task_id).exists():
+                raise NotFound('Task not found.')
+            current_order = dict(current)
+            unknown = set(ordered_ids) - set(current_order)
+            if unknown:
+                raise ValidationError({'order': f'Not subtasks of task {task_id}: {sorted(unknown)}'})
+
+            listed = set(ordered_ids)
+            full_order = ordered_ids + [pk for pk, _ in current if pk not in listed]
+            changed = {
+                pk: position for position, pk in enumerate(full_order)
+                if current_order[pk] != position
+            }
+            if changed:
+                Subtask.objects.filter(pk__in=changed).update(
+                    order=Case(*(When(pk=pk, then=Value(position)) for pk, position in changed.items())),
+                    updated_at=Now(),
+                )
+                send_bulk_change(Subtask, list(changed))
+        return Response({'updated': len(changed)})
+
+    @action(detail=False, methods=['post'])
+    def bulk_create(self, request):
+        """
+        Create a list of subtasks (e.g. an AI-generated checklist) in one transaction
+
+        Items without an ``order`` are appended after the task's existing
+        subtasks in list order. Nothing is saved if any item is invalid.
+        """
+        if not isinstance(request.data, list):
+            return Response({'error': 'Expected a list of subtasks'}, status=status.HTTP_400_BAD_REQUEST)
+
+        items, errors = [], []
+        for index, item in enumerate(request.data):
+            serializer = SubtaskSerializer(data=item)
+            if serializer.is_valid():
+                items.append(dict(serializer.validated_data))
+            else:
+                errors.append({'index': index, 'errors': serializer.errors})
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            unordered_tasks = {item['task'].pk for item in items if 'order' not in item}
+            next_order = dict(
+                Subtask.objects.filter(task_id__in=unordered_tasks).order_by()
+                .values('task_id').annotate(last=Max('order')).values_list('task_id', 'last')
+            )
+            subtasks = []
+            for item in items:
+                if 'order' not in item:
+                    task_id = item['task'].pk
+                    next_order[task_id] = item['order'] = next_order.get(task_id, -1) + 1
+                subtasks.append(Subtask(**item))
+            subtasks = Subtask.objects.bulk_create(subtasks, batch_size=BULK_BATCH_SIZE)
+            send_bulk_change(Subtask, [subtask.pk for subtask in subtasks])
+
+        serializer = SubtaskSerializer(subtasks, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET'])
+def response_cache_stats(request):
+    """Hit rates of the versioned response cache"""
+    views = cache_stats()
+    hits = sum(counts['hits'] for counts in views.values())
+    misses = sum(counts['misses'] for counts in views.values())
+    return Response({
+        'enabled': settings.RESPONSE_CACHE_ENABLED,
+        'backend': settings.RESPONSE_CACHE_BACKEND,
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+        'views': views,
+    })
+
+
+SYNC_SERIALIZERS = {
+    'tasks': TaskSerializer,
+    'subtasks': SubtaskSerializer,
+    'categories': CategorySerializer,
+}
+
+
+@api_view(['GET'])
+def sync(request):
+    """
+    Delta sync for tasks, subtasks and categories
+
+    Without ``since`` the response is ``reset: true`` plus a cursor: load the
+    full lists, then poll ``?since=<cursor>`` to receive only rows created,
+    updated or deleted after it. Follow ``has_more`` to drain large backlogs.
+    """
+    try:
+        limit = min(max(int(request.query_params.get('limit', 1000)), 1), 5000)
+        since = request.query_params.get('since')
+        cursor = int(since) if since is not None else None
+    except ValueError:
+        return Response({'error': 'since and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+    changes = None
+    if cursor is not None:
+        changes, next_cursor, has_more = changes_since(cursor, limit)
+    if changes is None:
+        return Response({'reset': True, 'cursor': latest_cursor(), 'has_more': False})
+
+    payload = {'reset': False, 'cursor': next_cursor, 'has_more': has_more}
+    for name, model in SYNC_MODELS.items():
+        queryset = model.objects.filter(pk__in=changes[name]['upserts'])
+        if model is Task:
+            queryset = with_subtask_rollups(queryset.select_related('category'))
+        objects = list(queryset)
+        # Rows deleted after their upsert was read are tombstones as well
+        missing = changes[name]['upserts'] - {obj.pk for obj in objects}
+        payload[name] = {
+            'updated': SYNC_SERIALIZERS[name](objects, many=True).data,
+            'deleted': sorted(changes[name]['deletes'] | missing),
+        }
+    return Response(payload)
+
+
+def _sse(event):
+    data = {key: value for key, value in event.items() if key not in ('id', 'type')}
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _event_stream(types, last_event_id):
+    # Subscribing inside the generator ties the subscription's lifetime to
+    # the response body: it is dropped however the stream ends.
+    subscription, backlog = await hub.subscribe(
+        types=types, last_event_id=last_event_id, queue_size=settings.EVENT_STREAM_QUEUE_SIZE
+    )
+    try:
+        yield "retry: 3000\n\n"
+        if backlog is None:
+            yield "event: reset\ndata: {}\n\n"
+        for event in backlog or ():
+            yield _sse(event)
+
+        closes_at = time.monotonic() + settings.EVENT_STREAM_MAX_SECONDS
+        while (remaining := closes_at - time.monotonic()) > 0:
+            try:
+                event = await subscription.get(min(remaining, settings.EVENT_STREAM_KEEPALIVE_SECONDS))
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event['type'] == 'reset':
+                yield "event: reset\ndata: {}\n\n"
+            else:
+                yield _sse(event)
+    finally:
+        hub.unsubscribe(subscription)
+
+
+async def event_stream(request):
+    """
+    Server-sent events for task, subtask and context changes
+
+    Each event names the changed ids (``event: task``, ``data: {"action":
+    "upsert", "ids": [...]}``); ``?types=task,subtask`` narrows the stream.
+    ``event: reset`` means events were missed and the client should resync,
+    e.g. through ``/api/sync/``. Needs the ASGI application.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'The event stream is only served by the ASGI application'}, status=501)
+    if len(hub) >= settings.EVENT_STREAM_MAX_CLIENTS:
+        return JsonResponse({'error': 'Too many open event streams'}, status=503)
+
+    types = {value for value in request.GET.get('types', '').split(',') if value}
+    unknown = types - set(EVENT_MODELS.values())
+    if unknown:
+        return JsonResponse({'error': f"Unknown event types: {', '.join(sorted(unknown))}"}, status=400)
+    try:
+        last_event_id = int(request.headers['Last-Event-ID'])
+    except (KeyError, ValueError):
+        last_event_id = None
+
+    response = StreamingHttpResponse(_event_stream(types, last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # keep reverse proxies from buffering the stream
+    return response